@@ -0,0 +1,228 @@
+"""Revenue and occupancy summaries, recomputed in parallel by date range.
+
+Triggers (migration 8) mark a day dirty in analytics_dirty_days whenever a
+ticket is sold or released, a departure is added, moved or removed, a
+departure's capacity changes or a transaction is recorded. refresh() merges
+the dirty days into date ranges, aggregates batches of ranges from
+schedules, seat_inventory, schedule_tickets and transactions in separate
+processes, and replaces those days in daily_bus_stats (one row per day,
+bus and route) and daily_route_stats. Reports read only the summary tables.
+"""
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import date, timedelta
+
+# Below this many dirty days the pool costs more to start than it saves
+PARALLEL_MIN_DAYS = 30
+ONE_DAY = timedelta(days=1)
+
+BusDay = namedtuple("BusDay", "day bus_id route_id departures capacity seats_sold ticket_revenue payments")
+RouteTotal = namedtuple("RouteTotal", "route_id route_name departures capacity seats_sold ticket_revenue payments load_factor")
+DayTotal = namedtuple("DayTotal", "day departures capacity seats_sold ticket_revenue payments load_factor")
+BusTotal = namedtuple("BusTotal", "bus_id bus_name departures capacity seats_sold ticket_revenue payments load_factor")
+RefreshResult = namedtuple("RefreshResult", "days batches rows")
+
+_DEPARTURES_SQL = """
+    SELECT schedules.departure_date, schedules.bus_id, schedules.route_id, COUNT(*),
+        TOTAL(IFNULL(seat_inventory.capacity, buses.capacity)),
+        TOTAL((SELECT COUNT(*) FROM schedule_tickets WHERE schedule_tickets.schedule_id = schedules.schedule_id)),
+        TOTAL((SELECT TOTAL(price) FROM schedule_tickets WHERE schedule_tickets.schedule_id = schedules.schedule_id))
+    FROM schedules
+    LEFT JOIN seat_inventory ON seat_inventory.schedule_id = schedules.schedule_id
+    LEFT JOIN buses ON buses.bus_id = schedules.bus_id
+    WHERE schedules.departure_date BETWEEN ? AND ?
+    GROUP BY schedules.departure_date, schedules.bus_id, schedules.route_id
+"""
+
+# transaction_date is a timestamp, so the range ends before the day after last. A payment
+# counts toward its departure's route; ones without a departure fall back to the bus's route.
+_PAYMENTS_SQL = """
+    SELECT date(transactions.transaction_date), transactions.bus_id,
+        IFNULL(schedules.route_id, buses.route_id), TOTAL(transactions.total_amount)
+    FROM transactions
+    LEFT JOIN schedules ON schedules.schedule_id = transactions.schedule_id
+    LEFT JOIN buses ON buses.bus_id = transactions.bus_id
+    WHERE transactions.transaction_date >= ? AND transactions.transaction_date < date(?, '+1 day')
+    GROUP BY date(transactions.transaction_date), transactions.bus_id, IFNULL(schedules.route_id, buses.route_id)
+"""
+
+
+def load_factor(seats_sold, capacity):
+    """Return sold/capacity, or 0.0 for no capacity."""
+    return seats_sold / capacity if capacity else 0.0
+
+
+def runs(days):
+    """Merge sorted YYYY-MM-DD days into (first, last) runs of consecutive days."""
+    merged = []
+    for day in days:
+        current = date.fromisoformat(day)
+        if merged and current - merged[-1][2] == ONE_DAY:
+            merged[-1][1:] = [day, current]
+        else:
+            merged.append([day, day, current])
+    return [(first, last) for first, last, _ in merged]
+
+
+def partition(ranges, parts):
+    """Split sorted (first, last) ranges into at most parts batches covering similar numbers of days.
+
+    Long ranges are cut at batch boundaries, so one contiguous range still
+    spreads across every batch.
+    """
+    total = sum((date.fromisoformat(last) - date.fromisoformat(first)).days + 1 for first, last in ranges)
+    if not total:
+        return []
+    target = -(-total // max(1, parts))  # Days per batch, rounded up
+    batches, batch, room = [], [], target
+    for first, last in ranges:
+        start, end = date.fromisoformat(first), date.fromisoformat(last)
+        while start <= end:
+            stop = min(end, start + timedelta(days=room - 1))
+            batch.append((start.isoformat(), stop.isoformat()))
+            room -= (stop - start).days + 1
+            start = stop + ONE_DAY
+            if not room:
+                batches.append(batch)
+                batch, room = [], target
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def compute_batch(db_name, ranges):
+    """Return a list of BusDay rows for each (first, last) range in a batch.
+
+    Runs in a worker process, so it opens its own read-only connection.
+    """
+    conn = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)
+    try:
+        return [compute_range(conn, first, last) for first, last in ranges]
+    finally:
+        conn.close()
+
+
+def compute_range(conn, first, last):
+    """Return a BusDay row per day, bus and route active between first and last (inclusive)."""
+    rows = {}
+    for day, bus_id, route_id, departures, capacity, sold, revenue in conn.execute(_DEPARTURES_SQL, (first, last)):
+        rows[(day, bus_id, route_id)] = BusDay(day, bus_id, route_id, departures, int(capacity), int(sold), revenue, 0.0)
+    for day, bus_id, route_id, amount in conn.execute(_PAYMENTS_SQL, (first, last)):
+        if day is None or not first <= day <= last:
+            continue
+        key = (day, bus_id, route_id)
+        row = rows.get(key) or BusDay(day, bus_id, route_id, 0, 0, 0, 0.0, 0.0)
+        rows[key] = row._replace(payments=row.payments + amount)
+    return list(rows.values())
+
+
+def dirty_days(conn):
+    """Return {day: version} for every day whose summaries are out of date."""
+    return dict(conn.execute("SELECT day, version FROM analytics_dirty_days"))
+
+
+def mark_all_dirty(conn):
+    """Queue every day with departures or transactions for recomputation."""
+    conn.execute("""
+        INSERT INTO analytics_dirty_days (day)
+        SELECT departure_date FROM schedules WHERE true
+        UNION SELECT date(transaction_date) FROM transactions WHERE date(transaction_date) IS NOT NULL
+        ON CONFLICT (day) DO UPDATE SET version = version + 1
+    """)
+
+
+def store(conn, ranges, results):
+    """Replace the summaries of each (first, last) range with its computed BusDay rows."""
+    rows = 0
+    for (first, last), bus_days in zip(ranges, results):
+        conn.execute("DELETE FROM daily_bus_stats WHERE day BETWEEN ? AND ?", (first, last))
+        conn.execute("DELETE FROM daily_route_stats WHERE day BETWEEN ? AND ?", (first, last))
+        conn.executemany("INSERT INTO daily_bus_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)", bus_days)
+        conn.execute("""
+            INSERT INTO daily_route_stats (day, route_id, departures, capacity, seats_sold, ticket_revenue, payments)
+            SELECT day, route_id, SUM(departures), SUM(capacity), SUM(seats_sold), TOTAL(ticket_revenue), TOTAL(payments)
+            FROM daily_bus_stats
+            WHERE day BETWEEN ? AND ? AND route_id IS NOT NULL
+            GROUP BY day, route_id
+        """, (first, last))
+        rows += len(bus_days)
+    return rows
+
+
+def refresh(db_name, conn, workers=None, full=False):
+    """Recompute the summaries of every dirty day (every day if full) and return a RefreshResult.
+
+    Consecutive dirty days are merged into date ranges and the ranges split
+    into one batch per worker process; fewer than PARALLEL_MIN_DAYS days are
+    computed in this process instead.
+    """
+    if full:
+        with conn:
+            mark_all_dirty(conn)
+    versions = dirty_days(conn)
+    if not versions:
+        return RefreshResult(0, 0, 0)
+    workers = workers or os.cpu_count() or 1
+    ranges = runs(sorted(versions))
+    if workers == 1 or len(versions) < PARALLEL_MIN_DAYS:
+        batches = [ranges]
+        results = [compute_range(conn, first, last) for first, last in ranges]
+    else:
+        # Imported here: multiprocessing is most of this module's import time
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        batches = partition(ranges, workers)
+        ranges = [span for batch in batches for span in batch]
+        # Spawn rather than fork: the caller may be a threaded GUI process
+        with ProcessPoolExecutor(len(batches), mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = [rows for batch in pool.map(compute_batch, [db_name] * len(batches), batches) for rows in batch]
+
+    with conn:
+        rows = store(conn, ranges, results)
+        # Days dirtied again while we were computing keep their newer version and stay queued
+        conn.executemany("DELETE FROM analytics_dirty_days WHERE day = ? AND version = ?", versions.items())
+    return RefreshResult(len(versions), len(batches), rows)
+
+
+def daily_totals(conn, first, last):
+    """Return a DayTotal per day between first and last."""
+    return [DayTotal(*row, load_factor(row[3], row[2])) for row in conn.execute("""
+        SELECT day, SUM(departures), SUM(capacity), SUM(seats_sold), TOTAL(ticket_revenue), TOTAL(payments)
+        FROM daily_bus_stats
+        WHERE day BETWEEN ? AND ?
+        GROUP BY day
+        ORDER BY day
+    """, (first, last))]
+
+
+def route_totals(conn, first, last, limit=None):
+    """Return RouteTotals between first and last, highest ticket revenue first."""
+    sql = """
+        SELECT daily_route_stats.route_id, routes.route_name, SUM(daily_route_stats.departures), SUM(daily_route_stats.capacity),
+            SUM(daily_route_stats.seats_sold), TOTAL(daily_route_stats.ticket_revenue), TOTAL(daily_route_stats.payments)
+        FROM daily_route_stats
+        LEFT JOIN routes ON routes.route_id = daily_route_stats.route_id
+        WHERE day BETWEEN ? AND ?
+        GROUP BY daily_route_stats.route_id
+        ORDER BY TOTAL(daily_route_stats.ticket_revenue) DESC
+    """
+    params = [first, last]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [RouteTotal(*row, load_factor(row[4], row[3])) for row in conn.execute(sql, params)]
+
+
+def bus_totals(conn, first, last):
+    """Return BusTotals between first and last, highest ticket revenue first."""
+    return [BusTotal(*row, load_factor(row[4], row[3])) for row in conn.execute("""
+        SELECT daily_bus_stats.bus_id, buses.name, SUM(daily_bus_stats.departures), SUM(daily_bus_stats.capacity),
+            SUM(daily_bus_stats.seats_sold), TOTAL(daily_bus_stats.ticket_revenue), TOTAL(daily_bus_stats.payments)
+        FROM daily_bus_stats
+        LEFT JOIN buses ON buses.bus_id = daily_bus_stats.bus_id
+        WHERE day BETWEEN ? AND ?
+        GROUP BY daily_bus_stats.bus_id
+        ORDER BY TOTAL(daily_bus_stats.ticket_revenue) DESC
+    """, (first, last))]
@@ -0,0 +1,308 @@
+"""HTTP/JSON booking API for kiosks, web front-ends and load tests.
+
+A stdlib asyncio server speaks HTTP/1.1 with keep-alive. Every request that
+touches the database runs on a bounded pool of worker threads. Each worker
+has its own pooled SQLite connection, so the event loop never blocks on
+SQLite. When MAX_PENDING requests are already waiting for a worker, further
+ones are turned away with 503 rather than queueing without limit.
+
+Endpoints (JSON in and out; "auth" needs "Authorization: Bearer <token>"):
+
+    POST /login                     {"email", "password"} -> token and user
+    GET  /buses?q=&page=            search buses
+    GET  /buses/<bus_id>/schedules  departures of a bus
+    GET  /schedules/<id>/seats      unsold seat numbers of a departure
+    POST /bookings                  {"schedule_id", "seats"} -> booked seats and total charged (auth)
+    POST /prebookings               {"schedule_id"} charter a whole departure (auth)
+    GET  /me/tickets                the user's tickets (auth)
+    GET  /me/prebookings            the user's prebookings (auth)
+    GET  /stats                     request, worker and cache counters (auth)
+
+Run with: python api.py [--host HOST] [--port PORT] [--workers N] [--db PATH]
+"""
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import booking
+import database
+import db_pool
+import prebooking
+import services
+from database import DB_NAME
+
+HOST = "127.0.0.1"
+PORT = 8080
+WORKERS = 4          # Threads (and SQLite connections) serving database work
+MAX_PENDING = 256    # Requests allowed to wait for a worker before 503
+MAX_BODY = 64 * 1024
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+Request = namedtuple("Request", "method path query headers body params")
+
+
+class HTTPError(Exception):
+    """Raised by a handler to answer with an error status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def records(fields, rows):
+    """Turn row tuples into dicts keyed by fields."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class BookingAPI:
+    """Routes HTTP requests to BookingService and AuthService on a bounded worker pool."""
+
+    def __init__(self, db_name=DB_NAME, workers=WORKERS, max_pending=MAX_PENDING):
+        self.bookings = services.BookingService(db_name)
+        self.auth = services.AuthService(db_name)
+        self.db_name = db_name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+        self._pending = 0    # Only touched on the event loop thread
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.routes = [
+            ("POST", re.compile(r"/login"), self.login),
+            ("GET", re.compile(r"/buses"), self.search_buses),
+            ("GET", re.compile(r"/buses/(\d+)/schedules"), self.bus_schedules),
+            ("GET", re.compile(r"/schedules/(\d+)/seats"), self.available_seats),
+            ("POST", re.compile(r"/bookings"), self.book),
+            ("POST", re.compile(r"/prebookings"), self.prebook),
+            ("GET", re.compile(r"/me/tickets"), self.user_tickets),
+            ("GET", re.compile(r"/me/prebookings"), self.user_prebookings),
+            ("GET", re.compile(r"/stats"), self.stats),
+        ]
+
+    async def run(self, func, *args):
+        """Run func(*args) on a database worker, or raise 503 if too many requests are waiting."""
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPError(503, "Server busy, try again")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+        finally:
+            self._pending -= 1
+
+    def user(self, request):
+        """Return the user row of the request's session token, or raise 401."""
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        user = self.auth.session_user(token) if scheme.lower() == "bearer" and token else None
+        if user is None:
+            raise HTTPError(401, "Log in first and send the token as 'Authorization: Bearer <token>'")
+        return user
+
+    @staticmethod
+    def json_body(request):
+        """Return the request body as a JSON object, or raise 400."""
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return body
+
+    # Handlers return (status, payload)
+
+    async def login(self, request):
+        body = self.json_body(request)
+        user, token = await self.run(self.auth.login, str(body.get("email", "")), str(body.get("password", "")))
+        if user is None:
+            raise HTTPError(401, "Incorrect email or password")
+        return 200, {"token": token, "user_id": user[0], "name": user[1], "role": user[5]}
+
+    async def search_buses(self, request):
+        term = request.query.get("q", "")
+        page = int(request.query.get("page", 0))
+        rows = await self.run(self.bookings.search_buses, term, page)
+        return 200, records(("bus_id", "name", "number", "ticket_price", "capacity", "route_name"), rows)
+
+    async def bus_schedules(self, request):
+        rows = await self.run(self.bookings.bus_schedules, int(request.params[0]))
+        return 200, records(("schedule_id", "departure_date", "departure_time", "arrival_time"), rows)
+
+    async def available_seats(self, request):
+        seats = await self.run(self.bookings.available_seats, int(request.params[0]))
+        return 200, {"schedule_id": int(request.params[0]), "seats": seats}
+
+    async def book(self, request):
+        user = self.user(request)
+        body = self.json_body(request)
+        if not isinstance(body.get("seats"), list) or not body["seats"]:
+            raise HTTPError(400, "'seats' must be a non-empty list of seat numbers")
+        schedule_id, seats = int(body["schedule_id"]), [int(seat) for seat in body["seats"]]
+        results, prices = await self.run(self.bookings.book_seats, schedule_id, seats, user[0])
+        booked = booking.booked_seats(results)
+        # Booking is all or nothing, so anything unsold means the seats were taken
+        status = 201 if booked and len(booked) == len(results) else 409
+        return status, {"schedule_id": schedule_id, "booked": booked, "total": sum(prices.values()),
+                        "results": {str(seat): result for seat, result in results.items()}}
+
+    async def prebook(self, request):
+        user = self.user(request)
+        body = self.json_body(request)
+        schedule_id = int(body["schedule_id"])
+        try:
+            prebook_id = await self.run(self.bookings.prebook, user[0], schedule_id)
+        except prebooking.CharterUnavailable as e:
+            raise HTTPError(404 if e.reason == prebooking.NO_DEPARTURE else 409, str(e))
+        return 201, {"prebook_id": prebook_id, "schedule_id": schedule_id}
+
+    async def user_tickets(self, request):
+        user = self.user(request)
+        rows = await self.run(self.bookings.user_tickets, user[0])
+        return 200, records(("bus_name", "route_name", "departure", "seat_number", "price", "ticket_id"), rows)
+
+    async def user_prebookings(self, request):
+        user = self.user(request)
+        rows = await self.run(self.bookings.user_prebookings, user[0])
+        return 200, records(("bus_name", "route_name", "prebook_date", "prebook_id"), rows)
+
+    async def stats(self, request):
+        self.user(request)  # Counters reveal load and cache contents, so only logged-in clients see them
+        return 200, {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "workers": self.workers,
+            "pending": self._pending,
+            "connections": db_pool.get_pool(self.db_name).stats(),
+            "seat_cache": self.bookings.seat_cache().stats(),
+            "sessions": self.auth.sessions().stats(),
+            "reference_cache": self.bookings.reference_cache().stats(),
+        }
+
+    async def dispatch(self, method, target, headers, body):
+        """Route one request and return (status, payload); errors become JSON error payloads."""
+        self.requests += 1
+        url = urlsplit(target)
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(url.path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            request = Request(method, url.path, query, headers, body, match.groups())
+            try:
+                return await handler(request)
+            except HTTPError as e:
+                return e.status, {"error": str(e)}
+            except (KeyError, TypeError, ValueError) as e:
+                return 400, {"error": f"Bad request: {e!r}"}
+            except sqlite3.IntegrityError as e:
+                return 409, {"error": str(e)}
+            except sqlite3.OperationalError as e:
+                if not booking.is_busy_error(e):
+                    self.errors += 1
+                    return 500, {"error": str(e)}
+                return 503, {"error": "Database busy, try again"}
+            except Exception as e:
+                self.errors += 1
+                return 500, {"error": str(e)}
+        if allowed:
+            return 405, {"error": f"{method} is not allowed on {url.path}"}
+        return 404, {"error": f"No such endpoint: {url.path}"}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, payload = await self.dispatch(method.upper(), target, headers, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    def close(self):
+        """Stop the worker pool."""
+        self._pool.shutdown(wait=True)
+
+
+async def serve(api, host=HOST, port=PORT, ready=None):
+    """Serve api until cancelled; ready(port) is called once the socket is listening."""
+    server = await asyncio.start_server(api.handle, host, port, reuse_address=True)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the booking API over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="database worker threads")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    parser.add_argument("--db", default=DB_NAME)
+    args = parser.parse_args()
+
+    database.init_db(args.db)
+    api = BookingAPI(args.db, args.workers, args.max_pending)
+    try:
+        asyncio.run(serve(api, args.host, args.port,
+                          ready=lambda port: print(f"Serving on http://{args.host}:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,72 @@
 import sqlite3
-import hashlib
 import tkinter as tk
 from tkinter import messagebox
-from tkinter import simpledialog
-from PIL import Image, ImageTk  
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import background
+import credentials
+import database
+import db_pool
+import executor
+import querylog
 
 DB_NAME = "bus_service.db"
+BACKGROUND_IMAGE = "bus_service_image.jpg"
+WINDOW_SIZE = (800, 500)
+
+# Only the menus need these; load_menu_modules() imports them after login so
+# the login form comes up without waiting for the service layer.
+simpledialog = filedialog = ttk = None
+booking = bulk_io = inventory = recurrence = services = widgets = None
+
+def load_menu_modules():
+    """Import the modules used by the admin and user menus (cheap once loaded)."""
+    global simpledialog, filedialog, ttk, booking, bulk_io, inventory, recurrence, services, widgets
+    from tkinter import simpledialog, filedialog, ttk
+    import booking
+    import bulk_io
+    import inventory
+    import recurrence
+    import services
+    import widgets
 
 # Utility Functions
 def get_connection():
-    """Establish a connection to the database."""
-    return sqlite3.connect(DB_NAME)
+    """Return the calling thread's pooled database connection."""
+    return db_pool.get_connection(DB_NAME)
 
 def hash_password(password):
     """Hash a password for secure storage."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    return credentials.hash_password(password)
 
 def validate_user(email, password):
     """Validate a user login."""
-    hashed_password = hash_password(password)
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE email = ? AND password = ?", (email, hashed_password))
-        return cur.fetchone()
+    user, _ = credentials.authenticate(get_connection(), email, password, credentials.get_cache(DB_NAME))
+    return user
+
+def login(email, password):
+    """Return (user, session token) for valid credentials, or (None, None); loads the menus' modules on success.
+
+    Runs on a query worker, so the imports overlap with the password check
+    instead of delaying the first menu.
+    """
+    user, token = credentials.authenticate(get_connection(), email, password, credentials.get_cache(DB_NAME))
+    if user:
+        load_menu_modules()
+    return user, token
 
 class BusAppGUI:
-    def __init__(self, root):
+    def __init__(self, root, lazy=True):
+        """Build the login screen.
+
+        With lazy (the default) the form is shown straight away and the
+        background image fills in once a worker has decoded it; otherwise
+        the image is loaded before the constructor returns.
+        """
         self.root = root
+        self.auth_service = None  # Created by load_services() once a menu opens
+        # Database work runs on worker threads; results come back via root.after
+        self.executor = executor.QueryExecutor(self.root)
         self.root.title("Bus Service Application")
         self.root.geometry("800x500")  # Larger window size
         self.root.resizable(False, False)  # Prevent resizing
@@ -37,11 +76,13 @@ class BusAppGUI:
         self.canvas = tk.Canvas(self.root, width=800, height=500)
         self.canvas.pack()
 
-        self.bg_image = Image.open("bus_service_image.jpg")  # Your bus service image
-        self.bg_image = self.bg_image.resize((800, 500), Image.Resampling.LANCZOS)  # Resize it to fit the window
-        self.bg_image_tk = ImageTk.PhotoImage(self.bg_image)
-
-        self.canvas.create_image(0, 0, anchor="nw", image=self.bg_image_tk)  # Set the image as background
+        self.bg_image_tk = None
+        if lazy:
+            # Without the image the login form still works, so errors are ignored
+            self.executor.submit(background.load, BACKGROUND_IMAGE, WINDOW_SIZE,
+                                 on_result=self.show_background, on_error=lambda error: None, key="background")
+        else:
+            self.show_background(background.load(BACKGROUND_IMAGE, WINDOW_SIZE))
 
         # Login Frame (side by side with the image)
         self.login_frame = tk.Frame(self.root, bg='white', bd=5)
@@ -63,26 +104,61 @@ class BusAppGUI:
         self.signup_button = tk.Button(self.root, text="Sign Up", command=self.show_signup, bg='lightblue', width=10)
         self.signup_button.place(x=520, y=420)
 
-   
+
+    def show_background(self, image):
+        """Draw the scaled background image behind the login form."""
+        from PIL import ImageTk  # Already imported by background.load
+
+        self.bg_image_tk = ImageTk.PhotoImage(image)
+        self.canvas.create_image(0, 0, anchor="nw", image=self.bg_image_tk)  # Set the image as background
+
+    def load_services(self):
+        """Import the service layer and create the services the menus use."""
+        if self.auth_service is not None:
+            return
+        load_menu_modules()
+        self.auth_service = services.AuthService(DB_NAME)
+        self.booking_service = services.BookingService(DB_NAME)
+        self.schedule_service = services.ScheduleService(DB_NAME)
+        self.fleet_service = services.FleetService(DB_NAME)
+        self.analytics_service = services.AnalyticsService(DB_NAME)
+
+    def run_query(self, func, *args, on_result=None, on_error=None, key=None):
+        """Run a service call in the background and show any error in a dialog.
+
+        Writes go through here too: a write waiting out another terminal's
+        lock (busy timeout plus retries) must not freeze the window.
+        on_error(exception) replaces the default "Database Error" dialog.
+        """
+        return self.executor.submit(
+            func, *args, on_result=on_result, key=key,
+            on_error=on_error or (lambda e: messagebox.showerror("Database Error", str(e))),
+        )
 
     def login_action(self):
         """Handle login action."""
         email = self.email_entry.get()
         password = self.password_entry.get()
-        user = validate_user(email, password)
-        if user:
-            messagebox.showinfo("Login Success", f"Welcome {user[1]}!")
-            self.login_frame.pack_forget()  # Hide login frame
-            role = user[5]
-            if role == 'admin':
-                self.admin_menu()
+
+        def logged_in(result):
+            user, self.session_token = result
+            if user:
+                messagebox.showinfo("Login Success", f"Welcome {user[1]}!")
+                self.login_frame.pack_forget()  # Hide login frame
+                role = user[5]
+                if role == 'admin':
+                    self.admin_menu()
+                else:
+                    self.user_menu(user[0])
             else:
-                self.user_menu(user[0])
-        else:
-            messagebox.showerror("Invalid Credentials", "Incorrect email or password. Please try again.")
+                messagebox.showerror("Invalid Credentials", "Incorrect email or password. Please try again.")
+
+        # Password hashing is deliberately slow, so keep it off the Tk thread
+        self.run_query(login, email, password, on_result=logged_in, key="login")
 
     def show_signup(self):
         """Show the signup window."""
+        self.load_services()
         self.signup_window = tk.Toplevel(self.root)
         self.signup_window.title("Sign Up")
         self.signup_window.geometry("400x300")
@@ -118,20 +194,23 @@ class BusAppGUI:
         email = self.email_entry.get()
         phone = self.phone_entry.get()
         password = self.password_entry.get()
-        hashed_password = hash_password(password)
-        with get_connection() as conn:
-            cur = conn.cursor()
-            try:
-                cur.execute("INSERT INTO users (name, email, phone, password) VALUES (?, ?, ?, ?)", 
-                            (name, email, phone, hashed_password))
-                conn.commit()
-                messagebox.showinfo("Signup Successful", "You have successfully signed up.")
-                self.signup_window.quit()
-            except sqlite3.IntegrityError:
+
+        def signed_up(_):
+            messagebox.showinfo("Signup Successful", "You have successfully signed up.")
+            self.signup_window.quit()
+
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError):
                 messagebox.showerror("Error", "Email already exists. Please choose another one.")
+            else:
+                messagebox.showerror("Database Error", str(e))
+
+        # Password hashing is deliberately slow, so keep it off the Tk thread
+        self.run_query(self.auth_service.register, name, email, phone, password, on_result=signed_up, on_error=failed)
 
     def admin_menu(self):
         """Admin menu."""
+        self.load_services()
         # Clear previous content and set up the admin interface
         for widget in self.root.winfo_children():
             widget.destroy()  # Destroy any existing widgets in the main window
@@ -143,13 +222,23 @@ class BusAppGUI:
         title_label = tk.Label(self.root, text="Admin Menu", font=("Arial", 18, "bold"))
         title_label.pack(pady=20)
 
-        # Add admin buttons
-        tk.Button(self.root, text="View System Details", command=self.view_all_details, width=30, height=2).pack(pady=10)
-        tk.Button(self.root, text="Manage Buses", command=self.manage_buses, width=30, height=2).pack(pady=10)
-        tk.Button(self.root, text="Manage Routes", command=self.manage_routes, width=30, height=2).pack(pady=10)
-        tk.Button(self.root, text="Manage Drivers", command=self.manage_drivers, width=30, height=2).pack(pady=10)
-        tk.Button(self.root, text="Manage Tickets", command=self.manage_tickets, width=30, height=2).pack(pady=10)
-        tk.Button(self.root, text="Manage Schedule", command=self.manage_schedule, width=30, height=2).pack(pady=10)
+        # Add admin buttons two to a row so Logout stays inside the window
+        buttons_frame = tk.Frame(self.root)
+        buttons_frame.pack()
+        buttons = [
+            ("View System Details", self.view_all_details),
+            ("Manage Buses", self.manage_buses),
+            ("Manage Routes", self.manage_routes),
+            ("Manage Drivers", self.manage_drivers),
+            ("Manage Seat Layouts", self.manage_tickets),
+            ("Manage Schedule", self.manage_schedule),
+            ("Import / Export Data", self.import_export_data),
+            ("Revenue & Occupancy", self.revenue_report),
+            ("Performance", self.performance_panel),
+        ]
+        for i, (text, command) in enumerate(buttons):
+            tk.Button(buttons_frame, text=text, command=command, width=30, height=2).grid(
+                row=i // 2, column=i % 2, padx=10, pady=8)
         tk.Button(self.root, text="Logout", command=self.logout_admin, bg="red", fg="white", width=30, height=2).pack(pady=20)
         def logout_admin(self):
             """Admin logout function."""
@@ -163,6 +252,7 @@ class BusAppGUI:
 
     def user_menu(self, user_id):
         """User menu."""
+        self.load_services()
         self.user_window = tk.Toplevel(self.root)
         self.user_window.title("User Menu")
         self.user_window.geometry("500x400")
@@ -192,79 +282,203 @@ class BusAppGUI:
         details_window.title("Bus System Details")
         details_window.geometry("1000x800")
 
-        # Create a scrollable frame
-        frame = tk.Frame(details_window)
-        frame.pack(fill=tk.BOTH, expand=True)
-
-        canvas = tk.Canvas(frame)
-        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        # Database Query
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                    SELECT 
-                    buses.bus_id AS "Bus ID",
-                    buses.name AS "Bus Name",
-                    routes.route_name AS "Route Name",
-                    drivers1.name AS "Driver 1",
-                    drivers2.name AS "Driver 2",
-                    COUNT(tickets.ticket_id) AS "Available Tickets",
-                    schedules.departure_date || ' ' || schedules.departure_time AS "Departure Schedule",
-                    schedules.arrival_time AS "Arrival Time"
-                        FROM buses
-                        LEFT JOIN routes ON buses.route_id = routes.route_id
-                        LEFT JOIN drivers AS drivers1 ON buses.driver_id1 = drivers1.driver_id
-                        LEFT JOIN drivers AS drivers2 ON buses.driver_id2 = drivers2.driver_id
-                        LEFT JOIN tickets ON buses.bus_id = tickets.bus_id AND tickets.status = 'unsold'
-                        LEFT JOIN schedules ON buses.bus_id = schedules.bus_id
-                     GROUP BY 
-                    buses.bus_id, 
-                    buses.name, 
-                    routes.route_name, 
-                    drivers1.name, 
-                    drivers2.name, 
-                    schedules.departure_date, 
-                    schedules.departure_time, 
-                    schedules.arrival_time
-                ORDER BY buses.bus_id;
-
-            """)
-            rows = cur.fetchall()
-
-        # Table Headers
-        headers = ["Bus ID", "Bus Name", "Route", "Driver", "Co-driver","Available Tickets", "Departure Schedule","Arrival Time"]
-        for col_num, header in enumerate(headers):
-            header_label = tk.Label(scrollable_frame, text=header, font=('Arial', 12, 'bold'), bg='lightblue', borderwidth=1, relief="solid")
-            header_label.grid(row=0, column=col_num, sticky="nsew", padx=1, pady=1)
-
-        # Populate the Table with Data
-        for row_num, row in enumerate(rows, start=1):
-            for col_num, cell in enumerate(row):
-                cell_label = tk.Label(scrollable_frame, text=cell if cell is not None else "N/A", font=('Arial', 10), borderwidth=1, relief="solid")
-                cell_label.grid(row=row_num, column=col_num, sticky="nsew", padx=1, pady=1)
-
-        # Set column widths
-        for col_num in range(len(headers)):
-            scrollable_frame.grid_columnconfigure(col_num, minsize=100)
+        # Rows are fetched page by page as the user scrolls; sorting and filtering run in SQL
+        columns = [
+            ("bus_id", "Bus ID", 60),
+            ("bus_name", "Bus Name", 150),
+            ("route_name", "Route", 180),
+            ("driver1", "Driver", 120),
+            ("driver2", "Co-driver", 120),
+            ("available_tickets", "Available Tickets", 110),
+            ("departure", "Departure Schedule", 140),
+            ("arrival_time", "Arrival Time", 90),
+        ]
+        table = widgets.PagedTreeview(details_window, columns, self.fleet_service.system_details_page)
+        table.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Add a Close Button
         close_button = tk.Button(details_window, text="Close", command=details_window.destroy)
         close_button.pack(pady=10)
 
 
+    def revenue_report(self):
+        """Admin report of revenue, load factor and top routes, read from the analytics summaries."""
+        report_window = tk.Toplevel(self.root)
+        report_window.title("Revenue & Occupancy")
+        report_window.geometry("900x700")
+
+        range_frame = tk.Frame(report_window)
+        range_frame.pack(pady=10)
+        today = datetime.now().date()
+        tk.Label(range_frame, text="From (YYYY-MM-DD):").grid(row=0, column=0, padx=5)
+        first_entry = tk.Entry(range_frame, width=12)
+        first_entry.insert(0, (today - timedelta(days=30)).isoformat())
+        first_entry.grid(row=0, column=1, padx=5)
+        tk.Label(range_frame, text="To:").grid(row=0, column=2, padx=5)
+        last_entry = tk.Entry(range_frame, width=12)
+        last_entry.insert(0, today.isoformat())
+        last_entry.grid(row=0, column=3, padx=5)
+        status_label = tk.Label(report_window, text="")
+        status_label.pack()
+
+        def table(title, columns):
+            tk.Label(report_window, text=title, font=("Arial", 12, "bold")).pack(pady=(10, 0))
+            tree = ttk.Treeview(report_window, columns=columns, show="headings", height=6)
+            for column in columns:
+                tree.heading(column, text=column)
+                tree.column(column, width=110)
+            tree.pack(fill=tk.X, padx=10)
+            return tree
+
+        metrics = ("Departures", "Seats Sold", "Load Factor", "Ticket Revenue", "Payments")
+        days_tree = table("Per Day", ("Day",) + metrics)
+        routes_tree = table("Top Routes", ("Route",) + metrics)
+        buses_tree = table("Per Bus", ("Bus",) + metrics)
+
+        def fill(tree, rows, label):
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert("", tk.END, values=(label(row), row.departures, f"{row.seats_sold}/{row.capacity}",
+                                                f"{row.load_factor:.0%}", f"{row.ticket_revenue:.2f}", f"{row.payments:.2f}"))
+
+        def load_report():
+            first, last = first_entry.get().strip(), last_entry.get().strip()
+            self.run_query(self.analytics_service.daily_totals, first, last,
+                           on_result=lambda rows: fill(days_tree, rows, lambda row: row.day))
+            self.run_query(self.analytics_service.top_routes, first, last,
+                           on_result=lambda rows: fill(routes_tree, rows, lambda row: row.route_name or row.route_id))
+            self.run_query(self.analytics_service.bus_totals, first, last,
+                           on_result=lambda rows: fill(buses_tree, rows, lambda row: row.bus_name or row.bus_id))
+            self.run_query(self.analytics_service.pending_days,
+                           on_result=lambda count: status_label.config(
+                               text=f"{count} day(s) changed since the last refresh" if count else "Summaries are up to date"))
+
+        def refresh():
+            status_label.config(text="Recomputing summaries...")
+
+            def refreshed(result):
+                status_label.config(text=f"Recomputed {result.days} day(s) in {result.batches} batch(es)")
+                load_report()
+
+            self.run_query(self.analytics_service.refresh, on_result=refreshed, key="analytics_refresh")
+
+        tk.Button(range_frame, text="Show", command=load_report).grid(row=0, column=4, padx=5)
+        tk.Button(range_frame, text="Refresh Summaries", command=refresh).grid(row=0, column=5, padx=5)
+        load_report()
+
+    def performance_panel(self):
+        """Admin view of per-statement SQL timings and the slow-query log, with a threshold and export."""
+        perf_window = tk.Toplevel(self.root)
+        perf_window.title("Performance")
+        perf_window.geometry("1000x700")
+
+        controls = tk.Frame(perf_window)
+        controls.pack(pady=10)
+        tk.Label(controls, text="Slow threshold (ms):").grid(row=0, column=0, padx=5)
+        threshold_entry = tk.Entry(controls, width=8)
+        threshold_entry.insert(0, f"{querylog.LOG.threshold * 1000:g}")
+        threshold_entry.grid(row=0, column=1, padx=5)
+        status_label = tk.Label(perf_window, text="")
+        status_label.pack()
+
+        tk.Label(perf_window, text="Statements", font=("Arial", 12, "bold")).pack(pady=(10, 0))
+        columns = ("Statement", "Calls", "Total ms", "Avg ms", "Max ms", "Rows", "Call Site")
+        statements_tree = ttk.Treeview(perf_window, columns=columns, show="headings", height=12)
+        for column, width in zip(columns, (380, 60, 80, 70, 70, 70, 230)):
+            statements_tree.heading(column, text=column)
+            statements_tree.column(column, width=width, stretch=column == "Statement")
+        statements_tree.pack(fill=tk.BOTH, expand=True, padx=10)
+
+        tk.Label(perf_window, text="Slow Queries (newest first)", font=("Arial", 12, "bold")).pack(pady=(10, 0))
+        slow_text = tk.Text(perf_window, height=12, wrap=tk.WORD)
+        slow_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        def show():
+            statements = querylog.stats()
+            statements_tree.delete(*statements_tree.get_children())
+            for row in statements:
+                statements_tree.insert("", tk.END, values=(row.fingerprint, row.calls, f"{row.total_ms:.1f}",
+                                                           f"{row.avg_ms:.2f}", f"{row.max_ms:.1f}", row.rows,
+                                                           row.call_sites[0] if row.call_sites else ""))
+            slow = querylog.slow_queries()
+            slow_text.config(state=tk.NORMAL)
+            slow_text.delete("1.0", tk.END)
+            for query in reversed(slow):
+                plan = "\n    ".join(query.plan) or "(no plan)"
+                slow_text.insert(tk.END, f"{query.logged_at}  {query.duration_ms:.1f} ms  {query.call_site}\n"
+                                         f"  {query.fingerprint}\n  params: {query.params}\n    {plan}\n\n")
+            slow_text.config(state=tk.DISABLED)
+            references = self.fleet_service.reference_cache().stats()
+            status_label.config(text=f"{len(statements)} statement(s), {len(slow)} slow since the last reset; "
+                                     f"reference cache {references['hits']} hit(s), {references['misses']} miss(es), "
+                                     f"{references['entries']} entries")
+
+        def apply_threshold():
+            try:
+                threshold = float(threshold_entry.get())
+            except ValueError:
+                messagebox.showerror("Error", "The threshold must be a number of milliseconds.")
+                return
+            querylog.set_threshold(threshold)
+            show()
+
+        def reset():
+            querylog.reset()
+            show()
+
+        def export():
+            path = filedialog.asksaveasfilename(parent=perf_window, defaultextension=".json", initialfile="querylog.json",
+                                                filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+            if not path:
+                return
+            count = querylog.dump(path)
+            messagebox.showinfo("Export Finished", f"Exported {count} statement(s) to {path}.")
+
+        tk.Button(controls, text="Apply", command=apply_threshold).grid(row=0, column=2, padx=5)
+        tk.Button(controls, text="Refresh", command=show).grid(row=0, column=3, padx=5)
+        tk.Button(controls, text="Reset", command=reset).grid(row=0, column=4, padx=5)
+        tk.Button(controls, text="Export...", command=export).grid(row=0, column=5, padx=5)
+        show()
+
+    def import_export_data(self):
+        """Admin function to bulk import or export buses, routes, drivers and schedules."""
+        self.data_window = tk.Toplevel(self.root)
+        self.data_window.title("Import / Export Data")
+        self.data_window.geometry("400x250")
+        self.data_window.resizable(False, False)
+
+        tk.Label(self.data_window, text="Table:", font=("Arial", 12)).pack(pady=10)
+        table = tk.StringVar(value="buses")
+        tk.OptionMenu(self.data_window, table, *bulk_io.TABLES).pack(pady=5)
+
+        file_types = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")]
+
+        def import_data():
+            path = filedialog.askopenfilename(parent=self.data_window, filetypes=file_types)
+            if not path:
+                return
+
+            def show_result(result):
+                message = f"Imported {result.imported} row(s) into {table.get()}."
+                if result.rejected:
+                    reasons = "\n".join(f"Line {line}: {reason}" for line, reason in result.rejected[:10])
+                    message += (f"\n\nRejected {len(result.rejected)} row(s); all reasons were saved to "
+                                f"{path}.rejected.csv. First rejections:\n{reasons}")
+                messagebox.showinfo("Import Finished", message)
+
+            self.run_query(self.fleet_service.import_file, table.get(), path, on_result=show_result)
+
+        def export_data():
+            path = filedialog.asksaveasfilename(parent=self.data_window, filetypes=file_types, defaultextension=".csv",
+                                                initialfile=f"{table.get()}.csv")
+            if not path:
+                return
+            self.run_query(self.fleet_service.export_table, table.get(), path,
+                           on_result=lambda count: messagebox.showinfo("Export Finished", f"Exported {count} row(s) to {path}."))
+
+        tk.Button(self.data_window, text="Import File...", font=("Arial", 12), command=import_data).pack(pady=10)
+        tk.Button(self.data_window, text="Export File...", font=("Arial", 12), command=export_data).pack(pady=10)
+
     def manage_buses(self):
         """Admin function to manage buses."""
         self.manage_buses_window = tk.Toplevel(self.root)
@@ -344,6 +558,11 @@ class BusAppGUI:
         arrival_time_entry = tk.Entry(self.add_bus_window)
         arrival_time_entry.grid(row=10, column=1, padx=10, pady=5)
 
+        # Seat classes priced ahead of the base ticket price, e.g. "Business:8@1500, 12@1200"
+        tk.Label(self.add_bus_window, text="Seat Tiers (optional):").grid(row=11, column=0, padx=10, pady=5)
+        seat_tiers_entry = tk.Entry(self.add_bus_window)
+        seat_tiers_entry.grid(row=11, column=1, padx=10, pady=5)
+
         def save_bus():
             """Save bus details to the database."""
             bus_name = bus_name_entry.get()
@@ -358,45 +577,25 @@ class BusAppGUI:
             departure_date = departure_date_entry.get()
             departure_time = departure_time_entry.get()
             arrival_time = arrival_time_entry.get()
+            try:
+                seat_tiers = inventory.parse_tiers(seat_tiers_entry.get())
+            except ValueError as e:
+                messagebox.showerror("Invalid Seat Tiers", str(e))
+                return
 
-            with get_connection() as conn:
-                cur = conn.cursor()
-
-                # Insert route details
-                cur.execute("INSERT INTO routes (route_name, stops) VALUES (?, ?)", (route_name, stops))
-                route_id = cur.lastrowid
-
-                # Insert bus details
-                cur.execute(
-                    """
-                    INSERT INTO buses (name, number, route_id, ticket_price, capacity, driver_id1, driver_id2)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (bus_name, bus_number, route_id, ticket_price, capacity, driver1, driver2)
-                )
-                bus_id = cur.lastrowid
-
-                # Insert schedule details
-                cur.execute(
-                    """
-                    INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (bus_id, route_id, departure_date, departure_time, arrival_time)
-                )
-
-                # Update driver assignments
-                cur.execute("INSERT INTO driver_assignments (bus_id, driver_id) VALUES (?, ?)", (bus_id, driver1))
-                if driver2:
-                    cur.execute("INSERT INTO driver_assignments (bus_id, driver_id) VALUES (?, ?)", (bus_id, driver2))
-
-                conn.commit()
+            def added(_):
                 messagebox.showinfo("Success", "Bus added successfully!")
                 self.add_bus_window.destroy()
 
+            # conflicts.ScheduleConflict (a driver already on the road) or a malformed date or time
+            # arrive as a ValueError
+            self.run_query(self.fleet_service.add_bus, bus_name, bus_number, ticket_price, capacity, route_name, stops,
+                           driver1, driver2, departure_date, departure_time, arrival_time, seat_tiers,
+                           on_result=added, on_error=lambda e: messagebox.showerror("Error", f"Failed to add bus: {str(e)}"))
+
         # Save Button
         save_button = tk.Button(self.add_bus_window, text="Save", command=save_bus)
-        save_button.grid(row=11, columnspan=2, pady=20)
+        save_button.grid(row=12, columnspan=2, pady=20)
 
     def update_bus(self):
         """Admin function to update an existing bus."""
@@ -406,10 +605,7 @@ class BusAppGUI:
         self.update_bus_window.resizable(False, False)
 
         # Load buses from the database
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT bus_id, name FROM buses")
-            buses = cur.fetchall()
+        buses = self.fleet_service.list_buses()
 
         bus_list = [bus[1] for bus in buses]
         selected_bus = tk.StringVar()
@@ -441,25 +637,21 @@ class BusAppGUI:
                 messagebox.showerror("Error", "Failed to fetch bus details.")
                 return
 
-            with get_connection() as conn:
-                cur = conn.cursor()
+            # Fetch bus details
+            bus_details = self.fleet_service.get_bus(bus_id)
 
-                # Fetch bus details
-                cur.execute("SELECT * FROM buses WHERE bus_id = ?", (bus_id,))
-                bus_details = cur.fetchone()
-
-                if not bus_details:
-                    messagebox.showerror("Error", "Bus details not found.")
-                    return
+            if not bus_details:
+                messagebox.showerror("Error", "Bus details not found.")
+                return
 
-                # Populate fields
-                entries[0].delete(0, tk.END)
-                entries[0].insert(0, bus_details[1])  # Bus Name
-                entries[1].delete(0, tk.END)
-                entries[1].insert(0, bus_details[2])  # Bus Number
+            # Populate fields
+            entries[0].delete(0, tk.END)
+            entries[0].insert(0, bus_details[1])  # Bus Name
+            entries[1].delete(0, tk.END)
+            entries[1].insert(0, bus_details[2])  # Bus Number
 
-                # Additional queries for route, drivers, and schedule
-                # (Repeat logic from original implementation as needed)
+            # Additional queries for route, drivers, and schedule
+            # (Repeat logic from original implementation as needed)
 
         fetch_button = tk.Button(self.update_bus_window, text="Fetch Details", command=fetch_and_update)
         fetch_button.grid(row=12, columnspan=2, pady=10)
@@ -488,10 +680,7 @@ class BusAppGUI:
         self.delete_bus_window.title("Delete Bus")
         self.delete_bus_window.geometry("400x300")
 
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT bus_id, name FROM buses")
-            buses = cur.fetchall()
+        buses = self.fleet_service.list_buses()
 
         bus_names = [bus[1] for bus in buses]
         selected_bus = tk.StringVar()
@@ -513,18 +702,12 @@ class BusAppGUI:
                 messagebox.showerror("Error", "Failed to fetch bus ID.")
                 return
 
-            try:
-                with get_connection() as conn:
-                    cur = conn.cursor()
-                    cur.execute("DELETE FROM buses WHERE bus_id = ?", (bus_id,))
-                    cur.execute("DELETE FROM schedules WHERE bus_id = ?", (bus_id,))
-                    cur.execute("DELETE FROM driver_assignments WHERE bus_id = ?", (bus_id,))
-                    conn.commit()
-
+            def deleted(_):
                 messagebox.showinfo("Success", f"Bus '{bus_name}' deleted successfully!")
                 self.delete_bus_window.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+
+            self.run_query(self.fleet_service.delete_bus, bus_id, on_result=deleted,
+                           on_error=lambda e: messagebox.showerror("Error", str(e)))
 
         delete_button = tk.Button(self.delete_bus_window, text="Delete Bus", command=delete_selected_bus)
         delete_button.pack(pady=20)
@@ -543,24 +726,12 @@ class BusAppGUI:
         # Title label
         tk.Label(self.manage_routes_window, text="Manage Routes", font=("Arial", 16)).pack(pady=10)
 
-        # Fetch all routes from the database
-        def fetch_routes():
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT route_id, route_name, stops FROM routes")
-                return cur.fetchall()
-
-        # Refresh the route list display
-        def refresh_route_list():
-            routes_listbox.delete(0, tk.END)
-            routes = fetch_routes()
-            for route in routes:
-                routes_listbox.insert(tk.END, f"{route[1]} - Stops: {route[2]}")
-
-        # Route listbox to display routes
-        routes_listbox = tk.Listbox(self.manage_routes_window, width=70, height=15)
+        # Routes are loaded page by page as the list scrolls; the filter runs in SQL
+        routes_listbox = widgets.PagedListbox(self.manage_routes_window, self.fleet_service.routes_page,
+                                              lambda route: f"{route[1]} - Stops: {route[2]}",
+                                              searchable=True, width=70, height=15)
         routes_listbox.pack(pady=10)
-        refresh_route_list()
+        refresh_route_list = routes_listbox.reload
 
         # Add new route functionality
         def add_route():
@@ -585,27 +756,23 @@ class BusAppGUI:
                     messagebox.showerror("Error", "All fields are required.")
                     return
 
-                with get_connection() as conn:
-                    try:
-                        cur = conn.cursor()
-                        cur.execute("INSERT INTO routes (route_name, stops) VALUES (?, ?)", (route_name, stops))
-                        conn.commit()
-                        messagebox.showinfo("Success", "Route added successfully!")
-                        add_route_window.destroy()
-                        refresh_route_list()
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to add route: {str(e)}")
+                def added(_):
+                    messagebox.showinfo("Success", "Route added successfully!")
+                    add_route_window.destroy()
+                    refresh_route_list()
+
+                self.run_query(self.fleet_service.add_route, route_name, stops, on_result=added,
+                               on_error=lambda e: messagebox.showerror("Error", f"Failed to add route: {str(e)}"))
 
             tk.Button(add_route_window, text="Save", command=save_new_route).pack(pady=10)
 
         # Update route functionality
         def update_route():
-            selected_index = routes_listbox.curselection()
-            if not selected_index:
+            selected_route = routes_listbox.selected_row()
+            if not selected_route:
                 messagebox.showerror("Error", "Please select a route to update.")
                 return
 
-            selected_route = fetch_routes()[selected_index[0]]
             route_id, route_name, stops = selected_route
 
             update_route_window = tk.Toplevel(self.manage_routes_window)
@@ -631,42 +798,32 @@ class BusAppGUI:
                     messagebox.showerror("Error", "All fields are required.")
                     return
 
-                with get_connection() as conn:
-                    try:
-                        cur = conn.cursor()
-                        cur.execute(
-                            "UPDATE routes SET route_name = ?, stops = ? WHERE route_id = ?",
-                            (updated_name, updated_stops, route_id),
-                        )
-                        conn.commit()
-                        messagebox.showinfo("Success", "Route updated successfully!")
-                        update_route_window.destroy()
-                        refresh_route_list()
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to update route: {str(e)}")
+                def updated(_):
+                    messagebox.showinfo("Success", "Route updated successfully!")
+                    update_route_window.destroy()
+                    refresh_route_list()
+
+                self.run_query(self.fleet_service.update_route, route_id, updated_name, updated_stops, on_result=updated,
+                               on_error=lambda e: messagebox.showerror("Error", f"Failed to update route: {str(e)}"))
 
             tk.Button(update_route_window, text="Save Changes", command=save_updated_route).pack(pady=10)
 
         # Delete route functionality
         def delete_route():
-            selected_index = routes_listbox.curselection()
-            if not selected_index:
+            selected_route = routes_listbox.selected_row()
+            if not selected_route:
                 messagebox.showerror("Error", "Please select a route to delete.")
                 return
 
-            selected_route = fetch_routes()[selected_index[0]]
             route_id, route_name, _ = selected_route
 
             if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete route '{route_name}'?"):
-                with get_connection() as conn:
-                    try:
-                        cur = conn.cursor()
-                        cur.execute("DELETE FROM routes WHERE route_id = ?", (route_id,))
-                        conn.commit()
-                        messagebox.showinfo("Success", "Route deleted successfully!")
-                        refresh_route_list()
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to delete route: {str(e)}")
+                def deleted(_):
+                    messagebox.showinfo("Success", "Route deleted successfully!")
+                    refresh_route_list()
+
+                self.run_query(self.fleet_service.delete_route, route_id, on_result=deleted,
+                               on_error=lambda e: messagebox.showerror("Error", f"Failed to delete route: {str(e)}"))
 
         # Buttons for managing routes
         buttons_frame = tk.Frame(self.manage_routes_window)
@@ -686,19 +843,18 @@ class BusAppGUI:
         # Create a new window for managing drivers
         self.driver_window = tk.Toplevel(self.root)
         self.driver_window.title("Manage Drivers")
-        self.driver_window.geometry("600x400")
+        self.driver_window.geometry("600x450")
         self.driver_window.resizable(False, False)
 
         # Title Label
         tk.Label(self.driver_window, text="Manage Drivers", font=("Arial", 16)).pack(pady=10)
 
-        # List of drivers
-        self.driver_listbox = tk.Listbox(self.driver_window, width=50, height=10)
+        # List of drivers, loaded page by page as it scrolls
+        self.driver_listbox = widgets.PagedListbox(self.driver_window, self.fleet_service.drivers_page,
+                                                   lambda driver: f"{driver[1]} - {driver[2]}",  # name - license_number
+                                                   searchable=True)
         self.driver_listbox.pack(pady=10)
 
-        # Fetch drivers and display them
-        self.fetch_drivers()
-
         # Add Driver Button
         add_driver_button = tk.Button(self.driver_window, text="Add Driver", font=("Arial", 12), command=self.add_driver)
         add_driver_button.pack(pady=10)
@@ -713,17 +869,7 @@ class BusAppGUI:
 
     def fetch_drivers(self):
         """Fetch and display drivers."""
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT driver_id, name, license_number FROM drivers")
-            drivers = cur.fetchall()
-
-        # Clear the listbox
-        self.driver_listbox.delete(0, tk.END)
-
-        # Populate the listbox with driver names
-        for driver in drivers:
-            self.driver_listbox.insert(tk.END, f"{driver[1]} - {driver[2]}")  # name - license_number
+        self.driver_listbox.reload()
 
     def add_driver(self):
         """Add a new driver."""
@@ -733,165 +879,150 @@ class BusAppGUI:
         address = simpledialog.askstring("Add Driver", "Enter driver's address:")
 
         if name and license_number and phone and address:
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO drivers (name, license_number, phone, address)
-                    VALUES (?, ?, ?, ?)
-                """, (name, license_number, phone, address))
-                conn.commit()
+            def added(_):
+                messagebox.showinfo("Driver Added", "Driver has been successfully added.")
+                self.fetch_drivers()
 
-            messagebox.showinfo("Driver Added", "Driver has been successfully added.")
-            self.fetch_drivers()
+            self.run_query(self.fleet_service.add_driver, name, license_number, phone, address, on_result=added)
 
     def update_driver(self):
         """Update an existing driver."""
-        selected_driver = self.driver_listbox.curselection()
-        if selected_driver:
-            driver_info = self.driver_listbox.get(selected_driver[0]).split(" - ")
-            driver_name = driver_info[0]
-            
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT driver_id, name, license_number, phone, address FROM drivers WHERE name = ?", (driver_name,))
-                driver = cur.fetchone()
-
+        driver = self.driver_listbox.selected_row()
+        if driver:
             # Ask for updated details
             new_name = simpledialog.askstring("Update Driver", f"Enter new name (current: {driver[1]}):", initialvalue=driver[1])
             new_license = simpledialog.askstring("Update Driver", f"Enter new license number (current: {driver[2]}):", initialvalue=driver[2])
             new_phone = simpledialog.askstring("Update Driver", f"Enter new phone number (current: {driver[3]}):", initialvalue=driver[3])
             new_address = simpledialog.askstring("Update Driver", f"Enter new address (current: {driver[4]}):", initialvalue=driver[4])
 
+            def updated(_):
+                messagebox.showinfo("Driver Updated", "Driver details have been successfully updated.")
+                self.fetch_drivers()
+
             # Update the database
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    UPDATE drivers
-                    SET name = ?, license_number = ?, phone = ?, address = ?
-                    WHERE driver_id = ?
-                """, (new_name, new_license, new_phone, new_address, driver[0]))
-                conn.commit()
-
-            messagebox.showinfo("Driver Updated", "Driver details have been successfully updated.")
-            self.fetch_drivers()
+            self.run_query(self.fleet_service.update_driver, driver[0], new_name, new_license, new_phone, new_address,
+                           on_result=updated)
 
     def delete_driver(self):
         """Delete a driver."""
-        selected_driver = self.driver_listbox.curselection()
-        if selected_driver:
-            driver_info = self.driver_listbox.get(selected_driver[0]).split(" - ")
-            driver_name = driver_info[0]
-            
+        driver = self.driver_listbox.selected_row()
+        if driver:
+            driver_id, driver_name = driver[0], driver[1]
+
             confirm_delete = messagebox.askyesno("Delete Driver", f"Are you sure you want to delete driver {driver_name}?")
             if confirm_delete:
-                with get_connection() as conn:
-                    cur = conn.cursor()
-                    cur.execute("DELETE FROM drivers WHERE name = ?", (driver_name,))
-                    conn.commit()
+                def deleted(_):
+                    messagebox.showinfo("Driver Deleted", "Driver has been successfully deleted.")
+                    self.fetch_drivers()
 
-                messagebox.showinfo("Driver Deleted", "Driver has been successfully deleted.")
-                self.fetch_drivers()
+                self.run_query(self.fleet_service.delete_driver, driver_id, on_result=deleted)
 
 
 
     def manage_tickets(self):
-        """Admin function to manage tickets."""
+        """Admin function to edit the seat layout (class and price of each seat) of every bus.
+
+        Seats are sold per departure, so this screen shows no sold/unsold
+        status; passengers' tickets are managed from the booking screens.
+        """
         
         self.ticket_window = tk.Toplevel(self.root)
-        self.ticket_window.title("Manage Tickets")
-        self.ticket_window.geometry("600x400")
+        self.ticket_window.title("Manage Seat Layouts")
+        self.ticket_window.geometry("600x500")
         self.ticket_window.resizable(False, False)
 
-        tk.Label(self.ticket_window, text="Manage Tickets", font=("Arial", 16)).pack(pady=10)
+        tk.Label(self.ticket_window, text="Manage Seat Layouts", font=("Arial", 16)).pack(pady=10)
 
-        # Listbox to show all tickets
-        self.ticket_listbox = tk.Listbox(self.ticket_window, width=50, height=10)
+        # Seats are loaded page by page as the list scrolls
+        self.ticket_listbox = widgets.PagedListbox(self.ticket_window, self.fleet_service.tickets_page,
+                                                   lambda seat: f"{seat[1]} - Seat {seat[2]} - {seat[4] or 'Standard'} - ${seat[3]}",
+                                                   searchable=True)
         self.ticket_listbox.pack(pady=10)
 
-        self.fetch_tickets()
-
-        add_ticket_button = tk.Button(self.ticket_window, text="Add Ticket", font=("Arial", 12), command=self.add_ticket)
+        add_ticket_button = tk.Button(self.ticket_window, text="Add Seat", font=("Arial", 12), command=self.add_ticket)
         add_ticket_button.pack(pady=10)
 
-        update_ticket_button = tk.Button(self.ticket_window, text="Update Ticket", font=("Arial", 12), command=self.update_ticket)
+        update_ticket_button = tk.Button(self.ticket_window, text="Update Seat", font=("Arial", 12), command=self.update_ticket)
         update_ticket_button.pack(pady=10)
 
-        delete_ticket_button = tk.Button(self.ticket_window, text="Delete Ticket", font=("Arial", 12), command=self.delete_ticket)
+        delete_ticket_button = tk.Button(self.ticket_window, text="Delete Seat", font=("Arial", 12), command=self.delete_ticket)
         delete_ticket_button.pack(pady=10)
 
-    def fetch_tickets(self):
-        """Fetch and display tickets."""
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT tickets.ticket_id, buses.name, tickets.seat_number, tickets.price, tickets.status
-                FROM tickets
-                JOIN buses ON tickets.bus_id = buses.bus_id
-            """)
-            tickets = cur.fetchall()
-
-        self.ticket_listbox.delete(0, tk.END)
+        regenerate_button = tk.Button(self.ticket_window, text="Regenerate Inventory", font=("Arial", 12), command=self.regenerate_inventory)
+        regenerate_button.pack(pady=10)
 
-        for ticket in tickets:
-            self.ticket_listbox.insert(tk.END, f"{ticket[1]} - Seat {ticket[2]} - Status: {ticket[4]}")
+    def fetch_tickets(self):
+        """Fetch and display the seat layouts."""
+        self.ticket_listbox.reload()
 
     def add_ticket(self):
-        """Add a new ticket for a bus."""
-        bus_id = simpledialog.askinteger("Add Ticket", "Enter Bus ID for the ticket:")
-        seat_number = simpledialog.askinteger("Add Ticket", "Enter seat number:")
-        seat_id = f"{bus_id}-{seat_number}"  # Combine bus ID and seat number to generate a unique seat ID
-        price = simpledialog.askfloat("Add Ticket", "Enter price for the ticket:")
+        """Add a seat to a bus's layout."""
+        bus_id = simpledialog.askinteger("Add Seat", "Enter Bus ID for the seat:")
+        seat_number = simpledialog.askinteger("Add Seat", "Enter seat number:")
+        price = simpledialog.askfloat("Add Seat", "Enter price for the seat:")
+        seat_class = simpledialog.askstring("Add Seat", "Seat class (optional):")
 
         if bus_id and seat_number and price:
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO tickets (bus_id, seat_number, seat_id, price, status)
-                    VALUES (?, ?, ?, ?, 'unsold')
-                """, (bus_id, seat_number, seat_id, price))
-                conn.commit()
-
-            messagebox.showinfo("Ticket Added", "Ticket has been successfully added.")
+            def added(_):
+                messagebox.showinfo("Seat Added", "Seat has been successfully added.")
+                self.fetch_tickets()
+
+            self.run_query(self.fleet_service.add_ticket, bus_id, seat_number, price, seat_class or None, on_result=added)
+
+    def regenerate_inventory(self):
+        """Regenerate every seat of a bus and its departures from the bus's capacity."""
+        bus_id = simpledialog.askinteger("Regenerate Inventory", "Enter Bus ID:")
+        if not bus_id:
+            return
+        tiers_text = simpledialog.askstring("Regenerate Inventory", "Seat tiers (optional), e.g. Business:8@1500, 12@1200:")
+        try:
+            seat_tiers = inventory.parse_tiers(tiers_text)
+        except ValueError as e:
+            messagebox.showerror("Invalid Seat Tiers", str(e))
+            return
+
+        def show_result(result):
+            if result is None:
+                messagebox.showerror("Regenerate Inventory", f"No bus with ID {bus_id}.")
+                return
+            seats, departures = result
+            messagebox.showinfo("Inventory Regenerated", f"Generated {seats} seat(s) across {departures} departure(s).")
             self.fetch_tickets()
 
+        self.run_query(self.fleet_service.regenerate_inventory, bus_id, seat_tiers, on_result=show_result)
+
     def update_ticket(self):
-        """Update an existing ticket."""
-        selected_ticket = self.ticket_listbox.curselection()
-        if selected_ticket:
-            ticket_info = self.ticket_listbox.get(selected_ticket[0]).split(" - ")
-            bus_name = ticket_info[0]
-
-            new_status = simpledialog.askstring("Update Ticket", f"Enter new status (current: {ticket_info[2]}):", initialvalue=ticket_info[2])
-
-            if new_status:
-                with get_connection() as conn:
-                    cur = conn.cursor()
-                    cur.execute("""
-                        UPDATE tickets
-                        SET status = ?
-                        WHERE seat_id = ?
-                    """, (new_status, ticket_info[1]))
-                    conn.commit()
-
-                messagebox.showinfo("Ticket Updated", "Ticket status has been updated.")
+        """Change the price and class of a seat for future bookings."""
+        seat = self.ticket_listbox.selected_row()
+        if seat:
+            seat_id, price, seat_class = seat[5], seat[3], seat[4]
+
+            new_price = simpledialog.askfloat("Update Seat", f"Enter new price (current: {price}):", initialvalue=price)
+            if new_price is None:
+                return
+            new_class = simpledialog.askstring("Update Seat", "Seat class (empty for standard):", initialvalue=seat_class or "")
+            if new_class is None:
+                return
+
+            def updated(_):
+                messagebox.showinfo("Seat Updated", "Seat price and class have been updated.")
                 self.fetch_tickets()
 
+            self.run_query(self.fleet_service.update_ticket, seat_id, new_price, new_class or None, on_result=updated)
+
     def delete_ticket(self):
-        """Delete a ticket."""
-        selected_ticket = self.ticket_listbox.curselection()
-        if selected_ticket:
-            ticket_info = self.ticket_listbox.get(selected_ticket[0]).split(" - ")
-            seat_id = ticket_info[1]
-            
-            confirm_delete = messagebox.askyesno("Delete Ticket", f"Are you sure you want to delete ticket for seat {seat_id}?")
+        """Remove a seat from its bus's layout."""
+        seat = self.ticket_listbox.selected_row()
+        if seat:
+            seat_id = seat[5]
+
+            confirm_delete = messagebox.askyesno("Delete Seat", f"Remove seat {seat_id} from the layout? It will sell at the bus's base price.")
             if confirm_delete:
-                with get_connection() as conn:
-                    cur = conn.cursor()
-                    cur.execute("DELETE FROM tickets WHERE seat_id = ?", (seat_id,))
-                    conn.commit()
+                def deleted(_):
+                    messagebox.showinfo("Seat Deleted", "Seat has been removed from the layout.")
+                    self.fetch_tickets()
 
-                messagebox.showinfo("Ticket Deleted", "Ticket has been successfully deleted.")
-                self.fetch_tickets()
+                self.run_query(self.fleet_service.delete_ticket, seat_id, on_result=deleted)
 
 
 
@@ -906,89 +1037,54 @@ class BusAppGUI:
         # Title label
         tk.Label(self.manage_schedule_window, text="Manage Schedule", font=("Arial", 16)).pack(pady=10)
 
-        # Fetch all buses and routes for schedule management
-        def fetch_buses():
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT bus_id, name FROM buses")
-                return cur.fetchall()
-
-        def fetch_routes():
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT route_id, route_name FROM routes")
-                return cur.fetchall()
-
-        # Refresh bus list
-        def refresh_bus_list():
-            bus_listbox.delete(0, tk.END)
-            buses = fetch_buses()
-            for bus in buses:
-                bus_listbox.insert(tk.END, f"Bus ID: {bus[0]} - Name: {bus[1]}")
-
-        # Refresh route list
-        def refresh_route_list():
-            route_listbox.delete(0, tk.END)
-            routes = fetch_routes()
-            for route in routes:
-                route_listbox.insert(tk.END, f"Route ID: {route[0]} - Name: {route[1]}")
-
-        # Bus selection listbox
-        bus_listbox = tk.Listbox(self.manage_schedule_window, width=70, height=10)
+        # Bus and route selection lists, loaded page by page as they scroll;
+        # a selection maps straight to its ID without re-reading either table
+        bus_listbox = widgets.PagedListbox(self.manage_schedule_window, self.schedule_service.buses_page,
+                                           lambda bus: f"Bus ID: {bus[0]} - Name: {bus[1]}", width=70, height=10)
         bus_listbox.pack(pady=10)
-        refresh_bus_list()
 
-        # Route selection listbox
-        route_listbox = tk.Listbox(self.manage_schedule_window, width=70, height=10)
+        route_listbox = widgets.PagedListbox(self.manage_schedule_window, self.schedule_service.routes_page,
+                                             lambda route: f"Route ID: {route[0]} - Name: {route[1]}", width=70, height=10)
         route_listbox.pack(pady=10)
-        refresh_route_list()
 
-        # Fetch schedules for a selected bus
-        def fetch_schedules(bus_id):
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT schedule_id, departure_date, departure_time, arrival_time, route_id FROM schedules WHERE bus_id = ?", (bus_id,))
-                return cur.fetchall()
+        # The bus whose schedules are listed; None until one is chosen
+        selected_bus = {"bus_id": None}
+
+        def fetch_schedules(sort, descending, after, limit, search):
+            return self.schedule_service.schedules_page(selected_bus["bus_id"], sort, descending, after, limit, search)
 
         # Display schedules for the selected bus
         def display_schedules(bus_id):
-            schedule_listbox.delete(0, tk.END)
-            schedules = fetch_schedules(bus_id)
-            for schedule in schedules:
-                route_name = next((route[1] for route in fetch_routes() if route[0] == schedule[4]), "Unknown")
-                schedule_listbox.insert(tk.END, f"Schedule ID: {schedule[0]} - Route: {route_name} - Departure: {schedule[1]} {schedule[2]} - Arrival: {schedule[3]}")
+            selected_bus["bus_id"] = bus_id
+            schedule_listbox.reload()
 
         # Schedule listbox to show schedule details for the selected bus
-        schedule_listbox = tk.Listbox(self.manage_schedule_window, width=70, height=10)
+        schedule_listbox = widgets.PagedListbox(
+            self.manage_schedule_window, fetch_schedules,
+            lambda schedule: f"Schedule ID: {schedule[0]} - Route: {schedule[5] or 'Unknown'} - "
+                             f"Departure: {schedule[1]} {schedule[2]} - Arrival: {schedule[3]}",
+            width=70, height=10,
+        )
         schedule_listbox.pack(pady=10)
 
         # Select a bus and show corresponding schedules
         def select_bus_and_show_schedules():
-            selected_index = bus_listbox.curselection()
-            if not selected_index:
+            bus_id = bus_listbox.selected_key()
+            if bus_id is None:
                 messagebox.showerror("Error", "Please select a bus.")
                 return
 
-            selected_bus = fetch_buses()[selected_index[0]]
-            bus_id = selected_bus[0]
-
             display_schedules(bus_id)
 
         # Add schedule functionality
         def add_schedule():
-            selected_bus_index = bus_listbox.curselection()
-            selected_route_index = route_listbox.curselection()
+            bus_id = bus_listbox.selected_key()
+            route_id = route_listbox.selected_key()
 
-            if not selected_bus_index or not selected_route_index:
+            if bus_id is None or route_id is None:
                 messagebox.showerror("Error", "Please select both a bus and a route.")
                 return
 
-            selected_bus = fetch_buses()[selected_bus_index[0]]
-            bus_id = selected_bus[0]
-
-            selected_route = fetch_routes()[selected_route_index[0]]
-            route_id = selected_route[0]
-
             # Get date and time input for the new schedule
             departure_date = departure_date_entry.get()
             departure_time = departure_time_entry.get()
@@ -998,28 +1094,21 @@ class BusAppGUI:
                 messagebox.showerror("Error", "Please provide valid date and time.")
                 return
 
-            with get_connection() as conn:
-                try:
-                    cur = conn.cursor()
-                    cur.execute(
-                        "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, ?, ?)",
-                        (bus_id, route_id, departure_date, departure_time, arrival_time),
-                    )
-                    conn.commit()
-                    messagebox.showinfo("Success", "Schedule added successfully!")
-                    display_schedules(bus_id)
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to add schedule: {str(e)}")
+            def added(_):
+                messagebox.showinfo("Success", "Schedule added successfully!")
+                display_schedules(bus_id)
+
+            self.run_query(self.schedule_service.add_schedule, bus_id, route_id, departure_date, departure_time, arrival_time,
+                           on_result=added, on_error=lambda e: messagebox.showerror("Error", f"Failed to add schedule: {str(e)}"))
 
         # Update schedule functionality
         def update_schedule():
-            selected_index = schedule_listbox.curselection()
-            if not selected_index:
+            selected_schedule = schedule_listbox.selected_row()
+            if not selected_schedule:
                 messagebox.showerror("Error", "Please select a schedule to update.")
                 return
 
-            selected_schedule = fetch_schedules(selected_bus_id)[selected_index[0]]
-            schedule_id, _, _, _, route_id = selected_schedule
+            schedule_id = selected_schedule[0]
 
             update_schedule_window = tk.Toplevel(self.manage_schedule_window)
             update_schedule_window.title("Update Schedule")
@@ -1046,42 +1135,104 @@ class BusAppGUI:
                 updated_departure_time = departure_time_entry.get()
                 updated_arrival_time = arrival_time_entry.get()
 
-                with get_connection() as conn:
-                    try:
-                        cur = conn.cursor()
-                        cur.execute(
-                            "UPDATE schedules SET departure_date = ?, departure_time = ?, arrival_time = ? WHERE schedule_id = ?",
-                            (updated_departure_date, updated_departure_time, updated_arrival_time, schedule_id),
-                        )
-                        conn.commit()
-                        messagebox.showinfo("Success", "Schedule updated successfully!")
-                        update_schedule_window.destroy()
-                        display_schedules(selected_bus_id)
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to update schedule: {str(e)}")
+                def updated(_):
+                    messagebox.showinfo("Success", "Schedule updated successfully!")
+                    update_schedule_window.destroy()
+                    schedule_listbox.reload()
+
+                self.run_query(self.schedule_service.update_schedule, schedule_id, updated_departure_date,
+                               updated_departure_time, updated_arrival_time, on_result=updated,
+                               on_error=lambda e: messagebox.showerror("Error", f"Failed to update schedule: {str(e)}"))
 
             tk.Button(update_schedule_window, text="Save Changes", command=save_updated_schedule).pack(pady=10)
 
         # Delete schedule functionality
         def delete_schedule():
-            selected_index = schedule_listbox.curselection()
-            if not selected_index:
+            schedule_id = schedule_listbox.selected_key()
+            if schedule_id is None:
                 messagebox.showerror("Error", "Please select a schedule to delete.")
                 return
 
-            selected_schedule = fetch_schedules(selected_bus_id)[selected_index[0]]
-            schedule_id = selected_schedule[0]
-
             if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete schedule {schedule_id}?"):
-                with get_connection() as conn:
-                    try:
-                        cur = conn.cursor()
-                        cur.execute("DELETE FROM schedules WHERE schedule_id = ?", (schedule_id,))
-                        conn.commit()
-                        messagebox.showinfo("Success", "Schedule deleted successfully!")
-                        display_schedules(selected_bus_id)
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to delete schedule: {str(e)}")
+                def deleted(_):
+                    messagebox.showinfo("Success", "Schedule deleted successfully!")
+                    schedule_listbox.reload()
+
+                self.run_query(self.schedule_service.delete_schedule, schedule_id, on_result=deleted,
+                               on_error=lambda e: messagebox.showerror("Error", f"Failed to delete schedule: {str(e)}"))
+
+        # Add a recurring schedule rule and materialize its departures
+        def add_recurring_schedule():
+            bus_id = bus_listbox.selected_key()
+            route_id = route_listbox.selected_key()
+
+            if bus_id is None or route_id is None:
+                messagebox.showerror("Error", "Please select both a bus and a route.")
+                return
+
+            rule_window = tk.Toplevel(self.manage_schedule_window)
+            rule_window.title("Add Recurring Schedule")
+            rule_window.geometry("400x450")
+            rule_window.resizable(False, False)
+
+            fields = {}
+            for label, default in (("Days (Mon,Wed,Fri / daily / weekdays / weekends):", "daily"),
+                                   ("Start Date (YYYY-MM-DD):", ""),
+                                   ("End Date (YYYY-MM-DD):", ""),
+                                   ("Departure Time (HH:MM):", departure_time_entry.get()),
+                                   ("Arrival Time (HH:MM):", arrival_time_entry.get()),
+                                   ("Skip Dates (comma-separated, optional):", "")):
+                tk.Label(rule_window, text=label).pack(pady=5)
+                entry = tk.Entry(rule_window, width=40)
+                entry.insert(0, default)
+                entry.pack(pady=5)
+                fields[label] = entry
+
+            def save_rule():
+                days, start, end, departure, arrival, skip = (entry.get().strip() for entry in fields.values())
+                if not start or not end or not departure or not arrival:
+                    messagebox.showerror("Error", "Please provide the dates and times.")
+                    return
+                try:
+                    weekdays = recurrence.parse_weekdays(days)
+                    exceptions = recurrence.parse_exceptions(skip)
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e))
+                    return
+
+                def saved(result):
+                    _, created, clashes = result
+                    message = f"{created} departures created."
+                    if clashes:
+                        message += (f"\n{len(clashes)} skipped because they already existed or would double-book "
+                                    f"the bus or a driver, e.g. {clashes[0].departure_date}.")
+                    messagebox.showinfo("Success", message)
+                    rule_window.destroy()
+                    display_schedules(bus_id)
+
+                self.run_query(self.schedule_service.add_rule, bus_id, route_id, departure, arrival,
+                               weekdays, start, end, exceptions, on_result=saved)
+
+            tk.Button(rule_window, text="Save Rule", command=save_rule).pack(pady=10)
+
+        # Report every bus and driver double-booking in the timetable
+        def audit_conflicts():
+            def show(found):
+                if not found:
+                    messagebox.showinfo("Schedule Audit", "No buses or drivers are double-booked.")
+                    return
+                audit_window = tk.Toplevel(self.manage_schedule_window)
+                audit_window.title("Schedule Audit")
+                audit_window.geometry("600x400")
+                tk.Label(audit_window, text=f"{len(found)} double-bookings found", font=("Arial", 12)).pack(pady=10)
+                audit_listbox = tk.Listbox(audit_window, width=90, height=18)
+                audit_listbox.pack(pady=5)
+                for conflict in found:
+                    audit_listbox.insert(tk.END, f"{conflict.resource.title()} {conflict.resource_id}: schedule "
+                                                 f"{conflict.schedule_id} overlaps schedule {conflict.other_id} "
+                                                 f"({conflict.start:%Y-%m-%d %H:%M} - {conflict.end:%H:%M})")
+
+            self.run_query(self.schedule_service.audit_conflicts, on_result=show)
 
         # Buttons for managing schedules
         buttons_frame = tk.Frame(self.manage_schedule_window)
@@ -1090,6 +1241,8 @@ class BusAppGUI:
         tk.Button(buttons_frame, text="Add Schedule", command=add_schedule).grid(row=0, column=0, padx=10, pady=5)
         tk.Button(buttons_frame, text="Update Schedule", command=update_schedule).grid(row=0, column=1, padx=10, pady=5)
         tk.Button(buttons_frame, text="Delete Schedule", command=delete_schedule).grid(row=0, column=2, padx=10, pady=5)
+        tk.Button(buttons_frame, text="Add Recurring Schedule", command=add_recurring_schedule).grid(row=0, column=3, padx=10, pady=5)
+        tk.Button(buttons_frame, text="Audit Conflicts", command=audit_conflicts).grid(row=1, column=0, columnspan=4, pady=5)
 
         # Close the manage schedule window
         tk.Button(self.manage_schedule_window, text="Close", command=self.manage_schedule_window.destroy).pack(pady=10)
@@ -1121,20 +1274,6 @@ class BusAppGUI:
         # Title Label
         tk.Label(self.view_buses_window, text="Available Buses", font=("Arial", 16)).pack(pady=10)
 
-        # Fetch all buses with their details (including route, stops, schedules, and ticket prices)
-        def fetch_all_buses():
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT buses.bus_id, buses.name, buses.number, buses.ticket_price, buses.capacity, 
-                        routes.route_name, routes.stops
-                    FROM buses
-                    JOIN routes ON buses.route_id = routes.route_id
-                """)
-                return cur.fetchall()
-
-        all_buses = fetch_all_buses()
-
         # Create a treeview widget to display the bus details in a table format
         treeview = ttk.Treeview(self.view_buses_window, columns=("Bus Name", "Bus Number", "Route", "Stops", "Capacity", "Ticket Price"), show="headings")
         treeview.pack(pady=10, fill=tk.BOTH, expand=True)
@@ -1156,9 +1295,13 @@ class BusAppGUI:
         treeview.column("Ticket Price", width=100)
 
         # Insert rows of bus data into the treeview
-        for bus in all_buses:
-            bus_id, bus_name, bus_number, ticket_price, capacity, route_name, stops = bus
-            treeview.insert("", tk.END, values=(bus_name, bus_number, route_name, stops, capacity, ticket_price))
+        def show_buses(all_buses):
+            for bus in all_buses:
+                bus_id, bus_name, bus_number, ticket_price, capacity, route_name, stops = bus
+                treeview.insert("", tk.END, values=(bus_name, bus_number, route_name, stops, capacity, ticket_price))
+
+        # Fetch all buses with their details (including route, stops, schedules, and ticket prices)
+        self.run_query(self.fleet_service.bus_details, on_result=show_buses)
 
         # Optionally, create a double-click event to show more detailed information about a bus
         def view_bus_details(event):
@@ -1234,18 +1377,11 @@ class BusAppGUI:
             messagebox.showwarning("Search", "Please enter a search term.")
             return
 
-        # Fetch buses matching the search term
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT buses.bus_id, buses.name, buses.number, buses.ticket_price, buses.capacity, 
-                    routes.route_name
-                FROM buses
-                JOIN routes ON buses.route_id = routes.route_id
-                WHERE LOWER(buses.name) LIKE ? OR LOWER(routes.route_name) LIKE ?
-            """, (f"%{search_term}%", f"%{search_term}%"))
-            buses = cur.fetchall()
+        # Fetch buses matching the search term; a newer search supersedes this one
+        self.run_query(self.booking_service.search_buses, search_term, on_result=self.show_search_results, key="search")
 
+    def show_search_results(self, buses):
+        """Replace the search results treeview contents."""
         # Clear previous results
         for row in self.treeview.get_children():
             self.treeview.delete(row)
@@ -1253,7 +1389,7 @@ class BusAppGUI:
         # Insert matching buses into the treeview
         for bus in buses:
             bus_id, bus_name, bus_number, ticket_price, capacity, route_name = bus
-            self.treeview.insert("", tk.END, values=(bus_name, bus_number, route_name, ticket_price, capacity))
+            self.treeview.insert("", tk.END, text=bus_id, values=(bus_name, bus_number, route_name, ticket_price, capacity))
 
     def view_and_book_tickets(self, event):
         """View and book tickets for a selected bus."""
@@ -1274,57 +1410,76 @@ class BusAppGUI:
             tk.Label(self.ticket_window, text=f"Route: {route_name}", font=("Arial", 12)).pack(pady=5)
             tk.Label(self.ticket_window, text=f"Ticket Price: ${ticket_price}", font=("Arial", 12)).pack(pady=5)
 
-            # Fetch available seats for the selected bus
-            self.fetch_available_seats(bus_id)
+            # Departure Selection: seats are sold per departure
+            tk.Label(self.ticket_window, text="Select Departure:", font=("Arial", 12)).pack(pady=5)
+            self.departure_listbox = tk.Listbox(self.ticket_window, font=("Arial", 12), height=5, exportselection=False)
+            self.departure_listbox.pack(pady=5, fill=tk.X)
+            self.departure_ids = []
+
+            def show_departures(schedules):
+                self.departure_ids = [schedule[0] for schedule in schedules]
+                for schedule_id, departure_date, departure_time, arrival_time in schedules:
+                    self.departure_listbox.insert(tk.END, f"{departure_date} {departure_time} - {arrival_time}")
+
+            self.run_query(self.booking_service.bus_schedules, bus_id, on_result=show_departures, key="departures")
+            self.departure_listbox.bind("<<ListboxSelect>>", lambda event: self.populate_seats(self.selected_departure()))
 
             # Seat Selection
             tk.Label(self.ticket_window, text="Select Seats (Available seats are shown):", font=("Arial", 12)).pack(pady=10)
             self.seat_listbox = tk.Listbox(self.ticket_window, selectmode=tk.MULTIPLE, font=("Arial", 12), height=10)
             self.seat_listbox.pack(pady=10, fill=tk.BOTH, expand=True)
 
-            # Add available seats to the listbox
-            self.populate_seats(bus_id)
-
             # Button to confirm and book selected seats
-            book_button = tk.Button(self.ticket_window, text="Book Selected Tickets", font=("Arial", 12), command=lambda: self.book_tickets(bus_id, ticket_price, user_id))
+            book_button = tk.Button(self.ticket_window, text="Book Selected Tickets", font=("Arial", 12), command=lambda: self.book_tickets(self.selected_departure(), user_id))
             book_button.pack(pady=10)
 
-    def fetch_available_seats(self, bus_id):
-        """Fetch and show available seats for a given bus."""
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT seat_id FROM tickets WHERE bus_id = ? AND status = 'unsold'
-            """, (bus_id,))
-            available_seats = cur.fetchall()
-        return [seat[0] for seat in available_seats]
-
-    def populate_seats(self, bus_id):
-        """Populate available seats into the seat listbox."""
-        available_seats = self.fetch_available_seats(bus_id)
-        for seat in available_seats:
-            self.seat_listbox.insert(tk.END, seat)
-
-    def book_tickets(self, bus_id, ticket_price, user_id):
+    def selected_departure(self):
+        """Return the schedule_id of the departure selected in the ticket window, or None."""
+        selection = self.departure_listbox.curselection()
+        return self.departure_ids[selection[0]] if selection else None
+
+    def fetch_available_seats(self, schedule_id):
+        """Fetch and show available seats for a given departure."""
+        return self.booking_service.available_seats(schedule_id)
+
+    def populate_seats(self, schedule_id):
+        """Populate available seats for a departure into the seat listbox."""
+        self.seat_listbox.delete(0, tk.END)
+        if schedule_id is None:
+            return
+
+        def show_seats(available_seats):
+            for seat in available_seats:
+                self.seat_listbox.insert(tk.END, seat)
+
+        self.run_query(self.booking_service.available_seats, schedule_id, on_result=show_seats, key="seats")
+
+    def book_tickets(self, schedule_id, user_id):
         """Book selected tickets and process payment."""
+        if schedule_id is None:
+            messagebox.showwarning("Select Departure", "Please select a departure.")
+            return
         selected_seats = [self.seat_listbox.get(i) for i in self.seat_listbox.curselection()]
         if not selected_seats:
             messagebox.showwarning("Select Seats", "Please select at least one seat.")
             return
 
-        total_amount = len(selected_seats) * ticket_price
+        def show_booking(booked_results):
+            results, prices = booked_results
+            booked = booking.booked_seats(results)
+            if not booked:
+                taken = [str(seat) for seat, status in results.items() if status == booking.UNAVAILABLE]
+                messagebox.showerror("Booking Failed", f"These seats are no longer available: {', '.join(taken)}. No seats were booked.")
+                return
 
-        # Insert tickets into the database
-        with get_connection() as conn:
-            cur = conn.cursor()
-            for seat_id in selected_seats:
-                cur.execute("""
-                    INSERT INTO tickets (bus_id, seat_id, status, price, user_id)
-                    VALUES (?, ?, 'sold', ?, ?)
-                """, (bus_id, seat_id, ticket_price, user_id))
+            # Seat-class tiers can price seats differently, so add up what each seat was charged
+            total_amount = sum(prices.values())
 
-        messagebox.showinfo("Booking Successful", f"You have successfully booked {len(selected_seats)} seat(s) for a total of ${total_amount}.")
-        self.ticket_window.destroy()
+            messagebox.showinfo("Booking Successful", f"You have successfully booked {len(booked)} seat(s) for a total of ${total_amount}.")
+            self.ticket_window.destroy()
+
+        # Claim all selected seats in one transaction
+        self.run_query(self.booking_service.book_seats, schedule_id, selected_seats, user_id, on_result=show_booking)
 
 
     def prebook_bus(self, user_id):
@@ -1333,15 +1488,7 @@ class BusAppGUI:
         bus_name = simpledialog.askstring("Prebook Bus", "Enter the bus name you want to prebook:")
         
         # Fetch bus details and available schedule based on route and bus name
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT buses.bus_id, schedules.schedule_id, schedules.departure_date, schedules.departure_time
-                FROM buses
-                JOIN schedules ON buses.bus_id = schedules.bus_id
-                WHERE buses.name = ? AND buses.route_id = (SELECT route_id FROM routes WHERE route_name = ?)
-            """, (bus_name, route_name))
-            available_schedules = cur.fetchall()
+        available_schedules = self.booking_service.prebook_schedules(bus_name, route_name)
 
         if not available_schedules:
             messagebox.showwarning("No Schedules", "No schedules available for the selected bus and route.")
@@ -1353,15 +1500,14 @@ class BusAppGUI:
 
         # Prebook the bus
         if selected_schedule_id:
-            with get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO prebooked_buses (user_id, bus_id, prebook_date)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                """, (user_id, available_schedules[selected_schedule_id - 1][0]))  # Assume valid selection
-                conn.commit()
+            if selected_schedule_id not in {s[1] for s in available_schedules}:
+                messagebox.showerror("Prebook Bus", f"Schedule ID {selected_schedule_id} is not in the list.")
+                return
+            def prebooked(_):
+                messagebox.showinfo("Prebook Successful", f"Successfully prebooked the bus for schedule ID: {selected_schedule_id}.")
 
-            messagebox.showinfo("Prebook Successful", f"Successfully prebooked the bus for schedule ID: {selected_schedule_id}.")
+            self.run_query(self.booking_service.prebook, user_id, selected_schedule_id, on_result=prebooked,
+                           on_error=self.prebooking_failed)
 
 
     def search_buses_for_prebooking(self):
@@ -1371,26 +1517,8 @@ class BusAppGUI:
             messagebox.showwarning("Search", "Please enter a search term.")
             return
 
-        # Fetch buses matching the search term
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT buses.bus_id, buses.name, buses.number, buses.ticket_price, buses.capacity, 
-                    routes.route_name
-                FROM buses
-                JOIN routes ON buses.route_id = routes.route_id
-                WHERE LOWER(buses.name) LIKE ? OR LOWER(routes.route_name) LIKE ?
-            """, (f"%{search_term}%", f"%{search_term}%"))
-            buses = cur.fetchall()
-
-        # Clear previous results
-        for row in self.treeview.get_children():
-            self.treeview.delete(row)
-
-        # Insert matching buses into the treeview
-        for bus in buses:
-            bus_id, bus_name, bus_number, ticket_price, capacity, route_name = bus
-            self.treeview.insert("", tk.END, values=(bus_name, bus_number, route_name, ticket_price, capacity))
+        # Fetch buses matching the search term; a newer search supersedes this one
+        self.run_query(self.booking_service.search_buses, search_term, on_result=self.show_search_results, key="search")
 
     def view_bus_schedules_for_prebooking(self, event):
         """View and select schedule for prebooking a bus."""
@@ -1428,23 +1556,17 @@ class BusAppGUI:
 
     def fetch_bus_schedules(self, bus_id):
         """Fetch and show available schedules for the selected bus."""
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT schedule_id, departure_date, departure_time, arrival_time 
-                FROM schedules 
-                WHERE bus_id = ?
-            """, (bus_id,))
-            schedules = cur.fetchall()
-        return schedules
+        return self.booking_service.bus_schedules(bus_id)
 
     def populate_schedules(self, bus_id):
-        """Populate available schedules into the schedule listbox."""
-        schedules = self.fetch_bus_schedules(bus_id)
-        for schedule in schedules:
+        """Populate the departures that can still be prebooked into the schedule listbox."""
+        # Listbox rows map to schedule_ids by position
+        self.schedule_ids = []
+        for schedule in self.booking_service.charter_schedules(bus_id):
             schedule_id, departure_date, departure_time, arrival_time = schedule
             schedule_str = f"Date: {departure_date}, Time: {departure_time} - {arrival_time}"
             self.schedule_listbox.insert(tk.END, schedule_str)
+            self.schedule_ids.append(schedule_id)
 
     def confirm_prebooking(self, bus_id, user_id):
         """Confirm prebooking of the selected bus and schedule."""
@@ -1454,19 +1576,23 @@ class BusAppGUI:
             return
 
         selected_schedule_str = self.schedule_listbox.get(selected_schedule_index)
-        selected_schedule = selected_schedule_str.split(",")
-        departure_date = selected_schedule[0].split(":")[1].strip()
+        schedule_id = self.schedule_ids[selected_schedule_index[0]]
 
-        # Insert prebooking into the database
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO prebooked_buses (user_id, bus_id, prebook_date)
-                VALUES (?, ?, ?)
-            """, (user_id, bus_id, departure_date))
+        def prebooked(_):
+            messagebox.showinfo("Prebooking Successful", f"You have successfully prebooked the bus for {selected_schedule_str}.")
+            self.schedule_window.destroy()
 
-        messagebox.showinfo("Prebooking Successful", f"You have successfully prebooked a bus for {departure_date}.")
-        self.schedule_window.destroy()
+        # Charter the whole departure; fails if someone else got it or bought a seat first
+        self.run_query(self.booking_service.prebook, user_id, schedule_id, on_result=prebooked,
+                       on_error=self.prebooking_failed)
+
+    @staticmethod
+    def prebooking_failed(error):
+        """Show why a charter was refused (prebooking.CharterUnavailable), or a database error."""
+        if isinstance(error, ValueError):
+            messagebox.showerror("Prebooking Unavailable", str(error))
+        else:
+            messagebox.showerror("Database Error", str(error))
 
 
     def dashboard(self, user_id):
@@ -1485,17 +1611,19 @@ class BusAppGUI:
         tk.Label(self.dashboard_window, text="Your Purchased Tickets", font=("Arial", 14)).pack(pady=10)
         
         # Create a Treeview for displaying purchased tickets
-        self.ticket_treeview = ttk.Treeview(self.dashboard_window, columns=("Bus Name", "Route", "Seat Number", "Price"), show="headings")
+        self.ticket_treeview = ttk.Treeview(self.dashboard_window, columns=("Bus Name", "Route", "Departure", "Seat Number", "Price"), show="headings")
         self.ticket_treeview.pack(pady=10, fill=tk.BOTH, expand=True)
 
         # Define headings for ticket display
         self.ticket_treeview.heading("Bus Name", text="Bus Name")
         self.ticket_treeview.heading("Route", text="Route")
+        self.ticket_treeview.heading("Departure", text="Departure")
         self.ticket_treeview.heading("Seat Number", text="Seat Number")
         self.ticket_treeview.heading("Price", text="Price")
 
         self.ticket_treeview.column("Bus Name", width=150)
         self.ticket_treeview.column("Route", width=150)
+        self.ticket_treeview.column("Departure", width=150)
         self.ticket_treeview.column("Seat Number", width=100)
         self.ticket_treeview.column("Price", width=100)
 
@@ -1531,69 +1659,59 @@ class BusAppGUI:
 
     def fetch_user_purchased_tickets(self, user_id):
         """Fetch and display the purchased tickets for the user."""
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT buses.name, routes.route_name, tickets.seat_number, tickets.price, tickets.ticket_id
-                FROM tickets
-                JOIN buses ON tickets.bus_id = buses.bus_id
-                JOIN routes ON buses.route_id = routes.route_id
-                WHERE tickets.user_id = ? AND tickets.status = 'sold'
-            """, (user_id,))
-            tickets = cur.fetchall()
-
-        # Clear previous data in the treeview
-        for row in self.ticket_treeview.get_children():
-            self.ticket_treeview.delete(row)
-
-        # Insert data into the treeview
-        for ticket in tickets:
-            bus_name, route_name, seat_number, price, ticket_id = ticket
-            self.ticket_treeview.insert("", tk.END, values=(bus_name, route_name, seat_number, price), tags=(ticket_id,))
+        def show_tickets(tickets):
+            # Clear previous data in the treeview
+            for row in self.ticket_treeview.get_children():
+                self.ticket_treeview.delete(row)
+
+            # Insert data into the treeview
+            for ticket in tickets:
+                bus_name, route_name, departure, seat_number, price, ticket_id = ticket
+                self.ticket_treeview.insert("", tk.END, values=(bus_name, route_name, departure, seat_number, price), tags=(ticket_id,))
+
+        self.run_query(self.booking_service.user_tickets, user_id, on_result=show_tickets, key="user_tickets")
 
     def fetch_user_prebooked_buses(self, user_id):
         """Fetch and display the prebooked buses for the user."""
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT buses.name, routes.route_name, prebooked_buses.prebook_date, prebooked_buses.prebook_id
-                FROM prebooked_buses
-                JOIN buses ON prebooked_buses.bus_id = buses.bus_id
-                JOIN routes ON buses.route_id = routes.route_id
-                WHERE prebooked_buses.user_id = ?
-            """, (user_id,))
-            prebookings = cur.fetchall()
-
-        # Clear previous data in the treeview
-        for row in self.prebook_treeview.get_children():
-            self.prebook_treeview.delete(row)
-
-        # Insert data into the treeview
-        for prebooking in prebookings:
-            bus_name, route_name, prebook_date, prebook_id = prebooking
-            self.prebook_treeview.insert("", tk.END, values=(bus_name, route_name, prebook_date), tags=(prebook_id,))
+        def show_prebookings(prebookings):
+            # Clear previous data in the treeview
+            for row in self.prebook_treeview.get_children():
+                self.prebook_treeview.delete(row)
+
+            # Insert data into the treeview
+            for prebooking in prebookings:
+                bus_name, route_name, prebook_date, prebook_id = prebooking
+                self.prebook_treeview.insert("", tk.END, values=(bus_name, route_name, prebook_date), tags=(prebook_id,))
+
+        self.run_query(self.booking_service.user_prebookings, user_id, on_result=show_prebookings, key="user_prebookings")
 
     def cancel_ticket(self, user_id):
         """Cancel a purchased ticket."""
         ticket_id = simpledialog.askinteger("Cancel Ticket", "Enter the ticket ID you want to cancel:")
-        
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM tickets WHERE ticket_id = ? AND user_id = ?", (ticket_id, user_id))
-            conn.commit()
+        if ticket_id is None:
+            return
+
+        def cancelled(found):
+            if found:
+                messagebox.showinfo("Ticket Canceled", "Your ticket has been canceled.")
+            else:
+                messagebox.showerror("Cancel Ticket", f"You have no ticket with ID {ticket_id}.")
 
-        messagebox.showinfo("Ticket Canceled", "Your ticket has been canceled.")
+        self.run_query(self.booking_service.cancel_ticket, ticket_id, user_id, on_result=cancelled)
 
     def cancel_prebooking(self, user_id):
         """Cancel a prebooked bus."""
         prebook_id = simpledialog.askinteger("Cancel Prebooking", "Enter the prebooking ID you want to cancel:")
-        
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM prebooked_buses WHERE prebook_id = ? AND user_id = ?", (prebook_id, user_id))
-            conn.commit()
+        if prebook_id is None:
+            return
+
+        def cancelled(found):
+            if found:
+                messagebox.showinfo("Prebooking Canceled", "Your prebooking has been canceled.")
+            else:
+                messagebox.showerror("Cancel Prebooking", f"You have no prebooking with ID {prebook_id}.")
 
-        messagebox.showinfo("Prebooking Canceled", "Your prebooking has been canceled.")
+        self.run_query(self.booking_service.cancel_prebooking, prebook_id, user_id, on_result=cancelled)
 
         def logout_admin(self):
             """Logout admin and return to login."""
@@ -1605,11 +1723,12 @@ class BusAppGUI:
             self.user_window.quit()
             self.root.deiconify()
 
-    def main():
-        root = tk.Tk()
-        app = BusAppGUI(root)
-        root.mainloop()
+def main():
+    database.init_db()
+    root = tk.Tk()
+    app = BusAppGUI(root)
+    root.mainloop()
 
-    if __name__ == "__main__":
-        main()
+if __name__ == "__main__":
+    main()
 
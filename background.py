@@ -0,0 +1,48 @@
+"""Login-screen background image, decoded and scaled off the Tk thread.
+
+Decoding the JPEG and resizing it with LANCZOS took longer than building the
+rest of the login form. load() runs on a worker thread and keeps the scaled
+result on disk, keyed by the source's path, mtime and size and by the target
+size, so later launches only read back the already-scaled pixels. Replacing
+the source image changes its key, so stale copies are never shown.
+"""
+import hashlib
+import os
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bus_service")
+
+
+def cache_path(source, size, cache_dir=None):
+    """Return the cache file for source scaled to size (width, height), under CACHE_DIR by default."""
+    stat = os.stat(source)
+    key = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+    return os.path.join(cache_dir or CACHE_DIR, f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.ppm")
+
+
+def load(source, size, cache_dir=None):
+    """Return source scaled to size as a loaded PIL image, reading or filling the disk cache.
+
+    PIL is imported here rather than by the GUI so the login form never
+    waits for it. A cache that cannot be written is skipped.
+    """
+    from PIL import Image
+
+    path = cache_path(source, size, cache_dir)
+    try:
+        with Image.open(path) as cached:
+            if cached.size == tuple(size):
+                cached.load()
+                return cached
+    except (OSError, SyntaxError):
+        pass  # Missing or unreadable: scale from the source again
+
+    with Image.open(source) as image:
+        scaled = image.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.tmp"
+        scaled.save(partial, "PPM")
+        os.replace(partial, path)  # Readers never see a half-written file
+    except OSError:
+        pass
+    return scaled
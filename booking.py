@@ -0,0 +1,181 @@
+import random
+import sqlite3
+import time
+
+import inventory
+import ledger
+
+BOOKED = "booked"
+UNAVAILABLE = "unavailable"
+NOT_BOOKED = "not booked"
+
+
+class RetryPolicy:
+    """Retry a write transaction when SQLite reports the database as busy."""
+
+    def __init__(self, attempts=5, base_delay=0.01, max_delay=0.5):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Return the jittered backoff before the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, func):
+        """Call func until it succeeds or the attempts are used up."""
+        for attempt in range(self.attempts):
+            try:
+                return func()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == self.attempts - 1:
+                    raise
+                time.sleep(self.delay(attempt))
+
+
+class DepartureBooked(ValueError):
+    """Raised when deleting departures that have seats sold or are chartered."""
+
+    def __init__(self, schedule_ids):
+        self.schedule_ids = schedule_ids
+        shown = ", ".join(str(schedule_id) for schedule_id in schedule_ids[:5])
+        more = ", ..." if len(schedule_ids) > 5 else ""
+        super().__init__(f"{len(schedule_ids)} departure(s) have passengers booked ({shown}{more}); "
+                         f"cancel their tickets and prebookings first")
+
+
+def is_busy_error(error):
+    """Return True if an OperationalError means the database was locked."""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def booked_departures(conn, condition, params=()):
+    """Return the schedule_ids matching condition (SQL over schedules) that have seats sold or are chartered.
+
+    Deleting a departure deletes its tickets and charters with it (see the
+    schedules delete triggers) and refunds nobody, so callers refuse to
+    delete these.
+    """
+    return [schedule_id for (schedule_id,) in conn.execute(f"""
+        SELECT schedule_id FROM schedules
+        WHERE ({condition})
+          AND (EXISTS (SELECT 1 FROM schedule_tickets WHERE schedule_tickets.schedule_id = schedules.schedule_id)
+               OR EXISTS (SELECT 1 FROM prebooked_buses WHERE prebooked_buses.schedule_id = schedules.schedule_id))
+        ORDER BY schedule_id
+    """, params)]
+
+
+def _claim_seats(conn, schedule_id, seat_numbers, user_id, allow_partial, record):
+    """Claim seats on a departure inside one BEGIN IMMEDIATE transaction.
+
+    Returns (results, prices), where prices maps each seat sold to its price.
+    With record set, the sale's ledger row is written in the same transaction.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        # The write lock is held from here on, so this bitmap cannot go stale
+        loaded = inventory.load(conn, schedule_id)
+        # A departure chartered as a whole bus (see prebooking.py) has no seats on sale
+        cur.execute("SELECT 1 FROM prebooked_buses WHERE schedule_id = ?", (schedule_id,))
+        if loaded is None or cur.fetchone() is not None:
+            conn.rollback()
+            return {seat: UNAVAILABLE for seat in seat_numbers}, {}
+        capacity, bitmap = loaded
+        free = {seat for seat in seat_numbers if 1 <= seat <= capacity and not inventory.is_sold(bitmap, seat)}
+        results = {seat: BOOKED if seat in free else UNAVAILABLE for seat in seat_numbers}
+
+        if free and (allow_partial or len(free) == len(seat_numbers)):
+            cur.execute("""
+                SELECT seat_inventory.bus_id, buses.ticket_price FROM seat_inventory
+                JOIN buses ON buses.bus_id = seat_inventory.bus_id
+                WHERE seat_inventory.schedule_id = ?
+            """, (schedule_id,))
+            bus_id, base_price = cur.fetchone()
+            sold = [seat for seat in seat_numbers if seat in free]
+            # Seat-class tiers live in the bus's seat layout; seats without one sell at the base price
+            seat_prices = inventory.prices(conn, bus_id, sold, base_price)
+            cur.executemany("""
+                INSERT INTO schedule_tickets (schedule_id, seat_number, user_id, price) VALUES (?, ?, ?, ?)
+            """, [(schedule_id, seat, user_id, seat_prices[seat]) for seat in sold])
+            inventory.store(conn, schedule_id, inventory.set_seats(bitmap, free, True), len(free))
+            prices = {seat: seat_prices[seat] for seat in sold}
+            if record:
+                ledger.insert(conn, [ledger.sale_entry(user_id, bus_id, schedule_id, prices)])
+            conn.commit()
+            return results, prices
+        conn.rollback()
+        results = {seat: NOT_BOOKED if status == BOOKED else status
+                   for seat, status in results.items()}
+        return results, {}
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def book_seats(conn, schedule_id, seat_numbers, user_id, allow_partial=False, retry=None, record=False):
+    """Atomically sell seats on one departure to a user.
+
+    Returns (results, prices): results maps each requested seat number to
+    "booked", "unavailable" or "not booked", and prices maps each seat sold
+    to the price charged for it (seat-class tiers included). Unless
+    allow_partial is set, either every seat is sold or none is. With record
+    set, the sale is written to the transactions ledger in the same
+    transaction as the seats.
+    """
+    seat_numbers = list(dict.fromkeys(int(seat) for seat in seat_numbers))
+    if not seat_numbers:
+        return {}, {}
+    retry = retry or RetryPolicy()
+    return retry.run(lambda: _claim_seats(conn, schedule_id, seat_numbers, user_id, allow_partial, record))
+
+
+def _release_ticket(conn, ticket_id, user_id, record):
+    """Delete a sold ticket and clear its bit inside one BEGIN IMMEDIATE transaction.
+
+    Returns (schedule_id, seat_number, price, bus_id), or None if there is no such ticket.
+    With record set, the refund's ledger row is written in the same transaction.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("""
+            SELECT schedule_tickets.schedule_id, schedule_tickets.seat_number, schedule_tickets.price, schedules.bus_id
+            FROM schedule_tickets LEFT JOIN schedules ON schedules.schedule_id = schedule_tickets.schedule_id
+            WHERE schedule_tickets.ticket_id = ? AND schedule_tickets.user_id = ?
+        """, (ticket_id, user_id))
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        schedule_id, seat_number = row[:2]
+        # Load (and if needed rebuild) the bitmap while the ticket still counts as sold
+        loaded = inventory.load(conn, schedule_id)
+        cur.execute("DELETE FROM schedule_tickets WHERE ticket_id = ?", (ticket_id,))
+        if loaded is not None and 1 <= seat_number <= loaded[0] and inventory.is_sold(loaded[1], seat_number):
+            inventory.store(conn, schedule_id, inventory.set_seats(loaded[1], [seat_number], False), -1)
+        if record:
+            ledger.insert(conn, [ledger.refund_entry(user_id, row[3], schedule_id, seat_number, row[2])])
+        conn.commit()
+        return row
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def cancel_ticket(conn, ticket_id, user_id, retry=None, record=False):
+    """Cancel a user's ticket and return its seat to sale.
+
+    Returns the ticket's schedule_id, or None if the user has no such ticket.
+    With record set, the refund is written to the transactions ledger in the
+    same transaction as the cancellation.
+    """
+    retry = retry or RetryPolicy()
+    released = retry.run(lambda: _release_ticket(conn, ticket_id, user_id, record))
+    return None if released is None else released[0]
+
+
+def booked_seats(results):
+    """Return the seat numbers that were booked from book_seats' per-seat results."""
+    return [seat for seat, status in results.items() if status == BOOKED]
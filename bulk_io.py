@@ -0,0 +1,453 @@
+"""Streaming bulk import and export of routes, drivers, buses and schedules.
+
+Files are read and written a row at a time, so neither direction ever holds
+a whole file or table in memory. CSV and JSON Lines are always available;
+Parquet needs the optional pyarrow package.
+
+Imports validate every row (required fields, number/date/time formats,
+referenced IDs, unique bus numbers, licences and departures), then insert
+the valid rows of each chunk with one executemany in one transaction.
+Schedules are also checked against the conflict index inside that
+transaction, and those that would double-book a bus or driver are rejected. If
+the database still refuses a chunk, it is retried row by row so a single
+bad row is rejected on its own instead of sinking its neighbours.
+"""
+import contextlib
+import csv
+import json
+import os
+import re
+import sqlite3
+from collections import namedtuple
+from datetime import date
+
+import conflicts
+import inventory
+import journeys
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # Parquet support is optional
+    pyarrow = parquet = None
+
+CHUNK_SIZE = 5000
+# SQLite limits the number of bound parameters per statement
+MAX_PARAMS = 500
+
+Table = namedtuple("Table", "key columns")
+Rejection = namedtuple("Rejection", "line reason")
+ImportResult = namedtuple("ImportResult", "imported rejected")
+
+# Columns in file order with their types; the key is optional on import
+TABLES = {
+    "routes": Table("route_id", (("route_id", int), ("route_name", str), ("stops", str))),
+    "drivers": Table("driver_id", (("driver_id", int), ("name", str), ("license_number", str),
+                                   ("phone", str), ("address", str))),
+    "buses": Table("bus_id", (("bus_id", int), ("name", str), ("number", str), ("route_id", int),
+                              ("ticket_price", float), ("capacity", int), ("driver_id1", int), ("driver_id2", int))),
+    "schedules": Table("schedule_id", (("schedule_id", int), ("bus_id", int), ("route_id", int),
+                                       ("departure_date", str), ("departure_time", str), ("arrival_time", str))),
+}
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_TIME_RE = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message is the reason reported for it."""
+
+
+def file_format(path):
+    """Return "csv", "jsonl" or "parquet" from a file name's extension."""
+    extension = os.path.splitext(path)[1].lower()
+    formats = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+    if extension not in formats:
+        raise ValueError(f"Unsupported file type {extension!r}; use .csv, .jsonl or .parquet")
+    return formats[extension]
+
+
+def _require_parquet():
+    if pyarrow is None:
+        raise RuntimeError("Parquet support needs the pyarrow package")
+
+
+def read_rows(path, fmt=None):
+    """Yield (line, row dict) from a file; rows that cannot be parsed are yielded as RowError."""
+    fmt = fmt or file_format(path)
+    if fmt == "csv":
+        with open(path, "r", newline="", encoding="utf-8") as source:
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+    elif fmt == "jsonl":
+        with open(path, "r", encoding="utf-8") as source:
+            for line, text in enumerate(source, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as e:
+                    yield line, RowError(f"invalid JSON: {e}")
+                    continue
+                yield line, row if isinstance(row, dict) else RowError("expected a JSON object")
+    else:
+        _require_parquet()
+        line = 0
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=CHUNK_SIZE):
+            for row in batch.to_pylist():
+                line += 1
+                yield line, row
+
+
+def _value(row, column, kind, required=False, minimum=None):
+    """Return a row's value for column converted to kind, or None if it is blank."""
+    value = row.get(column)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        if required:
+            raise RowError(f"{column} is required")
+        return None
+    try:
+        if kind is int:
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError
+            value = int(value)
+        elif kind is float:
+            value = float(value)
+        else:
+            value = str(value)
+    except ValueError:
+        raise RowError(f"{column} must be {'an integer' if kind is int else 'a number'}, got {value!r}")
+    if minimum is not None and value < minimum:
+        raise RowError(f"{column} must be at least {minimum}")
+    return value
+
+
+def _date(row, column):
+    value = _value(row, column, str, required=True)
+    try:
+        if not _DATE_RE.match(value):
+            raise ValueError
+        date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{column} must be a YYYY-MM-DD date, got {value!r}")
+    return value
+
+
+def _time(row, column):
+    value = _value(row, column, str, required=True)
+    if not _TIME_RE.match(value):
+        raise RowError(f"{column} must be a 24-hour HH:MM time, got {value!r}")
+    return value
+
+
+def _existing(conn, sql, values):
+    """Run sql (with one "{}" for an IN list) over values in parameter-sized batches; return the rows."""
+    values = list(set(values))
+    rows = []
+    for start in range(0, len(values), MAX_PARAMS):
+        batch = values[start:start + MAX_PARAMS]
+        rows += conn.execute(sql.format(", ".join("?" for _ in batch)), batch).fetchall()
+    return rows
+
+
+class _Importer:
+    """Validates and inserts one table's rows, remembering keys seen earlier in the file."""
+
+    def __init__(self, conn, table):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table {table!r}; expected one of {', '.join(TABLES)}")
+        self.conn = conn
+        self.table = table
+        self.key, columns = TABLES[table]
+        self.columns = [name for name, _ in columns]
+        self.seen = set()
+        self.parse = getattr(self, f"_parse_{table}")
+        self.check = getattr(self, f"_check_{table}")
+
+    # Per-row parsing: formats and required fields
+
+    def _parse_routes(self, row):
+        return {"route_id": _value(row, "route_id", int, minimum=1),
+                "route_name": _value(row, "route_name", str, required=True),
+                "stops": _value(row, "stops", str, required=True)}
+
+    def _parse_drivers(self, row):
+        return {"driver_id": _value(row, "driver_id", int, minimum=1),
+                "name": _value(row, "name", str, required=True),
+                "license_number": _value(row, "license_number", str, required=True),
+                "phone": _value(row, "phone", str, required=True),
+                "address": _value(row, "address", str)}
+
+    def _parse_buses(self, row):
+        return {"bus_id": _value(row, "bus_id", int, minimum=1),
+                "name": _value(row, "name", str, required=True),
+                "number": _value(row, "number", str, required=True),
+                "route_id": _value(row, "route_id", int, required=True),
+                "ticket_price": _value(row, "ticket_price", float, required=True, minimum=0),
+                "capacity": _value(row, "capacity", int, required=True, minimum=1),
+                "driver_id1": _value(row, "driver_id1", int),
+                "driver_id2": _value(row, "driver_id2", int)}
+
+    def _parse_schedules(self, row):
+        return {"schedule_id": _value(row, "schedule_id", int, minimum=1),
+                "bus_id": _value(row, "bus_id", int, required=True),
+                "route_id": _value(row, "route_id", int),
+                "departure_date": _date(row, "departure_date"),
+                "departure_time": _time(row, "departure_time"),
+                "arrival_time": _time(row, "arrival_time")}
+
+    # Per-chunk checks against the database and the rows seen so far
+
+    def _check_unique(self, records, column, sql):
+        """Reject records whose column value is already in the database or earlier in the file."""
+        taken = {value for (value,) in _existing(
+            self.conn, sql, [record[column] for record in records.values() if record[column] is not None])}
+        for line, record in list(records.items()):
+            value = record[column]
+            if value is None:
+                continue
+            if value in taken or (column, value) in self.seen:
+                del records[line]
+                yield Rejection(line, f"{column} {value!r} already exists")
+            else:
+                self.seen.add((column, value))
+
+    def _check_references(self, records, column, sql, label):
+        """Reject records whose column refers to an ID that does not exist."""
+        found = {value for (value,) in _existing(
+            self.conn, sql, [record[column] for record in records.values() if record[column] is not None])}
+        for line, record in list(records.items()):
+            if record[column] is not None and record[column] not in found:
+                del records[line]
+                yield Rejection(line, f"{column} {record[column]} is not a known {label}")
+
+    def _check_routes(self, records):
+        return []
+
+    def _check_drivers(self, records):
+        yield from self._check_unique(records, "license_number",
+                                      "SELECT license_number FROM drivers WHERE license_number IN ({})")
+
+    def _check_buses(self, records):
+        yield from self._check_unique(records, "number", "SELECT number FROM buses WHERE number IN ({})")
+        yield from self._check_references(records, "route_id", "SELECT route_id FROM routes WHERE route_id IN ({})",
+                                          "route")
+        for column in ("driver_id1", "driver_id2"):
+            yield from self._check_references(records, column,
+                                              "SELECT driver_id FROM drivers WHERE driver_id IN ({})", "driver")
+
+    def _check_schedules(self, records):
+        buses = dict(_existing(self.conn, "SELECT bus_id, route_id FROM buses WHERE bus_id IN ({})",
+                               [record["bus_id"] for record in records.values()]))
+        for line, record in list(records.items()):
+            if record["bus_id"] not in buses:
+                del records[line]
+                yield Rejection(line, f"bus_id {record['bus_id']} is not a known bus")
+            elif record["route_id"] is None:
+                record["route_id"] = buses[record["bus_id"]]  # Default to the bus's own route
+        yield from self._check_references(records, "route_id", "SELECT route_id FROM routes WHERE route_id IN ({})",
+                                          "route")
+        departures = set(_existing(self.conn, """
+            SELECT bus_id, departure_date, departure_time FROM schedules WHERE bus_id IN ({})
+        """, [record["bus_id"] for record in records.values()]))
+        for line, record in list(records.items()):
+            departure = (record["bus_id"], record["departure_date"], record["departure_time"])
+            if departure in departures or departure in self.seen:
+                del records[line]
+                yield Rejection(line, f"bus {departure[0]} already departs at {departure[1]} {departure[2]}")
+            else:
+                self.seen.add(departure)
+
+    def validate(self, chunk):
+        """Return ({line: record} of valid rows, [Rejection]) for a chunk of (line, row)."""
+        records, rejected = {}, []
+        for line, row in chunk:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                records[line] = self.parse(row)
+            except RowError as e:
+                rejected.append(Rejection(line, str(e)))
+        rejected += self._check_unique(records, self.key,
+                                       f"SELECT {self.key} FROM {self.table} WHERE {self.key} IN ({{}})")
+        rejected += self.check(records)
+        return records, rejected
+
+    # Inserting
+
+    def _assign_keys(self, records):
+        """Give records without a key the next free IDs so follow-up writes know them."""
+        missing = [record for record in records if record[self.key] is None]
+        if missing:
+            next_id = self.conn.execute(f"SELECT IFNULL(MAX({self.key}), 0) + 1 FROM {self.table}").fetchone()[0]
+            next_id = max([next_id] + [record[self.key] + 1 for record in records if record[self.key] is not None])
+            for offset, record in enumerate(missing):
+                record[self.key] = next_id + offset
+
+    def _after_insert(self, records):
+        """Write the rows that depend on the inserted records."""
+        if self.table == "routes":
+            for record in records:
+                journeys.sync_route_stops(self.conn, record["route_id"], record["stops"])
+        elif self.table == "buses":
+            for record in records:
+                inventory.generate_seats(self.conn, record["bus_id"], record["capacity"], record["ticket_price"])
+            self.conn.executemany(
+                "INSERT INTO driver_assignments (bus_id, driver_id) VALUES (?, ?)",
+                [(record["bus_id"], record[column]) for record in records
+                 for column in ("driver_id1", "driver_id2") if record[column] is not None],
+            )
+
+    def _insert(self, records):
+        self._assign_keys(records)
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.conn.executemany(
+            f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({placeholders})",
+            [tuple(record[column] for column in self.columns) for record in records],
+        )
+        self._after_insert(records)
+
+    def _check_conflicts(self, index, records):
+        """Reject schedules that would double-book their bus or a driver; index the rest.
+
+        Accepted rows go into the index straight away, so later rows in the
+        chunk are checked against them too. conflicts.write() drops the index
+        if the transaction then fails.
+        """
+        if index is None:
+            return []
+        self._assign_keys(list(records.values()))
+        rejected = []
+        for line, record in list(records.items()):
+            span = conflicts.interval(record["departure_date"], record["departure_time"], record["arrival_time"],
+                                      record["schedule_id"])
+            found = index.check(record["bus_id"], span)
+            if found:
+                del records[line]
+                rejected.append(Rejection(line, str(conflicts.ScheduleConflict(found))))
+            else:
+                index.add(record["bus_id"], span)
+        return rejected
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Yield the conflict index (None unless importing schedules) inside one BEGIN IMMEDIATE transaction."""
+        if self.table == "schedules":
+            # The conflict check has to run under the same write lock as the insert
+            with conflicts.write(self.conn) as index:
+                yield index
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield None
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def insert(self, records):
+        """Insert a chunk in one transaction; returns (imported count, [Rejection])."""
+        if not records:
+            return 0, []
+        try:
+            with self._transaction() as index:
+                accepted = dict(records)
+                rejected = self._check_conflicts(index, accepted)
+                self._insert(list(accepted.values()))
+            return len(accepted), rejected
+        except sqlite3.IntegrityError:
+            pass
+
+        # Something validation could not see; retry row by row to isolate the culprits
+        imported = 0
+        cur = self.conn.cursor()
+        with self._transaction() as index:
+            accepted = dict(records)
+            rejected = self._check_conflicts(index, accepted)
+            for line, record in accepted.items():
+                cur.execute("SAVEPOINT import_row")
+                try:
+                    self._insert([record])
+                    imported += 1
+                except sqlite3.IntegrityError as e:
+                    cur.execute("ROLLBACK TO import_row")
+                    rejected.append(Rejection(line, str(e)))
+                    if index is not None:
+                        index.remove(record["schedule_id"])
+                cur.execute("RELEASE import_row")
+        return imported, rejected
+
+
+def _chunks(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_rows(conn, table, rows, chunk_size=CHUNK_SIZE):
+    """Validate and insert an iterable of (line, row dict) into a table; returns an ImportResult."""
+    importer = _Importer(conn, table)
+    imported, rejected = 0, []
+    for chunk in _chunks(rows, chunk_size):
+        records, chunk_rejected = importer.validate(chunk)
+        count, insert_rejected = importer.insert(records)
+        imported += count
+        rejected += chunk_rejected + insert_rejected
+    rejected.sort()
+    return ImportResult(imported, rejected)
+
+
+def import_file(conn, table, path, fmt=None, chunk_size=CHUNK_SIZE):
+    """Stream a CSV, JSON Lines or Parquet file into a table; returns an ImportResult."""
+    return import_rows(conn, table, read_rows(path, fmt), chunk_size)
+
+
+def write_rejections(rejected, path):
+    """Write rejected rows as a CSV of line number and reason."""
+    with open(path, "w", newline="", encoding="utf-8") as target:
+        writer = csv.writer(target)
+        writer.writerow(("line", "reason"))
+        writer.writerows(rejected)
+
+
+def export_table(conn, table, path, fmt=None, batch_size=CHUNK_SIZE):
+    """Stream a table to a CSV, JSON Lines or Parquet file in key order; returns the row count."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; expected one of {', '.join(TABLES)}")
+    fmt = fmt or file_format(path)
+    key, columns = TABLES[table]
+    names = [name for name, _ in columns]
+    cur = conn.execute(f"SELECT {', '.join(names)} FROM {table} ORDER BY {key}")
+    batches = iter(lambda: cur.fetchmany(batch_size), [])
+    count = 0
+
+    if fmt == "parquet":
+        _require_parquet()
+        types = {int: pyarrow.int64(), float: pyarrow.float64(), str: pyarrow.string()}
+        schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        with parquet.ParquetWriter(path, schema) as writer:
+            for rows in batches:
+                writer.write_table(pyarrow.Table.from_pylist([dict(zip(names, row)) for row in rows], schema=schema))
+                count += len(rows)
+        return count
+
+    with open(path, "w", newline="", encoding="utf-8") as target:
+        if fmt == "csv":
+            writer = csv.writer(target)
+            writer.writerow(names)
+            for rows in batches:
+                writer.writerows(rows)
+                count += len(rows)
+        else:
+            for rows in batches:
+                target.writelines(json.dumps(dict(zip(names, row))) + "\n" for row in rows)
+                count += len(rows)
+    return count
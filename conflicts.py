@@ -0,0 +1,264 @@
+"""Bus and driver double-booking detection over the timetable.
+
+A departure occupies its bus and the bus's drivers (driver_id1/driver_id2)
+from departure to arrival. ConflictIndex keeps each bus's and each driver's
+departures as a list sorted by start time, along with the latest end time
+seen so far, so checking a new departure is a bisection per resource plus a
+walk back over the departures that can still reach it, instead of a scan of
+every schedule. That stays correct when the stored departures overlap each
+other (timetables written before this check existed; audit() finds those in
+a single sweep over all departures in start order).
+
+Writers check and insert inside one BEGIN IMMEDIATE transaction (see
+write()). The table_versions counters for schedules and buses tell
+get_index() when another connection or process changed the timetable, so
+the check never runs against a stale index.
+"""
+import bisect
+import contextlib
+import threading
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+BUS = "bus"
+DRIVER = "driver"
+
+Interval = namedtuple("Interval", "start end schedule_id")
+Conflict = namedtuple("Conflict", "resource resource_id schedule_id other_id start end")
+
+_SCHEDULES_SQL = """
+    SELECT schedules.schedule_id, schedules.bus_id, buses.driver_id1, buses.driver_id2,
+        schedules.departure_date, schedules.departure_time, schedules.arrival_time
+    FROM schedules JOIN buses ON buses.bus_id = schedules.bus_id
+"""
+
+
+class ScheduleConflict(ValueError):
+    """Raised when a departure would double-book a bus or driver."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        first = conflicts[0]
+        super().__init__(f"{first.resource.title()} {first.resource_id} is already running schedule "
+                         f"{first.other_id} from {first.start:%Y-%m-%d %H:%M} to {first.end:%H:%M}")
+
+
+def interval(departure_date, departure_time, arrival_time, schedule_id=None):
+    """Return the Interval a departure occupies; arrival before departure means the next day."""
+    start = datetime.fromisoformat(f"{departure_date}T{departure_time}")
+    end = datetime.fromisoformat(f"{departure_date}T{arrival_time}")
+    if end <= start:
+        end += timedelta(days=1)
+    return Interval(start, end, schedule_id)
+
+
+def drivers(driver_id1, driver_id2):
+    """Return the distinct, non-null drivers of a bus."""
+    return tuple(dict.fromkeys(driver for driver in (driver_id1, driver_id2) if driver is not None))
+
+
+class IntervalIndex:
+    """Intervals per resource sorted by start time, with the running maximum end time."""
+
+    def __init__(self):
+        self._starts = defaultdict(list)
+        self._intervals = defaultdict(list)
+        self._reach = defaultdict(list)  # _reach[key][j]: latest end among intervals[key][:j + 1]
+
+    def overlapping(self, key, span, ignore=None):
+        """Return the indexed intervals of key that overlap span, skipping schedule ignore."""
+        starts, intervals, reach = self._starts.get(key), self._intervals.get(key), self._reach.get(key)
+        if not starts:
+            return []
+        found = []
+        # Walk back from the last interval starting before span ends, while anything up to it still reaches span
+        j = bisect.bisect_left(starts, span.end) - 1
+        while j >= 0 and reach[j] > span.start:
+            other = intervals[j]
+            if other.end > span.start and other.schedule_id != ignore:
+                found.append(other)
+            j -= 1
+        found.reverse()
+        return found
+
+    def _update_reach(self, key, i):
+        """Recompute the running maximum end time from position i on."""
+        intervals, reach = self._intervals[key], self._reach[key]
+        del reach[i:]
+        latest = reach[-1] if reach else None
+        for other in intervals[i:]:
+            latest = other.end if latest is None or other.end > latest else latest
+            reach.append(latest)
+
+    def add(self, key, span):
+        i = bisect.bisect_right(self._starts[key], span.start)
+        self._starts[key].insert(i, span.start)
+        self._intervals[key].insert(i, span)
+        self._update_reach(key, i)
+
+    def remove(self, key, span):
+        starts, intervals = self._starts.get(key, []), self._intervals.get(key, [])
+        i = bisect.bisect_left(starts, span.start)
+        while i < len(starts) and starts[i] == span.start:
+            if intervals[i].schedule_id == span.schedule_id:
+                del starts[i], intervals[i]
+                self._update_reach(key, i)
+                return
+            i += 1
+
+
+class ConflictIndex:
+    """Per-bus and per-driver interval indexes over every departure."""
+
+    def __init__(self, versions=None):
+        self.buses = IntervalIndex()
+        self.drivers = IntervalIndex()
+        self.bus_drivers = {}  # bus_id -> drivers of that bus
+        self.schedules = {}    # schedule_id -> (bus_id, Interval)
+        self.versions = versions  # table_versions of schedules and buses the index reflects
+        self.changes = 0
+
+    @classmethod
+    def load(cls, conn, versions=None):
+        """Build the index from the schedules and buses tables."""
+        index = cls(versions)
+        for bus_id, driver_id1, driver_id2 in conn.execute("SELECT bus_id, driver_id1, driver_id2 FROM buses"):
+            index.bus_drivers[bus_id] = drivers(driver_id1, driver_id2)
+        timeline = []
+        for schedule_id, bus_id, *_, departure_date, departure_time, arrival_time in conn.execute(_SCHEDULES_SQL):
+            try:
+                timeline.append((bus_id, interval(departure_date, departure_time, arrival_time, schedule_id)))
+            except ValueError:
+                continue  # Malformed dates/times cannot be placed on the timeline
+        # In start order every add appends, so the running end times never need recomputing
+        timeline.sort(key=lambda entry: entry[1].start)
+        for bus_id, span in timeline:
+            index.add(bus_id, span)
+        return index
+
+    def check(self, bus_id, span, bus_drivers=None, ignore=None):
+        """Return the Conflicts a departure of bus_id over span would cause.
+
+        bus_drivers overrides the bus's indexed drivers (for a bus being
+        created); ignore is the schedule being moved by an update.
+        """
+        bus_drivers = self.bus_drivers.get(bus_id, ()) if bus_drivers is None else bus_drivers
+        found = [Conflict(BUS, bus_id, span.schedule_id, other.schedule_id, other.start, other.end)
+                 for other in self.buses.overlapping(bus_id, span, ignore)]
+        for driver_id in bus_drivers:
+            found.extend(Conflict(DRIVER, driver_id, span.schedule_id, other.schedule_id, other.start, other.end)
+                         for other in self.drivers.overlapping(driver_id, span, ignore))
+        return found
+
+    def add(self, bus_id, span):
+        """Index a departure of bus_id."""
+        self.changes += 1
+        self.schedules[span.schedule_id] = (bus_id, span)
+        self.buses.add(bus_id, span)
+        for driver_id in self.bus_drivers.get(bus_id, ()):
+            self.drivers.add(driver_id, span)
+
+    def remove(self, schedule_id):
+        """Drop a departure from the index."""
+        entry = self.schedules.pop(schedule_id, None)
+        if entry is None:
+            return
+        self.changes += 1
+        bus_id, span = entry
+        self.buses.remove(bus_id, span)
+        for driver_id in self.bus_drivers.get(bus_id, ()):
+            self.drivers.remove(driver_id, span)
+
+    def set_drivers(self, bus_id, bus_drivers):
+        """Record a (new) bus's drivers before its departures are added."""
+        self.changes += 1
+        self.bus_drivers[bus_id] = tuple(bus_drivers)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _database(conn):
+    """Return the file a connection has open, which keys the shared index."""
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def table_versions(conn):
+    """Return the (schedules, buses) change counters kept by the table_versions triggers."""
+    versions = dict(conn.execute("SELECT name, version FROM table_versions WHERE name IN ('schedules', 'buses')"))
+    return versions.get("schedules", 0), versions.get("buses", 0)
+
+
+def get_index(conn):
+    """Return the shared conflict index for conn's database, reloading it if schedules or buses changed.
+
+    Call this with the write lock held (see write()) when the result decides
+    a write; otherwise another connection may change the timetable before it.
+    """
+    versions = table_versions(conn)
+    database = _database(conn)
+    with _indexes_lock:
+        index = _indexes.get(database)
+        if index is None or index.versions != versions:
+            index = _indexes[database] = ConflictIndex.load(conn, versions)
+        return index
+
+
+def discard(conn):
+    """Drop the shared index for conn's database; the next get_index() reloads it."""
+    with _indexes_lock:
+        _indexes.pop(_database(conn), None)
+
+
+@contextlib.contextmanager
+def write(conn):
+    """Run a timetable write in one BEGIN IMMEDIATE transaction and yield the current conflict index.
+
+    The write lock is held from before the check until the commit, so no
+    other connection or process can add a clashing departure in between.
+    Every schedules or buses change made in the block must also be applied
+    to the index. On success the transaction is committed; on any failure it
+    is rolled back and an index the block changed is dropped.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    index = None
+    try:
+        index = get_index(conn)
+        changes = index.changes
+        yield index
+        index.versions = table_versions(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if index is not None and index.changes != changes:
+            discard(conn)
+        raise
+
+
+def audit(conn):
+    """Return every bus and driver Conflict in the timetable in one pass.
+
+    Departures are swept in start order while remembering, per bus and per
+    driver, the departure that runs latest so far; any departure starting
+    before that one ends overlaps it.
+    """
+    timeline = []
+    for schedule_id, bus_id, driver_id1, driver_id2, departure_date, departure_time, arrival_time in conn.execute(_SCHEDULES_SQL):
+        try:
+            span = interval(departure_date, departure_time, arrival_time, schedule_id)
+        except ValueError:
+            continue
+        timeline.append((span, bus_id, drivers(driver_id1, driver_id2)))
+    timeline.sort(key=lambda entry: (entry[0].start, entry[0].schedule_id))
+
+    latest = {}
+    found = []
+    for span, bus_id, bus_drivers in timeline:
+        for key in ((BUS, bus_id), *((DRIVER, driver_id) for driver_id in bus_drivers)):
+            other = latest.get(key)
+            if other is not None and other.end > span.start:
+                found.append(Conflict(key[0], key[1], span.schedule_id, other.schedule_id, other.start, other.end))
+            if other is None or span.end > other.end:
+                latest[key] = span
+    return found
@@ -0,0 +1,245 @@
+"""Salted password hashing, login verification and a cache of recent logins.
+
+Stored hashes name their scheme and parameters, e.g.
+"scrypt$16384$8$1$<salt>$<hash>" or "pbkdf2_sha256$600000$<salt>$<hash>",
+so the default can change without invalidating existing accounts. Bare
+64-character hex strings are the unsalted SHA-256 hashes written before
+this module existed; they still verify, and authenticate() replaces them
+(and any hash made with outdated parameters) with the current default on
+the next successful login.
+
+Running the KDF takes tens of milliseconds by design. SessionCache keeps
+recent successful logins for a limited time so a user who authenticates
+again in the same session, or presents a session token, skips it.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import booking
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class ScryptHasher:
+    """scrypt via hashlib; memory-hard, the default where OpenSSL provides it."""
+
+    scheme = "scrypt"
+
+    def __init__(self, n=2 ** 14, r=8, p=1):
+        self.n, self.r, self.p = n, r, p
+
+    def hash(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        key = hashlib.scrypt(password.encode(), salt=salt, n=self.n, r=self.r, p=self.p,
+                             maxmem=256 * self.n * self.r + 1024 * 1024, dklen=HASH_BYTES)
+        return f"{self.scheme}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(key)}"
+
+    def verify(self, password, stored):
+        """Return (matches, needs_rehash) for a hash in this scheme."""
+        _, n, r, p, salt, _ = stored.split("$")
+        hasher = ScryptHasher(int(n), int(r), int(p))
+        matches = hmac.compare_digest(hasher.hash(password, _unb64(salt)), stored)
+        return matches, (hasher.n, hasher.r, hasher.p) != (self.n, self.r, self.p)
+
+
+class Pbkdf2Hasher:
+    """PBKDF2-HMAC-SHA256 via hashlib; available everywhere."""
+
+    scheme = "pbkdf2_sha256"
+
+    def __init__(self, iterations=600_000):
+        self.iterations = iterations
+
+    def hash(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.iterations, HASH_BYTES)
+        return f"{self.scheme}${self.iterations}${_b64(salt)}${_b64(key)}"
+
+    def verify(self, password, stored):
+        """Return (matches, needs_rehash) for a hash in this scheme."""
+        _, iterations, salt, _ = stored.split("$")
+        hasher = Pbkdf2Hasher(int(iterations))
+        matches = hmac.compare_digest(hasher.hash(password, _unb64(salt)), stored)
+        return matches, hasher.iterations != self.iterations
+
+
+HASHERS = {ScryptHasher.scheme: ScryptHasher, Pbkdf2Hasher.scheme: Pbkdf2Hasher}
+# New hashes use this; set it to another hasher to migrate accounts as they log in
+DEFAULT_HASHER = ScryptHasher() if hasattr(hashlib, "scrypt") else Pbkdf2Hasher()
+
+
+def is_legacy(stored):
+    """Return True for an unsalted SHA-256 hex digest from before salted hashing."""
+    return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored)
+
+
+def hash_password(password, hasher=None):
+    """Return a salted hash of password for storage."""
+    return (hasher or DEFAULT_HASHER).hash(password)
+
+
+def verify_password(password, stored, hasher=None):
+    """Return (matches, needs_rehash) for a stored hash of any supported scheme."""
+    hasher = hasher or DEFAULT_HASHER
+    if not stored:
+        return False, False
+    if is_legacy(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored), True
+    scheme = stored.split("$", 1)[0]
+    if scheme not in HASHERS:
+        return False, False
+    if scheme != hasher.scheme:
+        matches, _ = HASHERS[scheme]().verify(password, stored)
+        return matches, True
+    return hasher.verify(password, stored)
+
+
+class SessionCache:
+    """LRU cache of recent logins keyed by email and password, plus session tokens, with a TTL.
+
+    Passwords are never kept: entries are keyed by an HMAC of the password
+    under a per-process random key.
+    """
+
+    def __init__(self, max_entries=1024, ttl=15 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._logins = OrderedDict()  # (email, digest) -> (user, expires)
+        self._tokens = OrderedDict()  # token -> (user, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode(), hashlib.sha256).digest()
+
+    def _get(self, entries, key):
+        entry = entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            del entries[key]
+        self.misses += 1
+        return None
+
+    def _put(self, entries, key, user):
+        entries[key] = (user, time.monotonic() + self.ttl)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def check(self, email, password):
+        """Return the cached user for a recent successful login with these credentials, or None."""
+        with self._lock:
+            return self._get(self._logins, (email, self._digest(password)))
+
+    def remember(self, email, password, user):
+        """Cache a successful login and return a new session token for it."""
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._put(self._logins, (email, self._digest(password)), user)
+            self._put(self._tokens, token, user)
+        return token
+
+    def user_for_token(self, token):
+        """Return the user a live session token belongs to, or None."""
+        with self._lock:
+            return self._get(self._tokens, token)
+
+    def revoke(self, token):
+        """End a session."""
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def forget(self, email):
+        """Drop cached logins and sessions for an email, e.g. after a password change."""
+        with self._lock:
+            for key in [key for key in self._logins if key[0] == email]:
+                del self._logins[key]
+            for token in [token for token, (user, _) in self._tokens.items() if user[2] == email]:
+                del self._tokens[token]
+
+    def stats(self):
+        """Return cache sizes and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "logins": len(self._logins),
+                "sessions": len(self._tokens),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Verified against unknown emails so they take as long to reject as a wrong password
+_DUMMY_HASH = None
+
+
+def authenticate(conn, email, password, cache=None, hasher=None):
+    """Return (user row, session token) for valid credentials, or (None, None).
+
+    The user row is (user_id, name, email, phone, password, role,
+    created_at). Legacy or outdated hashes are replaced after a successful
+    check. With a SessionCache, a repeat login within its TTL skips the KDF.
+    """
+    global _DUMMY_HASH
+    if cache is not None:
+        user = cache.check(email, password)
+        if user is not None:
+            return user, cache.remember(email, password, user)
+    hasher = hasher or DEFAULT_HASHER
+    cur = conn.cursor()
+    cur.execute("SELECT user_id, name, email, phone, password, role, created_at FROM users WHERE email = ?", (email,))
+    user = cur.fetchone()
+    if user is None:
+        _DUMMY_HASH = _DUMMY_HASH or hasher.hash(secrets.token_hex(8))
+        verify_password(password, _DUMMY_HASH, hasher)
+        return None, None
+    matches, needs_rehash = verify_password(password, user[4], hasher)
+    if not matches:
+        return None, None
+    if needs_rehash:
+        upgraded = hasher.hash(password)
+        try:
+            with conn:
+                # Only replace the hash we verified, in case it changed meanwhile
+                cur.execute("UPDATE users SET password = ? WHERE user_id = ? AND password = ?", (upgraded, user[0], user[4]))
+            user = (*user[:4], upgraded, *user[5:])
+        except sqlite3.OperationalError as e:
+            if not booking.is_busy_error(e):
+                raise
+            # Another terminal holds the write lock; the upgrade is retried on the next login
+    token = cache.remember(email, password, user) if cache is not None else None
+    return user, token
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_name):
+    """Return the login cache shared by every caller on a database."""
+    with _caches_lock:
+        cache = _caches.get(db_name)
+        if cache is None:
+            cache = _caches[db_name] = SessionCache()
+        return cache
@@ -1,14 +1,19 @@
-import sqlite3
+import os
+
+import db_pool
+import migrations
 
 DB_NAME = "bus_service.db"
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
 
-def init_db():
+def init_db(db_name=DB_NAME):
     """Initialize the database and create tables if they don't exist."""
-    with sqlite3.connect(DB_NAME) as conn:
-        with open("schema.sql", "r") as schema_file:
+    with db_pool.get_connection(db_name) as conn:
+        with open(SCHEMA, "r") as schema_file:
             conn.executescript(schema_file.read())
+        migrations.migrate(conn)
     print("Database initialized successfully!")
 
 def get_connection():
-    """Get a database connection."""
-    return sqlite3.connect(DB_NAME)
+    """Get the calling thread's pooled database connection."""
+    return db_pool.get_connection(DB_NAME)
@@ -0,0 +1,151 @@
+"""Per-thread SQLite connections, configured for several processes sharing one database file.
+
+Every copy of app.py, the API server and the scripts open the same file.
+WAL lets readers run alongside the single writer, and busy_timeout makes a
+writer wait for another process's write lock instead of failing at once.
+Writes that still hit "database is locked" (a read snapshot that went
+stale before its first write cannot wait) are retried by the caller with
+booking.RetryPolicy.
+
+SQLite's automatic checkpoints are PASSIVE: they stop at the oldest page a
+reader in any process still needs, so under steady load from several
+terminals the WAL keeps growing. maybe_checkpoint(), called after writes
+and throttled to once per CHECKPOINT_INTERVAL, forces a RESTART checkpoint
+once the WAL passes WAL_LIMIT. journal_size_limit then truncates the file.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import querylog
+
+# Pragmas applied to every pooled connection when it is first opened
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,     # Negative value is in KiB (~16 MB page cache)
+    "mmap_size": 268435456,   # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,              # Milliseconds to wait for another connection's write lock
+    "wal_autocheckpoint": 1000,        # Pages; SQLite's own PASSIVE checkpoints
+    "journal_size_limit": 16777216,    # Truncate the WAL back to 16 MB after a checkpoint
+}
+
+WAL_LIMIT = 16 * 1024 * 1024   # WAL size that triggers a forced checkpoint
+CHECKPOINT_INTERVAL = 0.25     # Seconds between WAL size checks
+
+# Number of prepared statements sqlite3 keeps per connection
+CACHED_STATEMENTS = 256
+
+
+class ConnectionPool:
+    """Hand out one long-lived connection per thread for a database file."""
+
+    def __init__(self, db_name, pragmas=None, cached_statements=CACHED_STATEMENTS):
+        self.db_name = db_name
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.hits = 0
+        self.misses = 0
+        self.wait_time = 0.0
+        self.checkpoints = 0
+        self._next_check = 0.0
+
+    def _open(self):
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(self.db_name, cached_statements=self.cached_statements,
+                               factory=querylog.TracedConnection)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def get(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self.hits += 1
+            return conn
+
+        start = time.perf_counter()
+        with self._lock:
+            self.wait_time += time.perf_counter() - start
+            self.misses += 1
+            conn = self._open()
+            self._connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def checkpoint(self, mode="PASSIVE"):
+        """Run PRAGMA wal_checkpoint(mode) on this thread's connection; returns (busy, wal pages, checkpointed pages)."""
+        busy, log, checkpointed = self.get().execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        with self._lock:
+            self.checkpoints += 1
+        return busy, log, checkpointed
+
+    def maybe_checkpoint(self, wal_limit=WAL_LIMIT):
+        """Checkpoint with RESTART if the WAL has outgrown wal_limit; a no-op between checks.
+
+        Returns the checkpoint() result, or None if none was needed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return None
+            self._next_check = now + CHECKPOINT_INTERVAL
+        try:
+            size = os.path.getsize(f"{self.db_name}-wal")
+        except OSError:
+            return None
+        if size <= wal_limit:
+            return None
+        return self.checkpoint("RESTART")
+
+    def stats(self):
+        """Return pool hit/miss and wait-time counters."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "connections": len(self._connections),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "wait_time": self.wait_time,
+                "checkpoints": self.checkpoints,
+            }
+
+    def close_all(self):
+        """Close every connection handed out by this pool."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._local = threading.local()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name):
+    """Return the shared pool for a database file, creating it if needed."""
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name)
+        return pool
+
+
+def get_connection(db_name):
+    """Return the calling thread's pooled connection for a database file."""
+    return get_pool(db_name).get()
+
+
+def close_all():
+    """Close every pooled connection (e.g. on application exit)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
@@ -0,0 +1,144 @@
+"""Run database work off the Tk event thread.
+
+Tkinter is not thread-safe, so workers never touch widgets: finished jobs go
+onto a queue that the Tk thread drains with root.after and only then are the
+callbacks run. Each worker thread gets its own pooled SQLite connection.
+"""
+import queue
+import threading
+import time
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 20
+WORKERS = 2
+
+
+class QueryStats:
+    """Running timing totals for one kind of query."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.errors = 0
+        self.cancelled = 0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+        }
+
+
+class QueryExecutor:
+    """Thread pool for queries whose results are delivered back on the Tk thread."""
+
+    def __init__(self, root, workers=WORKERS, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+        self._done = queue.Queue()
+        self._lock = threading.Lock()
+        self._latest = {}    # key -> sequence number of the newest request
+        self._pending = {}   # key -> future of the newest request
+        self._sequence = 0
+        self._stats = {}
+        self._running = True
+        self.root.after(self.poll_ms, self._drain)
+
+    def submit(self, func, *args, on_result=None, on_error=None, key=None, name=None):
+        """Run func(*args) on a worker thread.
+
+        on_result(result) or on_error(exception) is called on the Tk thread.
+        Submitting again with the same key supersedes the earlier request: it
+        is cancelled if it has not started, and its result is dropped if it has.
+        """
+        name = name or getattr(func, "__qualname__", repr(func))
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+            if key is not None:
+                stale = self._pending.pop(key, None)
+                if stale is not None and stale.cancel():
+                    self._stat(name).cancelled += 1
+                self._latest[key] = sequence
+
+        def run():
+            start = time.perf_counter()
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+            self._done.put((key, sequence, name, time.perf_counter() - start, result, error, on_result, on_error))
+
+        future = self._pool.submit(run)
+        if key is not None:
+            with self._lock:
+                self._pending[key] = future
+        return future
+
+    def cancel(self, key):
+        """Drop any outstanding request submitted under key."""
+        with self._lock:
+            self._latest.pop(key, None)
+            future = self._pending.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def stats(self):
+        """Return per-query timing instrumentation keyed by query name."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def shutdown(self):
+        """Stop polling and let the worker threads finish."""
+        self._running = False
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _stat(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = QueryStats()
+        return stats
+
+    def _drain(self):
+        """Deliver finished results on the Tk thread, then re-arm the poll."""
+        while True:
+            try:
+                key, sequence, name, elapsed, result, error, on_result, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                stats = self._stat(name)
+                stats.count += 1
+                stats.total += elapsed
+                stats.last = elapsed
+                stats.max = max(stats.max, elapsed)
+                stale = key is not None and self._latest.get(key) != sequence
+                if stale:
+                    stats.cancelled += 1
+                elif key is not None:
+                    self._latest.pop(key, None)
+                    self._pending.pop(key, None)
+                if error is not None:
+                    stats.errors += 1
+            if stale:
+                continue
+            if error is not None:
+                if on_error:
+                    on_error(error)
+                else:
+                    self.root.report_callback_exception(type(error), error, error.__traceback__)
+            elif on_result:
+                on_result(result)
+        if self._running:
+            try:
+                self.root.after(self.poll_ms, self._drain)
+            except tk.TclError:
+                self._running = False  # The root window has been destroyed
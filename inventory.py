@@ -0,0 +1,151 @@
+"""Per-departure seat inventory stored as a compact sold-seat bitmap.
+
+Each schedule has one seat_inventory row whose sold BLOB holds one bit per
+seat (bit n-1 set = seat n sold), so a year of daily departures costs one
+small row each instead of one tickets row per seat. Who bought a seat is
+recorded in schedule_tickets, which only ever holds sold seats. Both are
+written in the same transaction by booking.py.
+
+The tickets table holds each bus's seat layout: one row per seat with its
+price and optional seat class, generated in bulk from the bus's capacity.
+"""
+import re
+from collections import namedtuple
+
+# The first `seats` seats not claimed by an earlier tier are sold at `price`
+SeatTier = namedtuple("SeatTier", "seat_class seats price")
+
+_TIER_RE = re.compile(r"^\s*(?:([^:@]+?)\s*:)?\s*(\d+)\s*@\s*(\d+(?:\.\d+)?)\s*$")
+
+
+def empty_bitmap(capacity):
+    """Return an all-unsold bitmap for a bus of the given capacity."""
+    return bytes((capacity + 7) // 8)
+
+
+def is_sold(bitmap, seat_number):
+    pos = seat_number - 1
+    return bool(bitmap[pos >> 3] & (1 << (pos & 7)))
+
+
+def set_seats(bitmap, seat_numbers, sold):
+    """Return a copy of bitmap with the given seats marked sold or unsold."""
+    bits = bytearray(bitmap)
+    for seat_number in seat_numbers:
+        pos = seat_number - 1
+        if sold:
+            bits[pos >> 3] |= 1 << (pos & 7)
+        else:
+            bits[pos >> 3] &= ~(1 << (pos & 7)) & 0xFF
+    return bytes(bits)
+
+
+def load(conn, schedule_id):
+    """Return (capacity, sold bitmap) for a departure, or None if it does not exist.
+
+    Departures without an inventory row, or whose bitmap was left NULL by a
+    migration, are (re)built from schedule_tickets here.
+    """
+    row = conn.execute("SELECT capacity, sold FROM seat_inventory WHERE schedule_id = ?", (schedule_id,)).fetchone()
+    if row is not None and row[1] is not None:
+        return row[0], row[1]
+    if row is None:
+        bus = conn.execute("""
+            SELECT schedules.bus_id, buses.capacity
+            FROM schedules JOIN buses ON buses.bus_id = schedules.bus_id
+            WHERE schedules.schedule_id = ?
+        """, (schedule_id,)).fetchone()
+        if bus is None:
+            return None
+        conn.execute("INSERT OR IGNORE INTO seat_inventory (schedule_id, bus_id, capacity) VALUES (?, ?, ?)",
+                     (schedule_id, *bus))
+        capacity = bus[1]
+    else:
+        capacity = row[0]
+    sold = [seat for (seat,) in conn.execute("SELECT seat_number FROM schedule_tickets WHERE schedule_id = ?",
+                                             (schedule_id,)) if 1 <= seat <= capacity]
+    bitmap = set_seats(empty_bitmap(capacity), sold, True)
+    conn.execute("UPDATE seat_inventory SET sold = ?, sold_count = ? WHERE schedule_id = ?",
+                 (bitmap, len(sold), schedule_id))
+    return capacity, bitmap
+
+
+def store(conn, schedule_id, bitmap, delta):
+    """Write back a departure's bitmap after delta seats were sold (or released, if negative)."""
+    conn.execute("UPDATE seat_inventory SET sold = ?, sold_count = sold_count + ? WHERE schedule_id = ?",
+                 (bitmap, delta, schedule_id))
+
+
+def parse_tiers(text):
+    """Parse "Business:8@1500, Premium:12@1200" into SeatTiers; class names are optional."""
+    tiers = []
+    for part in filter(str.strip, (text or "").split(",")):
+        match = _TIER_RE.match(part)
+        if match is None:
+            raise ValueError(f"Invalid seat tier {part.strip()!r}; expected [class:]seats@price")
+        seat_class, seats, price = match.groups()
+        tiers.append(SeatTier(seat_class, int(seats), float(price)))
+    return tiers
+
+
+def tier_prices(capacity, price, tiers=()):
+    """Yield (seat_number, seat_class, price) for seats 1..capacity.
+
+    Tiers are filled in order from seat 1; seats past the last tier get the
+    bus's base price and no class.
+    """
+    seat = 1
+    for tier in tiers:
+        last = min(capacity, seat + tier.seats - 1)
+        while seat <= last:
+            yield seat, tier.seat_class, tier.price
+            seat += 1
+    while seat <= capacity:
+        yield seat, None, price
+        seat += 1
+
+
+def generate_seats(conn, bus_id, capacity, price, tiers=()):
+    """Write a bus's seat layout for seats 1..capacity in one executemany.
+
+    Existing seats keep their status and buyer and only get the new price and
+    class; unsold seats beyond capacity are removed. Returns the seat count.
+    The caller owns the transaction.
+    """
+    conn.executemany("""
+        INSERT INTO tickets (bus_id, seat_number, seat_id, price, seat_class, status)
+        VALUES (?, ?, ?, ?, ?, 'unsold')
+        ON CONFLICT (seat_id) DO UPDATE SET price = excluded.price, seat_class = excluded.seat_class
+    """, ((bus_id, seat, f"{bus_id}-{seat}", seat_price, seat_class)
+          for seat, seat_class, seat_price in tier_prices(capacity, price, tiers)))
+    conn.execute("DELETE FROM tickets WHERE bus_id = ? AND seat_number > ? AND status = 'unsold'", (bus_id, capacity))
+    return capacity
+
+
+def resize_departures(conn, bus_id, capacity):
+    """Give every departure of a bus an inventory row of the given capacity.
+
+    Bitmaps are reset to NULL so load() rebuilds them from schedule_tickets.
+    Returns the number of departures. The caller owns the transaction.
+    """
+    conn.execute("""
+        INSERT OR IGNORE INTO seat_inventory (schedule_id, bus_id, capacity)
+        SELECT schedule_id, bus_id, ? FROM schedules WHERE bus_id = ?
+    """, (capacity, bus_id))
+    cur = conn.execute("""
+        UPDATE seat_inventory
+        SET capacity = ?, sold = NULL,
+            sold_count = (SELECT COUNT(*) FROM schedule_tickets
+                          WHERE schedule_id = seat_inventory.schedule_id AND seat_number BETWEEN 1 AND ?)
+        WHERE bus_id = ?
+    """, (capacity, capacity, bus_id))
+    return cur.rowcount
+
+
+def prices(conn, bus_id, seat_numbers, default):
+    """Return {seat_number: price} from a bus's seat layout, using default for seats it lacks."""
+    placeholders = ", ".join("?" for _ in seat_numbers)
+    layout = dict(conn.execute(f"""
+        SELECT seat_number, price FROM tickets WHERE bus_id = ? AND seat_number IN ({placeholders})
+    """, (bus_id, *seat_numbers)))
+    return {seat: layout.get(seat, default) for seat in seat_numbers}
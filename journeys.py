@@ -0,0 +1,179 @@
+"""Stop-to-stop journey planning over the normalized route_stops table.
+
+Routes are loaded once into an in-memory adjacency index (stop -> routes
+through it, route -> ordered stops, route -> timetabled trips) so a query
+only touches the routes that serve the origin and destination.
+
+Schedules only record departure from the first stop and arrival at the last,
+so every leg is timed with its whole trip: a transfer is allowed when the
+second trip departs no earlier than the first one arrives.
+
+An index remembers the table_versions counters of routes and schedules it
+was built at (route_stops and stops only change together with routes), so
+a change made by any connection or process shows up as a version mismatch.
+"""
+import bisect
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+Trip = namedtuple("Trip", "departure arrival schedule_id bus_id")
+Leg = namedtuple("Leg", "route_id bus_id schedule_id board alight departure arrival")
+
+def split_stops(stops):
+    """Split the comma-separated routes.stops text into stop names."""
+    return [name.strip() for name in stops.split(",") if name.strip()]
+
+
+def sync_route_stops(conn, route_id, stops):
+    """Rewrite a route's route_stops rows from its comma-separated stops text."""
+    names = split_stops(stops)
+    cur = conn.cursor()
+    cur.executemany("INSERT OR IGNORE INTO stops (name) VALUES (?)", [(name,) for name in names])
+    cur.execute("DELETE FROM route_stops WHERE route_id = ?", (route_id,))
+    cur.executemany(
+        "INSERT OR IGNORE INTO route_stops (route_id, seq, stop_id) SELECT ?, ?, stop_id FROM stops WHERE name = ?",
+        [(route_id, seq, name) for seq, name in enumerate(names, start=1)],
+    )
+
+
+def table_versions(conn):
+    """Return the (routes, schedules) change counters kept by the table_versions triggers."""
+    versions = dict(conn.execute("SELECT name, version FROM table_versions WHERE name IN ('routes', 'schedules')"))
+    return versions.get("routes", 0), versions.get("schedules", 0)
+
+
+def _trip_times(departure_date, departure_time, arrival_time):
+    """Return (departure, arrival) datetimes, rolling arrival past midnight if needed."""
+    # fromisoformat is much faster than strptime when loading a national timetable
+    departure = datetime.fromisoformat(f"{departure_date}T{departure_time}")
+    arrival = datetime.fromisoformat(f"{departure_date}T{arrival_time}")
+    if arrival < departure:
+        arrival += timedelta(days=1)
+    return departure, arrival
+
+
+class StopIndex:
+    """In-memory adjacency index of stops, routes and timetabled trips."""
+
+    def __init__(self):
+        self.stop_ids = {}                    # lower-cased name -> stop_id
+        self.stop_names = {}                  # stop_id -> name
+        self.route_stops = defaultdict(list)  # route_id -> [stop_id, ...] in travel order
+        self.stop_routes = defaultdict(list)  # stop_id -> [(route_id, position), ...]
+        self.trips = defaultdict(list)        # route_id -> [Trip, ...] sorted by departure
+        self.versions = None                  # table_versions of routes and schedules it was built at
+
+    @classmethod
+    def load(cls, conn):
+        """Build an index from the stops, route_stops and schedules tables."""
+        index = cls()
+        # Read first: a change landing mid-load then only causes one extra reload
+        index.versions = table_versions(conn)
+        for stop_id, name in conn.execute("SELECT stop_id, name FROM stops"):
+            index.stop_ids[name.lower()] = stop_id
+            index.stop_names[stop_id] = name
+        for route_id, stop_id in conn.execute("SELECT route_id, stop_id FROM route_stops ORDER BY route_id, seq"):
+            stops = index.route_stops[route_id]
+            index.stop_routes[stop_id].append((route_id, len(stops)))
+            stops.append(stop_id)
+        for row in conn.execute("""
+            SELECT route_id, schedule_id, bus_id, departure_date, departure_time, arrival_time
+            FROM schedules
+        """):
+            route_id, schedule_id, bus_id = row[:3]
+            try:
+                departure, arrival = _trip_times(*row[3:])
+            except ValueError:
+                continue  # Skip schedules with malformed dates/times
+            index.trips[route_id].append(Trip(departure, arrival, schedule_id, bus_id))
+        for trips in index.trips.values():
+            trips.sort()
+        return index
+
+    def stop_id(self, name):
+        """Return the stop_id for a stop name (case-insensitive), or None."""
+        return self.stop_ids.get(name.strip().lower())
+
+    def first_trip(self, route_id, not_before):
+        """Return the first trip on a route departing at or after not_before, or None."""
+        trips = self.trips.get(route_id, [])
+        i = bisect.bisect_left(trips, (not_before,))
+        return trips[i] if i < len(trips) else None
+
+
+class JourneyPlanner:
+    """Find direct and one-transfer journeys between two stops."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def direct_routes(self, origin_id, destination_id):
+        """Return route_ids that visit origin before destination."""
+        after = {route_id: pos for route_id, pos in self.index.stop_routes.get(origin_id, [])}
+        return [route_id for route_id, pos in self.index.stop_routes.get(destination_id, [])
+                if route_id in after and after[route_id] < pos]
+
+    def transfer_routes(self, origin_id, destination_id):
+        """Return (first route, transfer stop, second route) triples with one change.
+
+        For each pair of routes the earliest transfer point on the first route is used.
+        """
+        index = self.index
+        # Stops reachable from the origin: stop_id -> [(route_id, position of stop)]
+        reachable = defaultdict(list)
+        for route_id, pos in index.stop_routes.get(origin_id, []):
+            for next_pos, stop_id in enumerate(index.route_stops[route_id][pos + 1:], start=pos + 1):
+                reachable[stop_id].append((route_id, next_pos))
+
+        best = {}
+        for route_id, pos in index.stop_routes.get(destination_id, []):
+            for stop_id in index.route_stops[route_id][:pos]:
+                for first_route, transfer_pos in reachable.get(stop_id, ()):
+                    if first_route == route_id:
+                        continue
+                    key = (first_route, route_id)
+                    if key not in best or transfer_pos < best[key][0]:
+                        best[key] = (transfer_pos, stop_id)
+        return [(first, stop_id, second) for (first, second), (_, stop_id) in best.items()]
+
+    def plan(self, origin, destination, date=None, max_results=20):
+        """Return journeys (lists of Leg) from origin to destination, earliest arrival first.
+
+        If date (YYYY-MM-DD) is given, the first leg must depart on that day;
+        otherwise any timetabled departure is considered.
+        """
+        index = self.index
+        origin_id, destination_id = index.stop_id(origin), index.stop_id(destination)
+        if origin_id is None or destination_id is None or origin_id == destination_id:
+            return []
+
+        start = datetime.strptime(date, "%Y-%m-%d") if date else datetime.min
+        end = start + timedelta(days=1) if date else datetime.max
+        board, alight = index.stop_names[origin_id], index.stop_names[destination_id]
+        journeys = []
+
+        direct = self.direct_routes(origin_id, destination_id)
+        for route_id in direct:
+            for trip in index.trips.get(route_id, []):
+                if start <= trip.departure < end:
+                    journeys.append([Leg(route_id, trip.bus_id, trip.schedule_id, board, alight,
+                                         trip.departure, trip.arrival)])
+
+        for first_route, stop_id, second_route in self.transfer_routes(origin_id, destination_id):
+            if first_route in direct or second_route in direct:
+                continue  # Changing buses is pointless when either bus goes straight through
+            transfer = index.stop_names[stop_id]
+            for trip in index.trips.get(first_route, []):
+                if not start <= trip.departure < end:
+                    continue
+                connection = index.first_trip(second_route, trip.arrival)
+                if connection is None:
+                    continue
+                journeys.append([
+                    Leg(first_route, trip.bus_id, trip.schedule_id, board, transfer, trip.departure, trip.arrival),
+                    Leg(second_route, connection.bus_id, connection.schedule_id, transfer, alight,
+                        connection.departure, connection.arrival),
+                ])
+
+        journeys.sort(key=lambda legs: (legs[-1].arrival, len(legs)))
+        return journeys[:max_results]
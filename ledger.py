@@ -0,0 +1,41 @@
+"""Transactions ledger: one row per booking and per refund.
+
+booking.book_seats and booking.cancel_ticket write their entry with
+insert() inside the same BEGIN IMMEDIATE transaction as the seat change,
+so a seat is never sold or released without its ledger row, and the entry
+costs no commit of its own: the ledger is exactly as durable as the seats
+(the connection's synchronous pragma, see db_pool.PRAGMAS).
+"""
+from collections import namedtuple
+from datetime import datetime, timezone
+
+BOOKING = "booking"
+REFUND = "refund"
+
+LedgerEntry = namedtuple("LedgerEntry", "kind user_id bus_id schedule_id seats amount created_at")
+
+_INSERT_SQL = """
+    INSERT INTO transactions (kind, user_id, bus_id, schedule_id, seats, total_amount, transaction_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def timestamp():
+    """Return the current UTC time formatted like SQLite's CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def sale_entry(user_id, bus_id, schedule_id, seat_prices):
+    """Return the LedgerEntry for seats sold to a user; seat_prices maps seat number to price."""
+    seats = ",".join(str(seat) for seat in sorted(seat_prices))
+    return LedgerEntry(BOOKING, user_id, bus_id, schedule_id, seats, sum(seat_prices.values()), timestamp())
+
+
+def refund_entry(user_id, bus_id, schedule_id, seat_number, price):
+    """Return the LedgerEntry for a cancelled ticket; refunds carry a negative amount."""
+    return LedgerEntry(REFUND, user_id, bus_id, schedule_id, str(seat_number), -price, timestamp())
+
+
+def insert(conn, entries):
+    """Insert LedgerEntry rows inside the caller's transaction; committing is up to the caller."""
+    conn.executemany(_INSERT_SQL, entries)
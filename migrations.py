@@ -0,0 +1,419 @@
+"""Versioned schema migrations applied on top of schema.sql.
+
+The applied version is tracked in PRAGMA user_version. Each migration is a
+(version, description, sql) tuple and runs exactly once, in order.
+"""
+
+MIGRATIONS = [
+    (1, "Add secondary indexes for hot lookup paths", """
+        -- fetch_available_seats, view_all_details: unsold seats per bus (covering)
+        CREATE INDEX IF NOT EXISTS idx_tickets_bus_status ON tickets (bus_id, status, seat_id);
+        -- fetch_user_purchased_tickets: a passenger's sold tickets
+        CREATE INDEX IF NOT EXISTS idx_tickets_user_status ON tickets (user_id, status);
+        -- fetch_bus_schedules is served by the UNIQUE (bus_id, departure_date, departure_time) index;
+        -- date lookups need their own index
+        CREATE INDEX IF NOT EXISTS idx_schedules_departure_date ON schedules (departure_date, departure_time);
+        CREATE INDEX IF NOT EXISTS idx_schedules_route ON schedules (route_id);
+        CREATE INDEX IF NOT EXISTS idx_buses_route ON buses (route_id);
+        CREATE INDEX IF NOT EXISTS idx_buses_name ON buses (name);
+        CREATE INDEX IF NOT EXISTS idx_routes_name ON routes (route_name);
+        CREATE INDEX IF NOT EXISTS idx_drivers_name ON drivers (name);
+        CREATE INDEX IF NOT EXISTS idx_prebooked_buses_user ON prebooked_buses (user_id);
+        CREATE INDEX IF NOT EXISTS idx_prebooked_buses_bus ON prebooked_buses (bus_id);
+        CREATE INDEX IF NOT EXISTS idx_driver_assignments_bus ON driver_assignments (bus_id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id);
+    """),
+    (2, "Add FTS5 search index over bus name, number, route name and stops", """
+        -- rowid is the bus_id; one document per bus
+        CREATE VIRTUAL TABLE IF NOT EXISTS bus_search USING fts5 (
+            name, number, route_name, stops,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        );
+
+        INSERT INTO bus_search (rowid, name, number, route_name, stops)
+        SELECT buses.bus_id, buses.name, buses.number, routes.route_name, routes.stops
+        FROM buses
+        LEFT JOIN routes ON buses.route_id = routes.route_id;
+
+        CREATE TRIGGER IF NOT EXISTS bus_search_bus_insert AFTER INSERT ON buses BEGIN
+            INSERT INTO bus_search (rowid, name, number, route_name, stops)
+            SELECT NEW.bus_id, NEW.name, NEW.number, routes.route_name, routes.stops
+            FROM (SELECT 1) LEFT JOIN routes ON routes.route_id = NEW.route_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bus_search_bus_update AFTER UPDATE OF name, number, route_id ON buses BEGIN
+            DELETE FROM bus_search WHERE rowid = OLD.bus_id;
+            INSERT INTO bus_search (rowid, name, number, route_name, stops)
+            SELECT NEW.bus_id, NEW.name, NEW.number, routes.route_name, routes.stops
+            FROM (SELECT 1) LEFT JOIN routes ON routes.route_id = NEW.route_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bus_search_bus_delete AFTER DELETE ON buses BEGIN
+            DELETE FROM bus_search WHERE rowid = OLD.bus_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bus_search_route_update AFTER UPDATE OF route_name, stops ON routes BEGIN
+            UPDATE bus_search SET route_name = NEW.route_name, stops = NEW.stops
+            WHERE rowid IN (SELECT bus_id FROM buses WHERE route_id = NEW.route_id);
+        END;
+    """),
+    (3, "Normalize routes.stops into stops and route_stops", """
+        CREATE TABLE IF NOT EXISTS stops (
+            stop_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE COLLATE NOCASE
+        );
+
+        CREATE TABLE IF NOT EXISTS route_stops (
+            route_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            stop_id INTEGER NOT NULL,
+            PRIMARY KEY (route_id, seq),
+            FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE CASCADE,
+            FOREIGN KEY (stop_id) REFERENCES stops(stop_id)
+        ) WITHOUT ROWID;
+
+        CREATE INDEX IF NOT EXISTS idx_route_stops_stop ON route_stops (stop_id, route_id, seq);
+
+        -- Split the comma-separated routes.stops text (trigger bodies cannot use CTEs,
+        -- so new and edited routes are kept in sync by journeys.sync_route_stops)
+        WITH RECURSIVE split (route_id, seq, name, rest) AS (
+            SELECT route_id, 0, '', stops || ',' FROM routes
+            UNION ALL
+            SELECT route_id, seq + 1, TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)), SUBSTR(rest, INSTR(rest, ',') + 1)
+            FROM split WHERE rest <> ''
+        )
+        INSERT OR IGNORE INTO stops (name) SELECT name FROM split WHERE seq > 0 AND name <> '' ORDER BY route_id, seq;
+
+        WITH RECURSIVE split (route_id, seq, name, rest) AS (
+            SELECT route_id, 0, '', stops || ',' FROM routes
+            UNION ALL
+            SELECT route_id, seq + 1, TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)), SUBSTR(rest, INSTR(rest, ',') + 1)
+            FROM split WHERE rest <> ''
+        )
+        INSERT OR IGNORE INTO route_stops (route_id, seq, stop_id)
+        SELECT split.route_id, split.seq, stops.stop_id
+        FROM split JOIN stops ON stops.name = split.name
+        WHERE split.seq > 0 AND split.name <> '';
+
+        CREATE TRIGGER IF NOT EXISTS route_stops_route_delete AFTER DELETE ON routes BEGIN
+            DELETE FROM route_stops WHERE route_id = OLD.route_id;
+        END;
+    """),
+    (4, "Maintain per-bus seat counts for the system-details report", """
+        CREATE TABLE IF NOT EXISTS bus_seat_counts (
+            bus_id INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            unsold INTEGER NOT NULL DEFAULT 0
+        );
+
+        INSERT OR REPLACE INTO bus_seat_counts (bus_id, total, unsold)
+        SELECT bus_id, COUNT(*), SUM(status IS 'unsold') FROM tickets GROUP BY bus_id;
+
+        CREATE TRIGGER IF NOT EXISTS bus_seat_counts_ticket_insert AFTER INSERT ON tickets BEGIN
+            INSERT INTO bus_seat_counts (bus_id, total, unsold) VALUES (NEW.bus_id, 1, NEW.status IS 'unsold')
+            ON CONFLICT (bus_id) DO UPDATE SET total = total + 1, unsold = unsold + excluded.unsold;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bus_seat_counts_ticket_delete AFTER DELETE ON tickets BEGIN
+            UPDATE bus_seat_counts SET total = total - 1, unsold = unsold - (OLD.status IS 'unsold')
+            WHERE bus_id = OLD.bus_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bus_seat_counts_ticket_update AFTER UPDATE OF bus_id, status ON tickets BEGIN
+            UPDATE bus_seat_counts SET total = total - 1, unsold = unsold - (OLD.status IS 'unsold')
+            WHERE bus_id = OLD.bus_id;
+            INSERT INTO bus_seat_counts (bus_id, total, unsold) VALUES (NEW.bus_id, 1, NEW.status IS 'unsold')
+            ON CONFLICT (bus_id) DO UPDATE SET total = total + 1, unsold = unsold + excluded.unsold;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bus_seat_counts_bus_delete AFTER DELETE ON buses BEGIN
+            DELETE FROM bus_seat_counts WHERE bus_id = OLD.bus_id;
+        END;
+    """),
+    (5, "Track seat inventory per departure with a sold-seat bitmap", """
+        -- One row per departure. Bit n-1 of sold is set when seat n is sold;
+        -- a NULL bitmap is rebuilt from schedule_tickets on first use.
+        CREATE TABLE IF NOT EXISTS seat_inventory (
+            schedule_id INTEGER PRIMARY KEY,
+            bus_id INTEGER NOT NULL,
+            capacity INTEGER NOT NULL,
+            sold BLOB,
+            sold_count INTEGER NOT NULL DEFAULT 0
+        );
+        -- Only seats that have actually been sold get a row
+        CREATE TABLE IF NOT EXISTS schedule_tickets (
+            ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            seat_number INTEGER NOT NULL,
+            user_id INTEGER,
+            price REAL NOT NULL,
+            UNIQUE (schedule_id, seat_number)
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedule_tickets_user ON schedule_tickets (user_id);
+
+        INSERT OR IGNORE INTO seat_inventory (schedule_id, bus_id, capacity, sold)
+        SELECT schedules.schedule_id, schedules.bus_id, buses.capacity, zeroblob((buses.capacity + 7) / 8)
+        FROM schedules JOIN buses ON buses.bus_id = schedules.bus_id;
+
+        -- Tickets sold before departures were tracked belong to the bus's first departure
+        INSERT OR IGNORE INTO schedule_tickets (schedule_id, seat_number, user_id, price)
+        SELECT first.schedule_id, tickets.seat_number, tickets.user_id, tickets.price
+        FROM tickets
+        JOIN seat_inventory AS first ON first.schedule_id = (
+            SELECT schedule_id FROM schedules WHERE schedules.bus_id = tickets.bus_id
+            ORDER BY departure_date, departure_time LIMIT 1
+        )
+        WHERE tickets.status = 'sold' AND tickets.seat_number BETWEEN 1 AND first.capacity;
+
+        UPDATE seat_inventory
+        SET sold = NULL,
+            sold_count = (SELECT COUNT(*) FROM schedule_tickets WHERE schedule_id = seat_inventory.schedule_id)
+        WHERE schedule_id IN (SELECT DISTINCT schedule_id FROM schedule_tickets);
+
+        CREATE TRIGGER IF NOT EXISTS seat_inventory_schedule_insert AFTER INSERT ON schedules BEGIN
+            INSERT OR IGNORE INTO seat_inventory (schedule_id, bus_id, capacity, sold)
+            SELECT NEW.schedule_id, NEW.bus_id, capacity, zeroblob((capacity + 7) / 8)
+            FROM buses WHERE bus_id = NEW.bus_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS seat_inventory_schedule_delete AFTER DELETE ON schedules BEGIN
+            DELETE FROM seat_inventory WHERE schedule_id = OLD.schedule_id;
+            DELETE FROM schedule_tickets WHERE schedule_id = OLD.schedule_id;
+        END;
+    """),
+    (6, "Add seat classes to bus seat layouts", """
+        ALTER TABLE tickets ADD COLUMN seat_class TEXT;
+        -- Per-seat prices when booking a departure
+        CREATE INDEX IF NOT EXISTS idx_tickets_bus_seat ON tickets (bus_id, seat_number);
+        -- Regenerating a bus's inventory touches all of its departures
+        CREATE INDEX IF NOT EXISTS idx_seat_inventory_bus ON seat_inventory (bus_id);
+    """),
+    (7, "Add recurring schedule rules", """
+        -- weekdays is a bitmask (bit 0 = Monday); exceptions are comma-separated YYYY-MM-DD dates
+        CREATE TABLE IF NOT EXISTS schedule_rules (
+            rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bus_id INTEGER NOT NULL,
+            route_id INTEGER NOT NULL,
+            departure_time TEXT NOT NULL,
+            arrival_time TEXT NOT NULL,
+            weekdays INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            exceptions TEXT NOT NULL DEFAULT '',
+            materialized_until TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedule_rules_bus ON schedule_rules (bus_id, end_date);
+        CREATE INDEX IF NOT EXISTS idx_schedule_rules_dates ON schedule_rules (end_date, start_date);
+
+        -- Departures generated from a rule remember it so the rule can be withdrawn
+        ALTER TABLE schedules ADD COLUMN rule_id INTEGER;
+        CREATE INDEX IF NOT EXISTS idx_schedules_rule ON schedules (rule_id, departure_date);
+    """),
+    (8, "Add revenue and occupancy summary tables", """
+        CREATE TABLE IF NOT EXISTS daily_bus_stats (
+            day TEXT NOT NULL,
+            bus_id INTEGER NOT NULL,
+            route_id INTEGER,
+            departures INTEGER NOT NULL DEFAULT 0,
+            capacity INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            ticket_revenue REAL NOT NULL DEFAULT 0,
+            payments REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, bus_id)
+        );
+        CREATE TABLE IF NOT EXISTS daily_route_stats (
+            day TEXT NOT NULL,
+            route_id INTEGER NOT NULL,
+            departures INTEGER NOT NULL DEFAULT 0,
+            capacity INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            ticket_revenue REAL NOT NULL DEFAULT 0,
+            payments REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, route_id)
+        );
+
+        -- Days whose summaries are out of date; version lets a refresh clear only what it saw
+        CREATE TABLE IF NOT EXISTS analytics_dirty_days (
+            day TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (transaction_date);
+
+        INSERT OR IGNORE INTO analytics_dirty_days (day) SELECT DISTINCT departure_date FROM schedules;
+        INSERT OR IGNORE INTO analytics_dirty_days (day)
+        SELECT DISTINCT date(transaction_date) FROM transactions WHERE date(transaction_date) IS NOT NULL;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_ticket_insert AFTER INSERT ON schedule_tickets BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT departure_date FROM schedules WHERE schedule_id = NEW.schedule_id
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_ticket_delete AFTER DELETE ON schedule_tickets BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT departure_date FROM schedules WHERE schedule_id = OLD.schedule_id
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_schedule_insert AFTER INSERT ON schedules BEGIN
+            INSERT INTO analytics_dirty_days (day) VALUES (NEW.departure_date)
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_schedule_update AFTER UPDATE OF departure_date, bus_id, route_id ON schedules BEGIN
+            INSERT INTO analytics_dirty_days (day) VALUES (OLD.departure_date), (NEW.departure_date)
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_schedule_delete AFTER DELETE ON schedules BEGIN
+            INSERT INTO analytics_dirty_days (day) VALUES (OLD.departure_date)
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_capacity_update AFTER UPDATE OF capacity ON seat_inventory BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT departure_date FROM schedules WHERE schedule_id = NEW.schedule_id
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS analytics_transaction_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO analytics_dirty_days (day) SELECT date(NEW.transaction_date) WHERE date(NEW.transaction_date) IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET version = version + 1;
+        END;
+    """),
+    (9, "Record bookings and refunds in the transactions ledger", """
+        -- Refunds are stored with a negative total_amount so sums give net takings
+        ALTER TABLE transactions ADD COLUMN kind TEXT NOT NULL DEFAULT 'booking' CHECK (kind IN ('booking', 'refund'));
+        ALTER TABLE transactions ADD COLUMN schedule_id INTEGER;
+        ALTER TABLE transactions ADD COLUMN seats TEXT;
+        CREATE INDEX IF NOT EXISTS idx_transactions_schedule ON transactions (schedule_id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_bus ON transactions (bus_id);
+    """),
+    (10, "Count changes to routes, drivers and buses for the reference-data cache", """
+        -- refcache reads these after PRAGMA data_version moves to see which tables another connection changed
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        INSERT OR IGNORE INTO table_versions (name) VALUES ('routes'), ('drivers'), ('buses');
+
+        CREATE TRIGGER IF NOT EXISTS table_versions_routes_insert AFTER INSERT ON routes BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'routes';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_routes_update AFTER UPDATE ON routes BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'routes';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_routes_delete AFTER DELETE ON routes BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'routes';
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS table_versions_drivers_insert AFTER INSERT ON drivers BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'drivers';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_drivers_update AFTER UPDATE ON drivers BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'drivers';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_drivers_delete AFTER DELETE ON drivers BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'drivers';
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS table_versions_buses_insert AFTER INSERT ON buses BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'buses';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_buses_update AFTER UPDATE ON buses BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'buses';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_buses_delete AFTER DELETE ON buses BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'buses';
+        END;
+    """),
+    (11, "Tie prebookings to departures as whole-bus charters", """
+        ALTER TABLE prebooked_buses ADD COLUMN schedule_id INTEGER;
+
+        -- The GUI stored the departure date as prebook_date. Link the first such prebooking
+        -- of a bus and date to that day's first departure; the rest stay unlinked (NULL).
+        UPDATE prebooked_buses SET schedule_id = (
+            SELECT schedule_id FROM schedules
+            WHERE schedules.bus_id = prebooked_buses.bus_id AND schedules.departure_date = prebooked_buses.prebook_date
+            ORDER BY departure_time LIMIT 1
+        )
+        WHERE prebook_id IN (
+            SELECT MIN(prebook_id) FROM prebooked_buses WHERE length(prebook_date) = 10 GROUP BY bus_id, prebook_date
+        );
+
+        -- At most one charter per departure; NULLs (unlinked prebookings) may repeat
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_prebooked_buses_schedule ON prebooked_buses (schedule_id);
+
+        CREATE TRIGGER IF NOT EXISTS prebooked_buses_schedule_delete AFTER DELETE ON schedules BEGIN
+            DELETE FROM prebooked_buses WHERE schedule_id = OLD.schedule_id;
+        END;
+    """),
+    (12, "Count changes to schedules for the conflict index", """
+        -- conflicts.get_index() reloads when another connection changed schedules or buses
+        INSERT OR IGNORE INTO table_versions (name) VALUES ('schedules');
+
+        CREATE TRIGGER IF NOT EXISTS table_versions_schedules_insert AFTER INSERT ON schedules BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'schedules';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_schedules_update AFTER UPDATE ON schedules BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'schedules';
+        END;
+        CREATE TRIGGER IF NOT EXISTS table_versions_schedules_delete AFTER DELETE ON schedules BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'schedules';
+        END;
+    """),
+    (13, "Drop the per-bus seat counts superseded by seat_inventory", """
+        -- The system-details report counts available seats per departure from seat_inventory
+        DROP TRIGGER IF EXISTS bus_seat_counts_ticket_insert;
+        DROP TRIGGER IF EXISTS bus_seat_counts_ticket_delete;
+        DROP TRIGGER IF EXISTS bus_seat_counts_ticket_update;
+        DROP TRIGGER IF EXISTS bus_seat_counts_bus_delete;
+        DROP TABLE IF EXISTS bus_seat_counts;
+    """),
+    (14, "Key bus summaries by route as well as day and bus", """
+        -- A bus serving two routes in one day gets a summary row per route
+        DROP TABLE IF EXISTS daily_bus_stats;
+        CREATE TABLE daily_bus_stats (
+            day TEXT NOT NULL,
+            bus_id INTEGER NOT NULL,
+            route_id INTEGER,
+            departures INTEGER NOT NULL DEFAULT 0,
+            capacity INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            ticket_revenue REAL NOT NULL DEFAULT 0,
+            payments REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, bus_id, route_id)
+        );
+        DELETE FROM daily_route_stats;
+
+        -- Recompute every day on the next analytics refresh
+        INSERT INTO analytics_dirty_days (day)
+        SELECT departure_date FROM schedules WHERE true
+        UNION SELECT date(transaction_date) FROM transactions WHERE date(transaction_date) IS NOT NULL
+        ON CONFLICT (day) DO UPDATE SET version = version + 1;
+    """),
+]
+
+
+def current_version(conn):
+    """Return the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every migration newer than the database's current version."""
+    version = current_version(conn)
+    for number, description, sql in MIGRATIONS:
+        if number <= version:
+            continue
+        # executescript commits first, so each migration is wrapped in its own transaction
+        try:
+            conn.executescript(f"BEGIN; {sql} PRAGMA user_version = {number}; COMMIT;")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        print(f"Applied migration {number}: {description}")
+    return current_version(conn)
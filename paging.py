@@ -0,0 +1,55 @@
+"""Keyset (cursor) pagination over arbitrary SELECT statements.
+
+A page query wraps the base SELECT, applies the text filter and the cursor
+condition in SQL, and orders by the sort column followed by the key columns
+so every page is a cheap range read instead of an OFFSET scan. Key columns
+must be non-NULL and unique together; the sort column may contain NULLs.
+"""
+from collections import namedtuple
+
+PAGE_SIZE = 200
+
+Page = namedtuple("Page", "rows cursor")
+
+
+def fetch_page(conn, sql, columns, key_columns, sort=None, descending=False, after=None,
+               limit=PAGE_SIZE, search=None, search_columns=(), params=()):
+    """Return the next Page of rows from sql.
+
+    sql must select exactly `columns` (by alias). `after` is the cursor of the
+    previous page, or None for the first page. The returned cursor is None
+    when there are no more rows.
+    """
+    sort = sort or key_columns[0]
+    if sort not in columns:
+        raise ValueError(f"Unknown sort column: {sort}")
+
+    order = [sort] + [column for column in key_columns if column != sort]
+    # NULLs cannot be compared in a row value, so fold them into '' for the sort column
+    exprs = [column if column in key_columns else f"IFNULL({column}, '')" for column in order]
+
+    where, args = [], list(params)
+    if search:
+        where.append("(" + " OR ".join(f"{column} LIKE ?" for column in search_columns) + ")")
+        args += [f"%{search}%"] * len(search_columns)
+    if after is not None:
+        placeholders = ", ".join("?" for _ in exprs)
+        where.append(f"({', '.join(exprs)}) {'<' if descending else '>'} ({placeholders})")
+        args += list(after)
+
+    direction = " DESC" if descending else ""
+    query = f"SELECT * FROM ({sql})"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY " + ", ".join(expr + direction for expr in exprs) + " LIMIT ?"
+    args.append(limit)
+
+    rows = conn.execute(query, args).fetchall()
+    if len(rows) < limit:
+        return Page(rows, None)
+    last = rows[-1]
+    cursor = tuple(
+        last[columns.index(column)] if column in key_columns or last[columns.index(column)] is not None else ""
+        for column in order
+    )
+    return Page(rows, cursor)
@@ -0,0 +1,117 @@
+"""Whole-bus charters (prebookings) of individual departures.
+
+A prebooking reserves every seat of one departure (schedule_id) for one
+user, so it excludes seat sales in both directions: a departure with any
+seat sold cannot be chartered, and booking.book_seats refuses seats on a
+chartered departure. Both checks run inside a BEGIN IMMEDIATE transaction,
+so of two terminals racing for the same departure only the first to get
+the write lock succeeds. The unique index on prebooked_buses.schedule_id
+backs this up in the schema itself.
+
+Prebookings made before departures were tracked have a NULL schedule_id;
+they are still listed but reserve nothing.
+"""
+import sqlite3
+
+import booking
+import inventory
+
+# Reasons a departure cannot be chartered
+NO_DEPARTURE = "no such departure"
+CHARTERED = "already chartered"
+SEATS_SOLD = "seats already sold"
+
+
+class CharterUnavailable(ValueError):
+    """Raised when a departure cannot be chartered."""
+
+    def __init__(self, schedule_id, reason):
+        self.schedule_id = schedule_id
+        self.reason = reason
+        super().__init__(f"Departure {schedule_id} cannot be prebooked: {reason}")
+
+
+def is_chartered(conn, schedule_id):
+    """Return True if a departure has been chartered."""
+    return conn.execute("SELECT 1 FROM prebooked_buses WHERE schedule_id = ?", (schedule_id,)).fetchone() is not None
+
+
+def available(conn, bus_id):
+    """Return (schedule_id, departure_date, departure_time, arrival_time) for a bus's charterable departures.
+
+    Driven by the schedules (bus_id, ...) unique index, with one lookup per
+    departure in the seat_inventory primary key and the charter index.
+    """
+    return conn.execute("""
+        SELECT schedules.schedule_id, schedules.departure_date, schedules.departure_time, schedules.arrival_time
+        FROM schedules
+        LEFT JOIN seat_inventory ON seat_inventory.schedule_id = schedules.schedule_id
+        WHERE schedules.bus_id = ?
+            AND IFNULL(seat_inventory.sold_count, 0) = 0
+            AND NOT EXISTS (SELECT 1 FROM prebooked_buses WHERE prebooked_buses.schedule_id = schedules.schedule_id)
+        ORDER BY schedules.departure_date, schedules.departure_time
+    """, (bus_id,)).fetchall()
+
+
+def _claim_bus(conn, schedule_id, user_id):
+    """Charter a departure inside one BEGIN IMMEDIATE transaction; returns the prebook_id."""
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        # The write lock is held from here on, so neither check can go stale before the insert
+        cur.execute("SELECT bus_id, departure_date FROM schedules WHERE schedule_id = ?", (schedule_id,))
+        departure = cur.fetchone()
+        if departure is None:
+            raise CharterUnavailable(schedule_id, NO_DEPARTURE)
+        if is_chartered(conn, schedule_id):
+            raise CharterUnavailable(schedule_id, CHARTERED)
+        loaded = inventory.load(conn, schedule_id)
+        if loaded is not None and any(loaded[1]):
+            raise CharterUnavailable(schedule_id, SEATS_SOLD)
+        cur.execute("""
+            INSERT INTO prebooked_buses (user_id, bus_id, schedule_id, prebook_date) VALUES (?, ?, ?, ?)
+        """, (user_id, departure[0], schedule_id, departure[1]))
+        conn.commit()
+        return cur.lastrowid
+    except sqlite3.IntegrityError:
+        # Only reachable if a row was written without going through this check
+        conn.rollback()
+        raise CharterUnavailable(schedule_id, CHARTERED) from None
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def charter(conn, schedule_id, user_id, retry=None):
+    """Reserve a whole departure for a user and return the prebook_id.
+
+    Raises CharterUnavailable if the departure does not exist, is already
+    chartered or has seats sold.
+    """
+    retry = retry or booking.RetryPolicy()
+    return retry.run(lambda: _claim_bus(conn, schedule_id, user_id))
+
+
+def _release_bus(conn, prebook_id, user_id):
+    """Delete a user's prebooking inside one BEGIN IMMEDIATE transaction.
+
+    Returns (found, schedule_id); schedule_id is None for prebookings not tied to a departure.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT schedule_id FROM prebooked_buses WHERE prebook_id = ? AND user_id = ?", (prebook_id, user_id))
+        row = cur.fetchone()
+        if row is not None:
+            cur.execute("DELETE FROM prebooked_buses WHERE prebook_id = ?", (prebook_id,))
+        conn.commit()
+        return (True, row[0]) if row is not None else (False, None)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def cancel(conn, prebook_id, user_id, retry=None):
+    """Cancel a user's prebooking; returns (found, schedule_id of the released departure)."""
+    retry = retry or booking.RetryPolicy()
+    return retry.run(lambda: _release_bus(conn, prebook_id, user_id))
@@ -0,0 +1,329 @@
+"""Per-statement instrumentation for pooled SQLite connections, with a slow-query log.
+
+db_pool opens its connections with TracedConnection, whose cursors time
+every execute and fetch. Statements are grouped by fingerprint: the SQL
+with literals replaced by ? and whitespace collapsed. For each fingerprint
+the log keeps the call count, total and worst time, rows returned (or
+changed) and the call sites (the first frame outside this module, db_pool,
+paging and sqlite3).
+
+A statement whose time crosses the slow threshold is logged once through
+the "querylog" logger, together with its EXPLAIN QUERY PLAN, and kept in a
+short list of recent offenders. Time spent fetching rows counts towards the
+statement that produced them.
+"""
+import csv
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+THRESHOLD_MS = 50    # Statements slower than this are logged with their query plan
+MAX_SLOW = 100       # Recent slow statements kept for the Performance panel
+MAX_SITES = 5        # Call sites reported per fingerprint
+
+logger = logging.getLogger("querylog")
+
+SlowQuery = namedtuple("SlowQuery", "fingerprint sql params duration_ms call_site plan logged_at")
+StatementStats = namedtuple("StatementStats", "fingerprint calls total_ms avg_ms max_ms rows call_sites")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# Helpers that run SQL on behalf of a caller; the caller is the interesting call site
+_SKIP_MODULES = {os.path.join(_HERE, name) for name in ("querylog", "db_pool", "paging")}
+_SKIP_DIRS = (os.path.dirname(sqlite3.__file__),)
+_places = {}  # code object -> (file name, function name), or None if its frames are skipped
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Return sql without comments, with literals as ?, IN lists folded and whitespace collapsed."""
+    sql = _LITERALS.sub("?", _COMMENTS.sub(" ", sql))
+    sql = _IN_LISTS.sub("(?, ...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def call_site():
+    """Return (file name, line, function) for the code that issued the current statement.
+
+    Kept as a tuple while recording; site_text() formats it for display.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        place = _places.get(code, False)
+        if place is False:
+            filename = os.path.abspath(code.co_filename)
+            skip = filename.rsplit(".", 1)[0] in _SKIP_MODULES or filename.startswith(_SKIP_DIRS)
+            place = _places[code] = None if skip else (os.path.basename(filename), code.co_name)
+        if place is not None:
+            return place[0], frame.f_lineno, place[1]
+        frame = frame.f_back
+    return "?", 0, "?"
+
+
+def site_text(site):
+    """Format a call_site() tuple as "file:line in function"."""
+    return "%s:%d in %s" % site
+
+
+def explain(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN of sql as text lines, or an empty list if it cannot be explained.
+
+    With params None (an executemany), every placeholder is bound to NULL.
+    """
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    if params is None:
+        params = [None] * _LITERALS.sub("", sql).count("?")
+    try:
+        cur = sqlite3.Cursor(conn)  # A plain cursor, so explaining is not itself traced
+        return [row[-1] for row in cur.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+
+
+class _Entry:
+    __slots__ = ("calls", "total", "max", "rows", "sites")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.sites = Counter()
+
+
+class QueryLog:
+    """Thread-safe aggregate of statement timings plus the recent slow statements."""
+
+    def __init__(self, threshold_ms=THRESHOLD_MS, max_slow=MAX_SLOW):
+        self.threshold = threshold_ms / 1000
+        self.enabled = True
+        self._entries = {}
+        self._fingerprints = {}  # SQL text -> fingerprint, since the same strings recur
+        self._slow = deque(maxlen=max_slow)
+        self._lock = threading.Lock()
+
+    def fingerprint(self, sql):
+        found = self._fingerprints.get(sql)
+        if found is None:
+            found = fingerprint(sql)
+            if len(self._fingerprints) < 10_000:
+                self._fingerprints[sql] = found
+        return found
+
+    def record(self, key, site, elapsed, rows, new_call, call_elapsed):
+        """Add one execute (new_call) or fetch to a fingerprint's totals; call_elapsed is the call's time so far."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            if new_call:
+                entry.calls += 1
+                entry.sites[site] += 1
+            entry.total += elapsed
+            entry.rows += rows
+            if call_elapsed > entry.max:
+                entry.max = call_elapsed
+
+    def slow(self, conn, key, sql, params, elapsed, site):
+        """Log a statement that crossed the threshold, with its query plan."""
+        plan = explain(conn, sql, params)
+        shown = "(many)" if params is None else repr(params)[:200]
+        site = site_text(site)
+        entry = SlowQuery(key, sql, shown, round(elapsed * 1000, 3), site, plan, time.strftime("%Y-%m-%d %H:%M:%S"))
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning("Slow query (%.1f ms) at %s: %s\n    %s", elapsed * 1000, site, key,
+                       "\n    ".join(plan) or "(no plan)")
+
+    def stats(self):
+        """Return a StatementStats per fingerprint, most total time first."""
+        with self._lock:
+            rows = [
+                StatementStats(key, entry.calls, round(entry.total * 1000, 3),
+                               round(entry.total * 1000 / entry.calls, 3) if entry.calls else 0.0,
+                               round(entry.max * 1000, 3), entry.rows,
+                               [site_text(site) for site, _ in entry.sites.most_common(MAX_SITES)])
+                for key, entry in self._entries.items()
+            ]
+        return sorted(rows, key=lambda row: row.total_ms, reverse=True)
+
+    def slow_queries(self):
+        """Return the recent SlowQuery entries, newest last."""
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        """Forget every aggregate and slow statement."""
+        with self._lock:
+            self._entries.clear()
+            self._slow.clear()
+
+    def dump(self, path):
+        """Write the aggregates to path as CSV (".csv") or JSON (anything else, with the slow log too)."""
+        stats = self.stats()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(StatementStats._fields)
+                for row in stats:
+                    writer.writerow([*row[:-1], "; ".join(row.call_sites)])
+        else:
+            with open(path, "w") as out:
+                json.dump({
+                    "threshold_ms": self.threshold * 1000,
+                    "statements": [row._asdict() for row in stats],
+                    "slow": [row._asdict() for row in self.slow_queries()],
+                }, out, indent=2)
+        return len(stats)
+
+
+LOG = QueryLog()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """A cursor that reports every execute and fetch to LOG.
+
+    Time and rows accumulate on the cursor and reach LOG once per statement:
+    when its rows run out, fetchall/fetchmany return, the cursor runs the
+    next statement or the cursor is freed.
+    """
+
+    _key = None
+
+    def _start(self, sql, params):
+        if self._key is not None:
+            self._flush()  # The previous statement's rows were never exhausted
+        self._key = LOG.fingerprint(sql)
+        self._sql, self._params = sql, params
+        self._site = call_site()
+        self._new_call = True
+        self._logged = False
+        self._elapsed = self._unrecorded = 0.0
+        self._unrecorded_rows = 0
+
+    def _account(self, elapsed, rows, done=False):
+        if self._key is None:
+            return
+        self._elapsed += elapsed
+        self._unrecorded += elapsed
+        self._unrecorded_rows += rows
+        if self._elapsed >= LOG.threshold and not self._logged:
+            self._logged = True
+            LOG.slow(self.connection, self._key, self._sql, self._params, self._elapsed, self._site)
+        if done:
+            self._flush()
+
+    def _flush(self):
+        if self._new_call or self._unrecorded_rows or self._unrecorded:
+            LOG.record(self._key, self._site, self._unrecorded, self._unrecorded_rows, self._new_call, self._elapsed)
+            self._new_call = False
+            self._unrecorded, self._unrecorded_rows = 0.0, 0
+
+    def execute(self, sql, params=()):
+        if not LOG.enabled:
+            self._key = None
+            return super().execute(sql, params)
+        self._start(sql, params)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._account(time.perf_counter() - start, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_params):
+        if not LOG.enabled:
+            self._key = None
+            return super().executemany(sql, seq_of_params)
+        self._start(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            self._account(time.perf_counter() - start, max(self.rowcount, 0), done=True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._account(time.perf_counter() - start, row is not None, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(time.perf_counter() - start, len(rows), done=True)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._account(time.perf_counter() - start, len(rows), done=True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._account(time.perf_counter() - start, 0, done=True)
+            raise
+        self._account(time.perf_counter() - start, 1)
+        return row
+
+    def __del__(self):
+        if self._key is not None:
+            self._flush()
+
+
+class TracedConnection(sqlite3.Connection):
+    """A connection whose cursors, including those behind conn.execute(), are TracedCursors."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def set_threshold(ms):
+    """Change the slow-query threshold in milliseconds."""
+    LOG.threshold = ms / 1000
+
+
+def set_enabled(enabled):
+    """Turn statement timing on or off for every traced connection."""
+    LOG.enabled = enabled
+
+
+def stats():
+    """Return the per-fingerprint StatementStats, most total time first."""
+    return LOG.stats()
+
+
+def slow_queries():
+    """Return the recent SlowQuery entries."""
+    return LOG.slow_queries()
+
+
+def reset():
+    """Clear the collected statistics."""
+    LOG.reset()
+
+
+def dump(path):
+    """Write the statistics to a .json or .csv file; returns the number of fingerprints written."""
+    return LOG.dump(path)
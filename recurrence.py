@@ -0,0 +1,148 @@
+"""Recurring schedule rules and their expansion into concrete departures.
+
+A rule is one schedule_rules row: a bus, route and departure/arrival time,
+a weekday bitmask (bit 0 = Monday), a date range and a list of skipped
+dates. Rules can be expanded lazily for a query window without touching
+schedules, or materialized in bulk into schedules rows. Materializing
+checks the window against UNIQUE (bus_id, departure_date, departure_time)
+first, and each departure against the conflict index when one is given, and
+reports the departures it skipped instead of failing.
+"""
+import heapq
+from collections import namedtuple
+from datetime import date, timedelta
+
+from conflicts import interval
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+DAILY = 0b1111111
+NAMED_DAYS = {"daily": DAILY, "weekdays": 0b0011111, "weekends": 0b1100000}
+
+Rule = namedtuple("Rule", "rule_id bus_id route_id departure_time arrival_time weekdays start_date end_date exceptions")
+Departure = namedtuple("Departure", "departure_date departure_time arrival_time bus_id route_id rule_id")
+Conflict = namedtuple("Conflict", "bus_id departure_date departure_time")
+
+RULE_COLUMNS = "rule_id, bus_id, route_id, departure_time, arrival_time, weekdays, start_date, end_date, exceptions"
+
+
+def parse_weekdays(text):
+    """Turn "Mon,Wed,Fri", "daily", "weekdays" or "weekends" into a weekday bitmask."""
+    text = (text or "").strip().lower()
+    if text in NAMED_DAYS:
+        return NAMED_DAYS[text]
+    mask = 0
+    for name in filter(None, (part.strip()[:3].title() for part in text.replace(" ", ",").split(","))):
+        if name not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday {name!r}; use Mon..Sun, daily, weekdays or weekends")
+        mask |= 1 << WEEKDAYS.index(name)
+    if not mask:
+        raise ValueError("A rule needs at least one weekday")
+    return mask
+
+
+def format_weekdays(mask):
+    """Return a bitmask as "Mon,Wed,Fri" (or "daily")."""
+    if mask == DAILY:
+        return "daily"
+    return ",".join(name for i, name in enumerate(WEEKDAYS) if mask & (1 << i))
+
+
+def parse_exceptions(text):
+    """Turn comma-separated YYYY-MM-DD dates into a sorted, de-duplicated list."""
+    dates = {date.fromisoformat(part.strip()) for part in (text or "").split(",") if part.strip()}
+    return sorted(day.isoformat() for day in dates)
+
+
+def _rule(row):
+    rule = Rule(*row)
+    return rule._replace(exceptions=frozenset(filter(None, rule.exceptions.split(","))))
+
+
+def dates(rule, start=None, end=None):
+    """Lazily yield the YYYY-MM-DD dates a rule runs on, optionally clipped to [start, end]."""
+    first = date.fromisoformat(max(rule.start_date, start or rule.start_date))
+    last = date.fromisoformat(min(rule.end_date, end or rule.end_date))
+    day = first
+    while day <= last:
+        if rule.weekdays & (1 << day.weekday()):
+            text = day.isoformat()
+            if text not in rule.exceptions:
+                yield text
+        day += timedelta(days=1)
+
+
+def expand(rule, start=None, end=None):
+    """Lazily yield a rule's Departures within [start, end]."""
+    for day in dates(rule, start, end):
+        yield Departure(day, rule.departure_time, rule.arrival_time, rule.bus_id, rule.route_id, rule.rule_id)
+
+
+def load_rules(conn, bus_id=None, start=None, end=None):
+    """Return the rules (optionally for one bus) whose date range overlaps [start, end]."""
+    sql = f"SELECT {RULE_COLUMNS} FROM schedule_rules WHERE end_date >= ? AND start_date <= ?"
+    params = [start or "0000-00-00", end or "9999-99-99"]
+    if bus_id is not None:
+        sql += " AND bus_id = ?"
+        params.append(bus_id)
+    return [_rule(row) for row in conn.execute(sql, params)]
+
+
+def departures(conn, start, end, bus_id=None):
+    """Lazily yield every rule's departures in [start, end], in date and time order."""
+    rules = load_rules(conn, bus_id, start, end)
+    return heapq.merge(*(expand(rule, start, end) for rule in rules),
+                       key=lambda departure: (departure.departure_date, departure.departure_time))
+
+
+def conflicts(conn, rule, start=None, end=None):
+    """Return the Conflicts between a rule's departures and existing schedules for the same bus and time."""
+    start = max(rule.start_date, start or rule.start_date)
+    end = min(rule.end_date, end or rule.end_date)
+    taken = {row[0] for row in conn.execute("""
+        SELECT departure_date FROM schedules
+        WHERE bus_id = ? AND departure_date BETWEEN ? AND ? AND departure_time = ?
+    """, (rule.bus_id, start, end, rule.departure_time))}
+    return [Conflict(rule.bus_id, day, rule.departure_time) for day in dates(rule, start, end) if day in taken]
+
+
+def materialize(conn, rule, until=None, index=None):
+    """Insert a rule's departures up to until (default: its end date) into schedules.
+
+    Departures already in schedules are skipped and returned as Conflicts,
+    as are those that would double-book the bus or a driver according to
+    index (a conflicts.ConflictIndex, kept up to date with every departure
+    inserted). Returns (created, conflicts). The caller owns the
+    transaction; with an index it must be conflicts.write().
+    """
+    start = rule.start_date
+    row = conn.execute("SELECT materialized_until FROM schedule_rules WHERE rule_id = ?", (rule.rule_id,)).fetchone()
+    if row and row[0]:
+        start = max(start, (date.fromisoformat(row[0]) + timedelta(days=1)).isoformat())
+    end = min(rule.end_date, until or rule.end_date)
+    if start > end:
+        return 0, []
+
+    clashes = conflicts(conn, rule, start, end)
+    skip = {conflict.departure_date for conflict in clashes}
+    departures = [d for d in expand(rule, start, end) if d.departure_date not in skip]
+    insert = """
+        INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time, rule_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    def params(d):
+        return d.bus_id, d.route_id, d.departure_date, d.departure_time, d.arrival_time, d.rule_id
+
+    if index is None:
+        created = max(conn.executemany(insert, map(params, departures)).rowcount, 0)
+    else:
+        created = 0
+        for d in departures:
+            span = interval(d.departure_date, d.departure_time, d.arrival_time)
+            if index.check(d.bus_id, span):
+                clashes.append(Conflict(d.bus_id, d.departure_date, d.departure_time))
+                continue
+            cur = conn.execute(insert, params(d))
+            index.add(d.bus_id, span._replace(schedule_id=cur.lastrowid))
+            created += 1
+    conn.execute("UPDATE schedule_rules SET materialized_until = ? WHERE rule_id = ?", (end, rule.rule_id))
+    return created, clashes
@@ -0,0 +1,124 @@
+"""In-process read-through cache of reference data: routes, drivers and buses.
+
+These tables change rarely but are read again every time an admin window
+opens. Cached results are tagged with the tables they were read from. The
+service layer calls changed() after its own writes, which drops exactly the
+entries that read those tables. Writes from other processes (or other
+pooled connections) are caught with PRAGMA data_version: when it moves,
+the per-table counters kept by the table_versions triggers say which
+tables actually changed. Entries also expire after a TTL and the least
+recently used are evicted beyond MAX_ENTRIES.
+
+Callers share the cached lists and must not modify them.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 512
+TTL = 300.0  # Seconds before a cached result is read again even if nothing changed
+TABLES = ("routes", "drivers", "buses")
+
+
+class ReferenceCache:
+    """LRU/TTL cache of query results keyed by the caller, invalidated per table."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, tables, loaded_at)
+        self._versions = {}            # table -> table_versions.version last seen
+        self._local = threading.local()  # (connection, data_version) last seen by this thread
+        self._lock = threading.Lock()
+        self._writes = 0  # Bumped by every invalidation to detect races with a load
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.external_changes = 0
+
+    def get(self, conn, key, tables, load):
+        """Return the cached result for key, or load(conn) it and remember it as depending on tables."""
+        self.sync(conn)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            writes = self._writes
+        value = load(conn)
+        with self._lock:
+            if writes != self._writes:
+                return value  # Something changed while loading; don't cache a possibly stale result
+            self._entries[key] = (value, frozenset(tables), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def sync(self, conn):
+        """Drop entries for tables another connection changed since this thread last looked."""
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        seen = getattr(self._local, "seen", None)
+        if seen is not None and seen[0] is conn and seen[1] == data_version:
+            return
+        self._apply(conn, external=seen is not None)
+        self._local.seen = (conn, data_version)
+
+    def changed(self, conn, *tables):
+        """Drop entries for tables after a committed write through conn."""
+        with self._lock:
+            self._drop(tables)
+        self._apply(conn)
+
+    def invalidate(self, tables=None):
+        """Drop the entries that read any of tables, or everything when tables is None."""
+        with self._lock:
+            self._drop(TABLES if tables is None else tables)
+
+    def _apply(self, conn, external=False):
+        """Read table_versions through conn and drop entries for every table whose version moved."""
+        versions = dict(conn.execute("SELECT name, version FROM table_versions").fetchall())
+        with self._lock:
+            moved = [table for table in TABLES if versions.get(table, 0) != self._versions.get(table)]
+            if moved and self._versions and external:
+                self.external_changes += 1
+            self._drop(moved)
+            for table in TABLES:
+                self._versions[table] = versions.get(table, 0)
+
+    def _drop(self, tables):
+        if not tables:
+            return
+        self._writes += 1
+        stale = [key for key, (_, depends, _) in self._entries.items() if not depends.isdisjoint(tables)]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self):
+        """Return cache size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "external_changes": self.external_changes,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_name):
+    """Return the shared reference-data cache for a database file, creating it if needed."""
+    with _caches_lock:
+        cache = _caches.get(db_name)
+        if cache is None:
+            cache = _caches[db_name] = ReferenceCache()
+        return cache
@@ -0,0 +1,120 @@
+"""Analytics summaries: full recompute serially vs across a process pool, incremental refresh and report latency."""
+import argparse
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import bench_utils
+
+import analytics
+import booking
+import db_pool
+import migrations
+
+RAW_REPORT = """
+    SELECT schedules.route_id, COUNT(schedule_tickets.ticket_id), TOTAL(schedule_tickets.price)
+    FROM schedules JOIN schedule_tickets ON schedule_tickets.schedule_id = schedules.schedule_id
+    WHERE schedules.departure_date BETWEEN ? AND ?
+    GROUP BY schedules.route_id
+    ORDER BY TOTAL(schedule_tickets.price) DESC
+    LIMIT 10
+"""
+
+
+def seed(path, buses, days, fill):
+    """Create daily departures for every bus and sell about fill of their seats.
+
+    Every fourth bus also runs an afternoon departure on the next route, so
+    per-route totals must split that bus's day between two routes.
+    """
+    rng = random.Random(3)
+    first = date(2025, 1, 1)
+    routes = buses // 4 + 1
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, 'A, B')",
+                         [(r, f"Route {r}") for r in range(1, routes + 1)])
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 500, 40)",
+            [(b, f"Bus {b}", f"R-{b}", b // 4 + 1) for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, '08:00', '12:00')",
+            [(b, b // 4 + 1, (first + timedelta(days=d)).isoformat()) for b in range(1, buses + 1) for d in range(days)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, '14:00', '18:00')",
+            [(b, (b // 4 + 1) % routes + 1, (first + timedelta(days=d)).isoformat())
+             for b in range(4, buses + 1, 4) for d in range(days)],
+        )
+        departures = conn.execute("SELECT COUNT(*) FROM schedules").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO schedule_tickets (schedule_id, seat_number, user_id, price) VALUES (?, ?, 1, ?)",
+            ((schedule_id, seat, rng.choice((500.0, 750.0)))
+             for schedule_id in range(1, departures + 1) for seat in range(1, 41) if rng.random() < fill),
+        )
+        conn.execute("""
+            UPDATE seat_inventory SET sold = NULL,
+                sold_count = (SELECT COUNT(*) FROM schedule_tickets WHERE schedule_id = seat_inventory.schedule_id)
+        """)
+        conn.executemany(
+            "INSERT INTO transactions (user_id, bus_id, total_amount, transaction_date) VALUES (1, ?, ?, ?)",
+            [(rng.randint(1, buses), 100.0, f"{(first + timedelta(days=rng.randrange(days))).isoformat()} 10:00:00")
+             for _ in range(buses * 10)],
+        )
+    return first, first + timedelta(days=days - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--fill", type=float, default=0.6, help="fraction of seats sold")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--bookings", type=int, default=200, help="bookings before the incremental refresh")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    first, last = seed(path, args.buses, args.days, args.fill)
+    conn = db_pool.get_connection(path)
+    tickets = conn.execute("SELECT COUNT(*) FROM schedule_tickets").fetchone()[0]
+    departures = conn.execute("SELECT COUNT(*) FROM schedules").fetchone()[0]
+    print(f"{departures} departures, {tickets} tickets sold")
+
+    result, serial = bench_utils.timed(analytics.refresh, path, conn, 1, True)
+    print(f"full refresh, 1 process:   {serial:.2f}s ({result.days} days, {result.rows} bus-day rows)")
+    result, parallel = bench_utils.timed(analytics.refresh, path, conn, args.workers, True)
+    print(f"full refresh, {result.batches} processes: {parallel:.2f}s (x{serial / parallel:.1f})")
+
+    rng = random.Random(5)
+    for _ in range(args.bookings):
+        schedule_id = rng.randint(1, departures)
+        booking.book_seats(conn, schedule_id, [rng.randint(1, 40)], 2, allow_partial=True)
+    pending = conn.execute("SELECT COUNT(*) FROM analytics_dirty_days").fetchone()[0]
+    result, elapsed = bench_utils.timed(analytics.refresh, path, conn, args.workers)
+    print(f"incremental refresh of {pending} dirty days: {elapsed:.2f}s in {result.batches} batch(es)")
+
+    start, end = first.isoformat(), last.isoformat()
+    _, raw = bench_utils.timed(lambda: conn.execute(RAW_REPORT, (start, end)).fetchall())
+    routes, summary = bench_utils.timed(analytics.route_totals, conn, start, end, 10)
+    print(f"top routes over {args.days} days: raw tickets {raw * 1000:.1f}ms, summaries {summary * 1000:.1f}ms")
+
+    sold, revenue = conn.execute("SELECT COUNT(*), TOTAL(price) FROM schedule_tickets").fetchone()
+    payments = conn.execute("SELECT TOTAL(total_amount) FROM transactions").fetchone()[0]
+    summed = conn.execute("SELECT SUM(seats_sold), TOTAL(ticket_revenue), TOTAL(payments) FROM daily_bus_stats").fetchone()
+    if summed[0] != sold or abs(summed[1] - revenue) > 0.01 or abs(summed[2] - payments) > 0.01:
+        raise SystemExit(f"FAIL: summaries {summed} disagree with raw tables ({sold}, {revenue}, {payments})")
+    raw_routes = {route_id: (count, total) for route_id, count, total in
+                  conn.execute(RAW_REPORT.replace("LIMIT 10", ""), (start, end))}
+    summary_routes = {route.route_id: (route.seats_sold, route.ticket_revenue)
+                      for route in analytics.route_totals(conn, start, end) if route.seats_sold}
+    if raw_routes.keys() != summary_routes.keys() or any(
+            raw_routes[r][0] != summary_routes[r][0] or abs(raw_routes[r][1] - summary_routes[r][1]) > 0.01 for r in raw_routes):
+        raise SystemExit("FAIL: per-route seats or revenue differ between the summaries and schedule_tickets")
+    print(f"OK: summaries match raw totals; best route {routes[0].route_name} at {routes[0].load_factor:.0%} load")
+
+
+if __name__ == "__main__":
+    main()
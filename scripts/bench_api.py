@@ -0,0 +1,159 @@
+"""Load generator for the HTTP booking API: requests/sec and tail latency under a search/seat/booking mix.
+
+Starts api.py in a child process on a seeded database, then drives it from
+keep-alive asyncio clients. Every client logs in once, then loops over
+weighted requests until the duration is up.
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import bench_utils
+
+import credentials
+import migrations
+
+# (name, weight) of each request in the mix
+MIX = (("search", 50), ("seats", 30), ("book", 12), ("schedules", 5), ("tickets", 3))
+
+
+def seed(path, buses, seats, users):
+    """Create buses with one departure each and users who all share one password."""
+    password = credentials.hash_password("bench")
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany(
+            "INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', ?)",
+            [(u, f"user{u}", f"user{u}@bench", password) for u in range(1, users + 1)],
+        )
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, ?)",
+                         [(r, f"City{r} to Town{r}", f"City{r}, Town{r}") for r in range(1, buses // 10 + 2)])
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 10, ?)",
+            [(b, f"Express {b}", f"EX-{b}", b // 10 + 1, seats) for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (schedule_id, bus_id, route_id, departure_date, departure_time, arrival_time) "
+            "VALUES (?, ?, ?, '2025-01-01', '08:00', '12:00')",
+            [(b, b, b // 10 + 1) for b in range(1, buses + 1)],
+        )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def request(reader, writer, method, path, payload=None, token=None):
+    """Send one keep-alive request and return (status, decoded JSON)."""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    headers = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n"
+    if token:
+        headers += f"Authorization: Bearer {token}\r\n"
+    writer.write(headers.encode() + b"\r\n" + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def connect(port, client_id, args):
+    """Open a keep-alive connection and log in; returns (reader, writer, token)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    user = client_id % args.users + 1
+    _, session = await request(reader, writer, "POST", "/login", {"email": f"user{user}@bench", "password": "bench"})
+    return reader, writer, session["token"]
+
+
+async def client(connection, client_id, args, deadline, latencies, statuses, booked):
+    rng = random.Random(client_id)
+    names, weights = zip(*MIX)
+    reader, writer, token = connection
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        bus = rng.randint(1, args.buses)
+        start = time.perf_counter()
+        if name == "search":
+            status, _ = await request(reader, writer, "GET", f"/buses?q=express+{bus}")
+        elif name == "seats":
+            status, _ = await request(reader, writer, "GET", f"/schedules/{bus}/seats")
+        elif name == "schedules":
+            status, _ = await request(reader, writer, "GET", f"/buses/{bus}/schedules")
+        elif name == "tickets":
+            status, _ = await request(reader, writer, "GET", "/me/tickets", token=token)
+        else:
+            seat = rng.randint(1, args.seats - 1)
+            status, result = await request(reader, writer, "POST", "/bookings",
+                                           {"schedule_id": bus, "seats": [seat, seat + 1]}, token=token)
+            booked.extend((bus, seat) for seat in result.get("booked", ()))
+        latencies[name].append(time.perf_counter() - start)
+        statuses[status] += 1
+    writer.close()
+
+
+async def drive(port, args):
+    latencies, statuses, booked = defaultdict(list), defaultdict(int), []
+    # Log everyone in first so the deliberately slow password checks stay out of the timings
+    connections = await asyncio.gather(*(connect(port, c, args) for c in range(args.clients)))
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(connection, c, args, deadline, latencies, statuses, booked)
+                           for c, connection in enumerate(connections)))
+    return time.perf_counter() - start, latencies, statuses, booked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--workers", type=int, default=4, help="API database worker threads")
+    parser.add_argument("--buses", type=int, default=500)
+    parser.add_argument("--seats", type=int, default=40)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.buses, args.seats, args.users)
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "api.py", "--db", path, "--port", str(port), "--workers", str(args.workers)],
+                              cwd=bench_utils.ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        for line in server.stdout:
+            if line.startswith("Serving on"):
+                break
+        elapsed, latencies, statuses, booked = asyncio.run(drive(port, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    everything = [latency for samples in latencies.values() for latency in samples]
+    print(f"{args.clients} clients, {args.workers} DB workers, {elapsed:.1f}s")
+    for name, _ in MIX:
+        bench_utils.report(name, latencies[name], elapsed)
+    bench_utils.report("all requests", everything, elapsed)
+    print(f"    statuses: {dict(sorted(statuses.items()))}")
+
+    with sqlite3.connect(path) as conn:
+        sold = conn.execute("SELECT COUNT(*) FROM schedule_tickets").fetchone()[0]
+    if sold != len(booked) or len(set(booked)) != len(booked) or statuses.get(500):
+        raise SystemExit(f"FAIL: {len(booked)} seats reported booked, {sold} sold, {statuses.get(500, 0)} errors")
+    print(f"OK: {sold} seats sold, no double-sells")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Login throughput under concurrent load: legacy SHA-256 upgrade, KDF verification and the session cache."""
+import argparse
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+
+import bench_utils
+
+import credentials
+import db_pool
+import migrations
+
+
+def seed(path, users):
+    """Create users whose passwords are stored as legacy unsalted SHA-256 hashes."""
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany(
+            "INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', ?)",
+            [(u, f"User {u}", f"user{u}@example.com", hashlib.sha256(f"pw{u}".encode()).hexdigest())
+             for u in range(1, users + 1)],
+        )
+
+
+def run(path, users, threads, logins, cache, wrong=0.0):
+    """Log in threads * logins times with random users; return (elapsed, latencies, failures)."""
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        conn = db_pool.get_connection(path)
+        mine, failed = [], 0
+        for _ in range(logins):
+            user_id = rng.randint(1, users)
+            bad = rng.random() < wrong
+            password = "nope" if bad else f"pw{user_id}"
+            start = time.perf_counter()
+            user, _ = credentials.authenticate(conn, f"user{user_id}@example.com", password, cache)
+            mine.append(time.perf_counter() - start)
+            failed += (user is None) != bad
+        with lock:
+            latencies.extend(mine)
+            failures.append(failed)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, latencies, sum(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=25, help="logins per thread")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.users)
+    total = args.threads * args.logins
+    print(f"{args.users} users, {args.threads} threads x {args.logins} logins, hasher {credentials.DEFAULT_HASHER.scheme}")
+
+    # Every user logs in once: verify the SHA-256 hash, then store a salted one
+    conn = db_pool.get_connection(path)
+    latencies = []
+    for u in range(1, args.users + 1):
+        _, elapsed = bench_utils.timed(credentials.authenticate, conn, f"user{u}@example.com", f"pw{u}")
+        latencies.append(elapsed)
+    bench_utils.report("first login (legacy rehash)", latencies)
+    legacy = sum(credentials.is_legacy(row[0]) for row in conn.execute("SELECT password FROM users"))
+    if legacy:
+        raise SystemExit(f"FAIL: {legacy} users still have legacy hashes after logging in")
+
+    elapsed, latencies, failures = run(path, args.users, args.threads, args.logins, None, wrong=0.1)
+    bench_utils.report("KDF verify, no cache", latencies, elapsed)
+    uncached = total / elapsed
+
+    cache = credentials.SessionCache()
+    for u in range(1, args.users + 1):  # Warm: everyone has logged in once this session
+        credentials.authenticate(conn, f"user{u}@example.com", f"pw{u}", cache)
+    elapsed, latencies, cached_failures = run(path, args.users, args.threads, args.logins, cache, wrong=0.1)
+    bench_utils.report("with session cache", latencies, elapsed)
+    stats = cache.stats()
+    print(f"    {uncached:.1f} -> {total / elapsed:.1f} logins/sec (x{total / elapsed / uncached:.1f}), "
+          f"cache hit rate {stats['hit_rate']:.0%} "
+          f"(failed logins are never cached and always pay for the KDF)")
+    if failures or cached_failures:
+        raise SystemExit(f"FAIL: {failures + cached_failures} logins had the wrong outcome")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
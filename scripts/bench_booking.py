@@ -0,0 +1,94 @@
+"""Multi-process booking stress test: measures bookings/sec and checks for double-sells."""
+import argparse
+import multiprocessing
+import random
+import sqlite3
+import time
+
+import bench_utils
+
+import booking
+import db_pool
+import migrations
+
+
+def seed(path, buses, seats, users):
+    """Create buses with one departure each whose seats are fought over."""
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany(
+            "INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', '')",
+            [(user_id, f"user{user_id}", f"user{user_id}@bench") for user_id in range(1, users + 1)],
+        )
+        conn.execute("INSERT INTO routes (route_name, stops) VALUES ('Bench', 'A, B')")
+        for bus_id in range(1, buses + 1):
+            conn.execute(
+                "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, 1, 10, ?)",
+                (bus_id, f"Bus {bus_id}", f"B-{bus_id}", seats),
+            )
+            conn.execute(
+                "INSERT INTO schedules (schedule_id, bus_id, route_id, departure_date, departure_time, arrival_time) "
+                "VALUES (?, ?, 1, '2025-01-01', '08:00', '12:00')",
+                (bus_id, bus_id),
+            )
+
+
+def worker(path, worker_id, attempts, buses, seats, batch, queue):
+    """Repeatedly try to book random seat batches and report what was won."""
+    conn = db_pool.get_connection(path)
+    rng = random.Random(worker_id)
+    retry = booking.RetryPolicy(attempts=20)
+    won = []
+    try:
+        for _ in range(attempts):
+            schedule_id = rng.randint(1, buses)
+            start = rng.randint(1, max(1, seats - batch + 1))
+            results, _ = booking.book_seats(conn, schedule_id, range(start, start + batch), worker_id, retry=retry)
+            won.extend((schedule_id, seat) for seat in booking.booked_seats(results))
+    finally:
+        # Always report back so the parent never blocks on a crashed worker
+        queue.put(won)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--buses", type=int, default=20)
+    parser.add_argument("--seats", type=int, default=40)
+    parser.add_argument("--batch", type=int, default=3)
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.buses, args.seats, args.processes)
+
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=worker, args=(path, i + 1, args.attempts, args.buses, args.seats, args.batch, queue))
+        for i in range(args.processes)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    won = [seat for _ in procs for seat in queue.get()]
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    with sqlite3.connect(path) as conn:
+        sold = conn.execute("SELECT COUNT(*) FROM schedule_tickets").fetchone()[0]
+        counted = conn.execute("SELECT SUM(sold_count) FROM seat_inventory").fetchone()[0]
+        bits = sum(bin(int.from_bytes(bitmap, "little")).count("1")
+                   for (bitmap,) in conn.execute("SELECT sold FROM seat_inventory"))
+
+    duplicates = len(won) - len(set(won))
+    print(f"booking attempts: {args.processes * args.attempts} in {elapsed:.2f}s "
+          f"({args.processes * args.attempts / elapsed:.1f} bookings/sec)")
+    print(f"seats won by workers: {len(won)}, seats sold in DB: {sold}, double-sells: {duplicates}")
+    if duplicates or not sold == counted == bits == len(won):
+        raise SystemExit("FAIL: seat inventory is inconsistent")
+    print("OK: no double-sells")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Bulk import/export throughput, rejected-row reporting and exporter memory use."""
+import argparse
+import csv
+import json
+import os
+import tracemalloc
+
+import bench_utils
+
+import bulk_io
+import db_pool
+import migrations
+
+
+def write_files(directory, routes, drivers, buses, days):
+    """Write routes/drivers CSV, buses JSON Lines and schedules CSV, each with a few bad rows.
+
+    The schedules never double-book a bus or driver, apart from one planted row.
+    """
+    paths = {table: os.path.join(directory, name) for table, name in (
+        ("routes", "routes.csv"), ("drivers", "drivers.csv"), ("buses", "buses.jsonl"), ("schedules", "schedules.csv"))}
+    bad = {}
+    with open(paths["routes"], "w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(("route_name", "stops"))
+        writer.writerows((f"City{r % 97} to City{r % 89}", f"City{r % 97}, Town{r}, City{r % 89}") for r in range(1, routes + 1))
+        writer.writerow(("No stops", ""))
+    bad["routes"] = 1
+    with open(paths["drivers"], "w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(("name", "license_number", "phone", "address"))
+        writer.writerows((f"Driver {d}", f"L-{d}", "0100", "") for d in range(1, drivers + 1))
+        writer.writerow(("Duplicate", "L-1", "0100", ""))
+    bad["drivers"] = 1
+    with open(paths["buses"], "w") as target:
+        for b in range(1, buses + 1):
+            target.write(json.dumps({"name": f"Express {b}", "number": f"EX-{b}", "route_id": b % routes + 1,
+                                     "ticket_price": 900, "capacity": 40, "driver_id1": b % drivers + 1}) + "\n")
+        target.write(json.dumps({"name": "Dup", "number": "EX-1", "route_id": 1, "ticket_price": 1, "capacity": 1}) + "\n")
+        target.write(json.dumps({"name": "Ghost", "number": "G-1", "route_id": routes + 10, "ticket_price": 1, "capacity": 1}) + "\n")
+        target.write("{not json\n")
+    bad["buses"] = 3
+    with open(paths["schedules"], "w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(("bus_id", "departure_date", "departure_time", "arrival_time"))
+        # Buses sharing a driver (same bus_id modulo drivers) get different two-hour slots
+        slots = ((f"{2 * (b // drivers % 12):02d}:00", f"{2 * (b // drivers % 12) + 1:02d}:30") for b in range(1, buses + 1))
+        writer.writerows((b, f"2025-02-{d:02d}", *slot) for b, slot in enumerate(slots, 1) for d in range(1, days + 1))
+        writer.writerow((1, "2025-02-01", "00:00", "01:30"))
+        writer.writerow((1, "01/02/2025", "08:00", "12:00"))
+        writer.writerow((1, "2025-02-01", "25:00", "12:00"))
+        # Driven by bus 1's driver while bus 1 is still on the road
+        writer.writerow((drivers + 1, "2025-02-01", "00:30", "01:00"))
+    bad["schedules"] = 4
+    return paths, bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--routes", type=int, default=5_000)
+    parser.add_argument("--drivers", type=int, default=2_000)
+    parser.add_argument("--buses", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=10, help="departures per bus")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    conn = db_pool.get_connection(path)
+    migrations.migrate(conn)
+    paths, bad = write_files(os.path.dirname(path), args.routes, args.drivers, args.buses, args.days)
+
+    expected = {"routes": args.routes, "drivers": args.drivers, "buses": args.buses, "schedules": args.buses * args.days}
+    failures = []
+    for table in ("routes", "drivers", "buses", "schedules"):
+        result, elapsed = bench_utils.timed(bulk_io.import_file, conn, table, paths[table])
+        print(f"import {table:<10} {result.imported:>9} rows in {elapsed:6.2f}s "
+              f"({result.imported / elapsed:10.0f} rows/s), {len(result.rejected)} rejected")
+        for line, reason in result.rejected:
+            print(f"    line {line}: {reason}")
+        if result.imported != expected[table] or len(result.rejected) != bad[table]:
+            failures.append(table)
+
+    for table in ("schedules", "buses"):
+        for extension in ("csv", "jsonl"):
+            target = os.path.join(os.path.dirname(path), f"export_{table}.{extension}")
+            count, elapsed = bench_utils.timed(bulk_io.export_table, conn, table, target)
+            # Measure memory on a second run; tracing slows the exporter down too much to time it
+            tracemalloc.start()
+            bulk_io.export_table(conn, table, target)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"export {table:<10} {count:>9} rows in {elapsed:6.2f}s to {extension:<5} "
+                  f"({os.path.getsize(target) / 1e6:6.1f} MB file, peak {peak / 1e6:5.1f} MB traced)")
+
+    if failures:
+        raise SystemExit(f"FAIL: unexpected import counts for {', '.join(failures)}")
+    print("OK: valid rows imported and every bad row rejected")
+
+
+if __name__ == "__main__":
+    main()
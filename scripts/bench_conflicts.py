@@ -0,0 +1,110 @@
+"""Double-booking detection: per-check latency of the interval index and a full timetable audit."""
+import argparse
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import bench_utils
+
+import conflicts
+import db_pool
+import migrations
+import services
+
+
+def seed(path, buses, days, overlaps):
+    """Create buses sharing drivers pairwise and two trips a day each; overlaps pairs clash."""
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO drivers (driver_id, name, license_number, phone) VALUES (?, ?, ?, '555')",
+                         [(d, f"Driver {d}", f"L-{d}") for d in range(1, buses + 1)])
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, 'A, B')",
+                         [(b, f"Route {b}") for b in range(1, buses + 1)])
+        # Bus b is driven by drivers b and b+1, so neighbouring buses share a driver
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity, driver_id1, driver_id2) "
+            "VALUES (?, ?, ?, ?, 900, 40, ?, ?)",
+            [(b, f"Bus {b}", f"R-{b}", b, b, b % buses + 1) for b in range(1, buses + 1)],
+        )
+        first = date(2025, 1, 1)
+        rows = []
+        for b in range(1, buses + 1):
+            # Odd buses run mornings and evenings, even buses midday, so shared drivers never clash
+            times = (("06:00", "09:00"), ("18:00", "21:00")) if b % 2 else (("10:00", "13:00"), ("14:00", "17:00"))
+            for d in range(days):
+                day = (first + timedelta(days=d)).isoformat()
+                rows.extend((b, b, day, departure, arrival) for departure, arrival in times)
+        conn.executemany("INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+        # Planted clashes: an even bus takes an extra morning trip that overlaps its shared driver's
+        clashes = [(b, b, (first + timedelta(days=d)).isoformat(), "07:00", "08:00")
+                   for b, d in zip(range(2, buses + 1, 2), range(overlaps))]
+        conn.executemany("INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) "
+                         "VALUES (?, ?, ?, ?, ?)", clashes)
+    return len(rows) + len(clashes), len(clashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=500)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--overlaps", type=int, default=100, help="clashing departures planted in the timetable")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    total, planted = seed(path, args.buses, args.days, args.overlaps)
+    conn = db_pool.get_connection(path)
+    print(f"{total} departures, {args.buses} buses, {args.buses} drivers")
+
+    index, elapsed = bench_utils.timed(conflicts.ConflictIndex.load, conn)
+    print(f"index load: {elapsed:.2f}s")
+
+    rng = random.Random(7)
+    latencies = []
+    hits = 0
+    for _ in range(args.checks):
+        bus_id = rng.randint(1, args.buses)
+        day = (date(2025, 1, 1) + timedelta(days=rng.randrange(args.days))).isoformat()
+        span = conflicts.interval(day, f"{rng.randint(0, 23):02d}:{rng.choice(('00', '30'))}", "23:59")
+        found, elapsed = bench_utils.timed(index.check, bus_id, span)
+        hits += bool(found)
+        latencies.append(elapsed)
+    bench_utils.report("ConflictIndex.check", latencies)
+    print(f"{hits}/{args.checks} random candidates rejected")
+
+    schedule = services.ScheduleService(path)
+    latencies = []
+    for bus_id in range(1, min(args.buses, 500) + 1):
+        # Buses sharing a driver alternate between two night slots
+        departure, arrival = ("00:30", "01:30") if bus_id % 2 else ("02:00", "03:00")
+        _, elapsed = bench_utils.timed(schedule.add_schedule, bus_id, bus_id, "2026-01-01", departure, arrival)
+        latencies.append(elapsed)
+    bench_utils.report("ScheduleService.add_schedule", latencies)
+
+    found, elapsed = bench_utils.timed(schedule.audit_conflicts)
+    print(f"audit: {len(found)} conflicts over {total + len(latencies)} departures in {elapsed:.2f}s")
+    # Each planted trip clashes with its own bus's driver and with the neighbouring bus's driver
+    if len(found) != planted * 2:
+        raise SystemExit(f"FAIL: expected {planted * 2} conflicts, found {len(found)}")
+    try:
+        schedule.add_schedule(1, 1, "2025-01-01", "08:00", "08:30")
+    except conflicts.ScheduleConflict as e:
+        print(f"rejected as expected: {e}")
+    else:
+        raise SystemExit("FAIL: a double-booked departure was accepted")
+    # Another connection (as another terminal would) writes a long run and a short one inside it
+    with sqlite3.connect(path) as other:
+        other.executemany("INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) "
+                          "VALUES (1, 1, '2026-02-01', ?, ?)", [("06:00", "20:00"), ("07:00", "08:00")])
+    try:
+        schedule.add_schedule(1, 1, "2026-02-01", "12:00", "13:00")
+    except conflicts.ScheduleConflict as e:
+        print(f"rejected as expected after an outside write: {e}")
+    else:
+        raise SystemExit("FAIL: a departure inside an overlapping run written elsewhere was accepted")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
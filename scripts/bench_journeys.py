@@ -0,0 +1,77 @@
+"""Journey planner benchmark on a synthetic national network (50k stops by default)."""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import bench_utils
+
+import journeys
+import migrations
+
+
+def seed(path, stops, routes, trips_per_route):
+    """Create routes over a stop dictionary plus daily timetabled trips."""
+    rng = random.Random(3)
+    names = [f"Stop {n}" for n in range(1, stops + 1)]
+    # Hubs make one-transfer journeys likely, as on a real network
+    hubs = names[:max(1, stops // 500)]
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        migrations.migrate(conn)
+        route_rows = []
+        for route_id in range(1, routes + 1):
+            itinerary = rng.sample(names, rng.randint(8, 25))
+            itinerary.insert(rng.randint(1, len(itinerary) - 1), rng.choice(hubs))
+            route_rows.append((route_id, f"{itinerary[0]} to {itinerary[-1]}", ", ".join(dict.fromkeys(itinerary))))
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, ?)", route_rows)
+        for route_id, _, stop_text in route_rows:
+            journeys.sync_route_stops(conn, route_id, stop_text)
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 100, 40)",
+            [(r, f"Bus {r}", f"N-{r}", r) for r in range(1, routes + 1)],
+        )
+        schedule_rows = []
+        for r in range(1, routes + 1):
+            for t in range(trips_per_route):
+                day = str(date(2025, 1, 1) + timedelta(days=t % 7))
+                hour = rng.randint(5, 20)
+                schedule_rows.append((r, r, day, f"{hour:02d}:00", f"{min(hour + rng.randint(2, 6), 23):02d}:30"))
+        conn.executemany(
+            "INSERT OR IGNORE INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, ?, ?)",
+            schedule_rows,
+        )
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stops", type=int, default=50_000)
+    parser.add_argument("--routes", type=int, default=20_000)
+    parser.add_argument("--trips", type=int, default=7, help="timetabled trips per route")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    names, elapsed = bench_utils.timed(seed, path, args.stops, args.routes, args.trips)
+    print(f"seeded {args.stops} stops / {args.routes} routes in {elapsed:.1f}s")
+
+    index, elapsed = bench_utils.timed(journeys.StopIndex.load, sqlite3.connect(path))
+    print(f"built stop index in {elapsed * 1000:.0f}ms")
+    planner = journeys.JourneyPlanner(index)
+
+    rng = random.Random(5)
+    latencies, found = [], 0
+    start = time.perf_counter()
+    for _ in range(args.queries):
+        origin, destination = rng.sample(names, 2)
+        result, elapsed = bench_utils.timed(planner.plan, origin, destination, "2025-01-01")
+        latencies.append(elapsed)
+        found += bool(result)
+    bench_utils.report("JourneyPlanner.plan", latencies, time.perf_counter() - start)
+    print(f"queries with at least one journey: {found}/{args.queries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Cost of statement tracing: the same service calls with querylog on and off.
+
+Seeds a database with bench_services.seed, runs each operation with tracing
+disabled and then enabled, and prints the per-call overhead. Ends with the
+slowest fingerprints the log collected, as the Performance panel shows them.
+"""
+import argparse
+import random
+import time
+
+import bench_utils
+from bench_services import seed
+
+import querylog
+import services
+
+
+def measure(func, iterations, seed_value):
+    """Return per-call latencies of func(rng) over iterations calls."""
+    rng = random.Random(seed_value)
+    latencies = []
+    for _ in range(iterations):
+        _, elapsed = bench_utils.timed(func, rng)
+        latencies.append(elapsed)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=2_000)
+    parser.add_argument("--tickets", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=2_000)
+    parser.add_argument("--top", type=int, default=5, help="fingerprints to list at the end")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    print(f"seeding {args.buses} buses / {args.tickets} tickets into {path} ...")
+    seed(path, args.buses, args.tickets, args.users)
+
+    bookings = services.BookingService(path)
+    fleet = services.FleetService(path)
+    schedules = services.ScheduleService(path)
+    operations = (
+        ("FleetService.get_bus", lambda rng: fleet.get_bus(rng.randint(1, args.buses))),
+        ("BookingService.available_seats", lambda rng: bookings.available_seats(rng.randint(1, args.buses))),
+        ("BookingService.bus_schedules", lambda rng: bookings.bus_schedules(rng.randint(1, args.buses))),
+        ("BookingService.user_tickets", lambda rng: bookings.user_tickets(rng.randint(1, args.users))),
+        ("FleetService.tickets_page", lambda rng: fleet.tickets_page(after=(rng.randint(1, args.tickets),))),
+        ("ScheduleService.buses_page", lambda rng: schedules.buses_page(after=(rng.randint(1, args.buses),))),
+    )
+
+    for name, func in operations:
+        measure(func, args.iterations, 1)  # Warm the page, statement and seat caches for both passes
+        results = {}
+        for enabled in (False, True):
+            querylog.set_enabled(enabled)
+            start = time.perf_counter()
+            latencies = measure(func, args.iterations, 1)
+            results[enabled] = latencies
+            bench_utils.report(f"{name} ({'traced' if enabled else 'untraced'})", latencies,
+                               time.perf_counter() - start)
+        untraced, traced = (bench_utils.percentile(results[enabled], 50) for enabled in (False, True))
+        print(f"    overhead: {(traced - untraced) * 1e6:+.1f}us per call ({traced / untraced - 1:+.1%} at p50)")
+
+    print(f"top {args.top} statements by total time:")
+    for row in querylog.stats()[:args.top]:
+        print(f"    {row.total_ms:9.1f}ms  n={row.calls:<6} max={row.max_ms:7.2f}ms  {row.call_sites[0]}  {row.fingerprint[:70]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Recurring schedules: lazy expansion rate and bulk materialization into schedules."""
+import argparse
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import bench_utils
+
+import db_pool
+import migrations
+import recurrence
+import services
+
+
+def seed(path, buses):
+    """Create buses and routes without any schedules."""
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, 'A, B')",
+                         [(b, f"Route {b}") for b in range(1, buses + 1)])
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 900, 40)",
+            [(b, f"Bus {b}", f"R-{b}", b) for b in range(1, buses + 1)],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365, help="length of each rule's date range")
+    parser.add_argument("--window", type=int, default=7, help="days in the lazy expansion query window")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.buses)
+    schedule = services.ScheduleService(path)
+    start = date(2025, 1, 1)
+    end = start + timedelta(days=args.days - 1)
+
+    # A one-off departure on day 3 of every bus collides with its rule
+    with db_pool.get_connection(path) as conn:
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, '08:00', '12:00')",
+            [(b, b, (start + timedelta(days=2)).isoformat()) for b in range(1, args.buses + 1)],
+        )
+
+    latencies = []
+    for bus_id in range(1, args.buses + 1):
+        _, elapsed = bench_utils.timed(schedule.add_rule, bus_id, bus_id, "08:00", "12:00", recurrence.DAILY,
+                                       start.isoformat(), end.isoformat(), materialize=False)
+        latencies.append(elapsed)
+    bench_utils.report("add_rule (stored only)", latencies)
+
+    window_end = (start + timedelta(days=args.window - 1)).isoformat()
+    lazy, elapsed = bench_utils.timed(lambda: sum(1 for _ in schedule.upcoming_departures(start.isoformat(), window_end)))
+    print(f"lazy expansion of {args.window} days: {lazy} departures in {elapsed * 1000:.1f}ms, 0 rows written")
+
+    t0 = time.perf_counter()
+    created, clashes = schedule.materialize_rules(end.isoformat())
+    elapsed = time.perf_counter() - t0
+    print(f"materialized {created} departures in {elapsed:.2f}s ({created / elapsed:,.0f}/s), "
+          f"{len(clashes)} conflicts skipped")
+
+    conn = db_pool.get_connection(path)
+    rows = conn.execute("SELECT COUNT(*) FROM schedules WHERE rule_id IS NOT NULL").fetchone()[0]
+    inventory_rows = conn.execute("SELECT COUNT(*) FROM seat_inventory").fetchone()[0]
+    expected = args.buses * (args.days - 1)
+    if created != expected or rows != expected or len(clashes) != args.buses or inventory_rows != expected + args.buses:
+        raise SystemExit(f"FAIL: {created} created, {rows} rule rows, {len(clashes)} conflicts, "
+                         f"{inventory_rows} inventory rows (expected {expected}, {args.buses} conflicts)")
+    again, _ = schedule.materialize_rules(end.isoformat())
+    if again:
+        raise SystemExit(f"FAIL: re-materializing created {again} duplicate departures")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
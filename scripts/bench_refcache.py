@@ -0,0 +1,97 @@
+"""Queries and latency per admin window open, with and without the reference-data cache.
+
+Replays the reads the admin screens make when they open (update/delete bus,
+manage schedule, view all buses, manage routes and drivers) against a seeded
+database, with an admin write every --write-every interactions. Statements
+are counted with querylog. The uncached run sets the cache TTL to zero, so
+every lookup goes to the database; its cache checks are left out of the count.
+"""
+import argparse
+import random
+import time
+
+import bench_utils
+from bench_services import seed
+
+import querylog
+import refcache
+import services
+
+# Statements the cache itself runs to notice writes from other connections
+CACHE_CHECKS = ("PRAGMA data_version", "SELECT name, version FROM table_versions")
+
+
+def interactions(fleet, schedules):
+    """Return (name, func(rng)) for the reads each admin window makes when it opens."""
+    def update_bus(rng):
+        buses = fleet.list_buses()
+        fleet.get_bus(buses[rng.randrange(len(buses))][0])
+
+    return (
+        ("update bus", update_bus),
+        ("delete bus", lambda rng: fleet.list_buses()),
+        ("manage schedule", lambda rng: (schedules.buses_page(), schedules.routes_page())),
+        ("view all buses", lambda rng: fleet.bus_details()),
+        ("manage routes", lambda rng: fleet.routes_page()),
+        ("manage drivers", lambda rng: fleet.drivers_page()),
+    )
+
+
+def run(fleet, schedules, args, label, ttl):
+    """Replay the interaction mix; returns (latencies, statements, cache checks, cache counter deltas)."""
+    cache = fleet.reference_cache()
+    cache.ttl = ttl
+    cache.invalidate()
+    querylog.reset()
+    before = cache.stats()
+    rng = random.Random(7)
+    mix = interactions(fleet, schedules)
+    latencies = []
+    for i in range(args.interactions):
+        if args.write_every and i % args.write_every == args.write_every - 1:
+            driver_id = fleet.add_driver(f"Bench {i}", f"{label}-{i}", "0", "Depot")
+            fleet.update_driver(driver_id, f"Bench {i}", f"{label}-{i}", "1", "Depot")
+        _, func = mix[rng.randrange(len(mix))]
+        _, elapsed = bench_utils.timed(func, rng)
+        latencies.append(elapsed)
+    statements = checks = 0
+    for row in querylog.stats():
+        if row.fingerprint.startswith(CACHE_CHECKS):
+            checks += row.calls
+        elif row.fingerprint.startswith("SELECT"):
+            statements += row.calls
+    after = cache.stats()
+    return latencies, statements, checks, {name: after[name] - before[name] for name in ("hits", "misses", "invalidations")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=2_000)
+    parser.add_argument("--tickets", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--interactions", type=int, default=2_000)
+    parser.add_argument("--write-every", type=int, default=50, help="admin driver edit every N interactions (0: never)")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    print(f"seeding {args.buses} buses / {args.tickets} tickets into {path} ...")
+    seed(path, args.buses, args.tickets, args.users)
+    fleet = services.FleetService(path)
+    schedules = services.ScheduleService(path)
+
+    results = {}
+    for label, ttl in (("uncached", 0.0), ("cached", refcache.TTL)):
+        start = time.perf_counter()
+        latencies, statements, checks, counters = run(fleet, schedules, args, label, ttl)
+        results[label] = statements
+        bench_utils.report(f"window open ({label})", latencies, time.perf_counter() - start)
+        print(f"    {statements / args.interactions:.2f} SELECTs per interaction"
+              + (f", plus {checks / args.interactions:.2f} cache checks" if ttl else ""))
+    hits, misses = counters["hits"], counters["misses"]
+    print(f"    cached run: {hits} hits, {misses} misses ({hits / (hits + misses):.1%} hit rate), "
+          f"{counters['invalidations']} entries invalidated by writes")
+    print(f"SELECTs per interaction cut by {1 - results['cached'] / results['uncached']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Admin system-details report: cross-product GROUP BY over sold tickets vs seat_inventory counts.
+
+The GROUP BY recounts every departure's sold seats from schedule_tickets, as
+the old report counted tickets; the paginated report reads each departure's
+capacity and sold_count from seat_inventory. Both must give the same
+available-seat counts.
+"""
+import argparse
+import random
+import sqlite3
+
+import bench_utils
+
+import migrations
+import paging
+import services
+
+OLD_REPORT = """
+    SELECT
+        buses.bus_id, buses.name, routes.route_name, drivers1.name, drivers2.name,
+        buses.capacity - COUNT(schedule_tickets.ticket_id),
+        schedules.departure_date || ' ' || schedules.departure_time, schedules.arrival_time
+    FROM buses
+    LEFT JOIN routes ON buses.route_id = routes.route_id
+    LEFT JOIN drivers AS drivers1 ON buses.driver_id1 = drivers1.driver_id
+    LEFT JOIN drivers AS drivers2 ON buses.driver_id2 = drivers2.driver_id
+    LEFT JOIN schedules ON buses.bus_id = schedules.bus_id
+    LEFT JOIN schedule_tickets ON schedules.schedule_id = schedule_tickets.schedule_id
+    GROUP BY buses.bus_id, buses.name, routes.route_name, drivers1.name, drivers2.name,
+        schedules.departure_date, schedules.departure_time, schedules.arrival_time
+    ORDER BY buses.bus_id
+"""
+
+
+def seed(path, buses, tickets, schedules):
+    """Create buses with seats and several schedules each, with part of every departure sold."""
+    seats = max(1, tickets // buses)
+    rng = random.Random(1)
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO drivers (driver_id, name, license_number, phone) VALUES (?, ?, ?, '0')",
+                         [(d, f"Driver {d}", f"L-{d}") for d in range(1, 101)])
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, 'A, B')",
+                         [(b, f"Route {b}") for b in range(1, buses + 1)])
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity, driver_id1) VALUES (?, ?, ?, ?, 100, ?, ?)",
+            [(b, f"Bus {b}", f"R-{b}", b, seats, rng.randint(1, 100)) for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, '08:00', '12:00')",
+            [(b, b, f"2025-01-{d:02d}") for b in range(1, buses + 1) for d in range(1, schedules + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO tickets (bus_id, seat_number, seat_id, status, price) VALUES (?, ?, ?, ?, 100)",
+            ((b, n, f"{b}-{n}", rng.choice(("sold", "unsold"))) for b in range(1, buses + 1) for n in range(1, seats + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO schedule_tickets (schedule_id, seat_number, price) VALUES (?, ?, 100)",
+            ((schedule_id, n) for (schedule_id,) in conn.execute("SELECT schedule_id FROM schedules").fetchall()
+             for n in range(1, rng.randint(0, seats) + 1)),
+        )
+        conn.execute("""
+            UPDATE seat_inventory SET sold = NULL,
+                sold_count = (SELECT COUNT(*) FROM schedule_tickets WHERE schedule_id = seat_inventory.schedule_id)
+        """)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=2_000)
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--schedules", type=int, default=3, help="schedules per bus")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    _, elapsed = bench_utils.timed(seed, path, args.buses, args.tickets, args.schedules)
+    print(f"seeded {args.buses} buses / {args.tickets} tickets in {elapsed:.1f}s")
+
+    conn = sqlite3.connect(path)
+    old_rows, old_time = bench_utils.timed(lambda: conn.execute(OLD_REPORT).fetchall())
+
+    fleet = services.FleetService(path)
+    first_page, page_time = bench_utils.timed(fleet.system_details_page)
+
+    def full_report():
+        rows, cursor = [], None
+        while True:
+            page = fleet.system_details_page(after=cursor, limit=paging.PAGE_SIZE)
+            rows += page.rows
+            if page.cursor is None:
+                return rows
+            cursor = page.cursor
+
+    new_rows, new_time = bench_utils.timed(full_report)
+
+    old_counts = {(row[0], row[6]): row[5] for row in old_rows}
+    new_counts = {(row[0], row[6]): row[5] for row in new_rows}
+    print(f"old GROUP BY report:       {old_time * 1000:9.1f}ms ({len(old_rows)} rows)")
+    print(f"new report, first page:    {page_time * 1000:9.1f}ms ({len(first_page.rows)} rows)")
+    print(f"new report, all pages:     {new_time * 1000:9.1f}ms ({len(new_rows)} rows)")
+    print(f"speed-up (full report): {old_time / new_time:.1f}x, first screen: {old_time / page_time:.1f}x")
+    if old_counts != new_counts:
+        raise SystemExit("FAIL: available seat counts differ between the GROUP BY and seat_inventory")
+    print("OK: available seat counts match")
+
+
+if __name__ == "__main__":
+    main()
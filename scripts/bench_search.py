@@ -0,0 +1,86 @@
+"""Compare FTS5 bus search against the old LOWER(...) LIKE '%term%' query."""
+import argparse
+import random
+import sqlite3
+
+import bench_utils
+
+import migrations
+import services
+
+LIKE_QUERY = """
+    SELECT buses.bus_id, buses.name, buses.number, buses.ticket_price, buses.capacity,
+        routes.route_name
+    FROM buses
+    JOIN routes ON buses.route_id = routes.route_id
+    WHERE LOWER(buses.name) LIKE ? OR LOWER(routes.route_name) LIKE ?
+    LIMIT ?
+"""
+
+SYLLABLES = ["dha", "ka", "syl", "het", "khu", "lna", "raj", "sha", "hi", "bar", "isha", "rang",
+             "pur", "co", "mil", "la", "fe", "ni", "bo", "gu", "ra", "jes", "sore", "tan", "gail"]
+
+
+def place_names(count, rng):
+    """Generate a vocabulary of distinct synthetic stop names."""
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title())
+    return sorted(names)
+
+
+def seed(path, routes, stops):
+    """Create one bus per route with random multi-stop itineraries."""
+    rng = random.Random(7)
+    places = place_names(stops, rng)
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        rows = []
+        for r in range(1, routes + 1):
+            itinerary = rng.sample(places, rng.randint(3, 8))
+            rows.append((r, f"{itinerary[0]} to {itinerary[-1]}", ", ".join(itinerary)))
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, ?)", rows)
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 100, 40)",
+            [(r, f"{rng.choice(places)} Express", f"BX-{r}", r) for r in range(1, routes + 1)],
+        )
+        migrations.migrate(conn)
+    return places
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--routes", type=int, default=100_000)
+    parser.add_argument("--stops", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=services.SEARCH_PAGE_SIZE)
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    places, elapsed = bench_utils.timed(seed, path, args.routes, args.stops)
+    print(f"seeded {args.routes} routes over {args.stops} stops in {elapsed:.1f}s")
+
+    # Mix full stop names, typed-so-far prefixes and two-stop queries
+    rng = random.Random(11)
+    terms = []
+    for i in range(args.queries):
+        place = rng.choice(places).lower()
+        terms.append([place, place[:4], f"{place} {rng.choice(places).lower()}"][i % 3])
+
+    service = services.BookingService(path)
+    fts, like = [], []
+    conn = sqlite3.connect(path)
+    for term in terms:
+        _, elapsed = bench_utils.timed(service.search_buses, term, 0, args.page_size)
+        fts.append(elapsed)
+        pattern = f"%{term}%"
+        _, elapsed = bench_utils.timed(lambda: conn.execute(LIKE_QUERY, (pattern, pattern, args.page_size)).fetchall())
+        like.append(elapsed)
+
+    bench_utils.report("FTS5 search_buses", fts)
+    bench_utils.report("LIKE '%term%'", like)
+    print(f"speed-up at p50: {bench_utils.percentile(like, 50) / bench_utils.percentile(fts, 50):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
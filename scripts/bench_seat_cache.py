@@ -0,0 +1,102 @@
+"""Seat availability: per-seat SQL query vs the in-process seat bitmap cache."""
+import argparse
+import random
+import sqlite3
+
+import bench_utils
+
+import migrations
+import seat_cache
+import services
+
+
+def seed(path, buses, seats, days):
+    """Create buses with daily departures whose seats are randomly half sold."""
+    rng = random.Random(1)
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, 'A, B')",
+                         [(b, f"Route {b}") for b in range(1, buses + 1)])
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 100, ?)",
+            [(b, f"Bus {b}", f"R-{b}", b, seats) for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, '08:00', '12:00')",
+            [(b, b, f"2025-01-{d:02d}") for b in range(1, buses + 1) for d in range(1, days + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedule_tickets (schedule_id, seat_number, user_id, price) VALUES (?, ?, 1, 100)",
+            ((s, n) for s in range(1, buses * days + 1) for n in range(1, seats + 1) if rng.random() < 0.5),
+        )
+        conn.execute("UPDATE seat_inventory SET sold = NULL")  # Rebuilt lazily from schedule_tickets
+        conn.executemany("INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', '')",
+                         [(u, f"User {u}", f"user{u}@example.com") for u in range(1, 101)])
+
+
+def unsold_sql(conn, schedule_id):
+    """Compute a departure's unsold seats from schedule_tickets without the bitmap."""
+    capacity = conn.execute("SELECT capacity FROM seat_inventory WHERE schedule_id = ?", (schedule_id,)).fetchone()[0]
+    sold = {row[0] for row in conn.execute(
+        "SELECT seat_number FROM schedule_tickets WHERE schedule_id = ?", (schedule_id,))}
+    return [seat for seat in range(1, capacity + 1) if seat not in sold]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=1_000)
+    parser.add_argument("--seats", type=int, default=50)
+    parser.add_argument("--days", type=int, default=5, help="departures per bus")
+    parser.add_argument("--lookups", type=int, default=50_000)
+    parser.add_argument("--hot", type=int, default=500, help="number of departures lookups are drawn from")
+    parser.add_argument("--bookings", type=int, default=2_000)
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    _, elapsed = bench_utils.timed(seed, path, args.buses, args.seats, args.days)
+    departures = args.buses * args.days
+    print(f"seeded {departures} departures x {args.seats} seats in {elapsed:.1f}s")
+
+    rng = random.Random(2)
+    hot = rng.sample(range(1, departures + 1), min(args.hot, departures))
+    lookups = [rng.choice(hot) for _ in range(args.lookups)]
+
+    conn = sqlite3.connect(path)
+    uncached = []
+    for schedule_id in lookups[:5_000]:
+        _, elapsed = bench_utils.timed(unsold_sql, conn, schedule_id)
+        uncached.append(elapsed)
+    bench_utils.report("available seats, SQL", uncached)
+
+    service = services.BookingService(path)
+    cached, adjacent = [], []
+    for schedule_id in lookups:
+        _, elapsed = bench_utils.timed(service.available_seats, schedule_id)
+        cached.append(elapsed)
+    bench_utils.report("available seats, cache", cached)
+    for schedule_id in lookups:
+        _, elapsed = bench_utils.timed(service.adjacent_seats, schedule_id, 3)
+        adjacent.append(elapsed)
+    bench_utils.report("3 adjacent free seats, cache", adjacent)
+
+    # Book through the service so the cache is updated in place, then compare with the database
+    for i in range(args.bookings):
+        schedule_id = rng.choice(hot)
+        seats = service.adjacent_seats(schedule_id, 2) or service.available_seats(schedule_id)[:1]
+        if seats:
+            service.book_seats(schedule_id, seats, rng.randint(1, 100))
+    stale = 0
+    for schedule_id in hot:
+        stale += service.available_seats(schedule_id) != unsold_sql(conn, schedule_id)
+
+    stats = seat_cache.get_cache(path).stats()
+    print(f"cache: {stats['entries']} entries, hit rate {stats['hit_rate']:.1%}, "
+          f"{stats['updates']} in-place updates, {stats['invalidations']} invalidations")
+    if stale:
+        raise SystemExit(f"FAIL: {stale} departures have a cached seat map that differs from schedule_tickets")
+    print("OK: cached seat maps match schedule_tickets after bookings")
+
+
+if __name__ == "__main__":
+    main()
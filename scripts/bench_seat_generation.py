@@ -0,0 +1,79 @@
+"""Bulk seat generation throughput: seats/min for new buses and for inventory regeneration."""
+import argparse
+import sqlite3
+import time
+
+import bench_utils
+
+import db_pool
+import inventory
+import migrations
+import services
+
+TARGET_PER_MIN = 1_000_000
+TIERS = [inventory.SeatTier("Business", 8, 1500.0), inventory.SeatTier("Premium", 12, 1200.0)]
+
+
+def seed(path, buses, capacity, days):
+    """Create buses (without seats) and their daily departures."""
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany("INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, 'A, B')",
+                         [(b, f"Route {b}") for b in range(1, buses + 1)])
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 900, ?)",
+            [(b, f"Bus {b}", f"R-{b}", b, capacity) for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, '08:00', '12:00')",
+            [(b, b, f"2025-01-{d:02d}") for b in range(1, buses + 1) for d in range(1, days + 1)],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=20_000)
+    parser.add_argument("--capacity", type=int, default=50)
+    parser.add_argument("--days", type=int, default=3, help="departures per bus")
+    parser.add_argument("--regenerate", type=int, default=2_000, help="buses to regenerate through FleetService")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.buses, args.capacity, args.days)
+    conn = db_pool.get_connection(path)
+
+    # One transaction per bus, as FleetService.add_bus does
+    latencies = []
+    start = time.perf_counter()
+    for bus_id in range(1, args.buses + 1):
+        with conn:
+            _, elapsed = bench_utils.timed(inventory.generate_seats, conn, bus_id, args.capacity, 900.0, TIERS)
+        latencies.append(elapsed)
+    elapsed = time.perf_counter() - start
+    generated = args.buses * args.capacity
+    bench_utils.report("generate_seats (per bus)", latencies, elapsed)
+    rate = generated / elapsed * 60
+    print(f"generated {generated} seats in {elapsed:.2f}s: {rate:,.0f} seats/min")
+
+    fleet = services.FleetService(path)
+    latencies = []
+    start = time.perf_counter()
+    for bus_id in range(1, min(args.regenerate, args.buses) + 1):
+        _, regen_elapsed = bench_utils.timed(fleet.regenerate_inventory, bus_id, TIERS)
+        latencies.append(regen_elapsed)
+    regen_total = time.perf_counter() - start
+    bench_utils.report("FleetService.regenerate_inventory", latencies, regen_total)
+    print(f"regenerated {len(latencies) * args.capacity} seats: "
+          f"{len(latencies) * args.capacity / regen_total * 60:,.0f} seats/min")
+
+    seats, priced = conn.execute("SELECT COUNT(*), SUM(seat_class = 'Business') FROM tickets").fetchone()
+    departures = conn.execute("SELECT COUNT(*) FROM seat_inventory WHERE capacity = ?", (args.capacity,)).fetchone()[0]
+    if seats != generated or priced != args.buses * 8 or departures != args.buses * args.days:
+        raise SystemExit(f"FAIL: {seats} seats, {priced} business seats, {departures} departures with inventory")
+    if rate < TARGET_PER_MIN:
+        raise SystemExit(f"FAIL: below the {TARGET_PER_MIN:,} seats/min target")
+    print(f"OK: above the {TARGET_PER_MIN:,} seats/min target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Throughput benchmark for the headless service layer.
+
+Seeds a synthetic database (10k buses and 5M tickets by default) and reports
+p50/p99 latency and ops/sec for each BookingService, ScheduleService and
+FleetService operation.
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import bench_utils
+
+import migrations
+import services
+
+CHUNK = 100_000
+
+
+def seed(path, buses, tickets, users):
+    """Fill a fresh database with routes, buses, schedules, users and seats."""
+    seats_per_bus = max(1, tickets // buses)
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executemany(
+            "INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', '')",
+            [(u, f"user{u}", f"user{u}@bench") for u in range(1, users + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO routes (route_id, route_name, stops) VALUES (?, ?, ?)",
+            [(b, f"City{b % 97} to City{b % 89}", f"City{b % 97}, Town{b}, City{b % 89}") for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, ?, 100, ?)",
+            [(b, f"Express {b}", f"EX-{b}", b, seats_per_bus) for b in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, '2025-01-01', '08:00', '12:00')",
+            [(b, b) for b in range(1, buses + 1)],
+        )
+        rows = []
+        for b in range(1, buses + 1):
+            for n in range(1, seats_per_bus + 1):
+                sold = random.random() < 0.5
+                rows.append((b, n, f"{b}-{n}", "sold" if sold else "unsold", random.randint(1, users) if sold else None))
+                if len(rows) >= CHUNK:
+                    conn.executemany("INSERT INTO tickets (bus_id, seat_number, seat_id, status, price, user_id) VALUES (?, ?, ?, ?, 100, ?)", rows)
+                    rows = []
+        conn.executemany("INSERT INTO tickets (bus_id, seat_number, seat_id, status, price, user_id) VALUES (?, ?, ?, ?, 100, ?)", rows)
+        migrations.migrate(conn)
+        conn.execute("ANALYZE")
+    return seats_per_bus
+
+
+def measure(name, func, iterations):
+    """Run func(i) repeatedly and print its latency distribution."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        _, elapsed = bench_utils.timed(func, i)
+        latencies.append(elapsed)
+    bench_utils.report(name, latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buses", type=int, default=10_000)
+    parser.add_argument("--tickets", type=int, default=5_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    print(f"seeding {args.buses} buses / {args.tickets} tickets into {path} ...")
+    _, elapsed = bench_utils.timed(seed, path, args.buses, args.tickets, args.users)
+    print(f"seeded in {elapsed:.1f}s")
+
+    bookings = services.BookingService(path)
+    schedules = services.ScheduleService(path)
+    fleet = services.FleetService(path)
+    rng = random.Random(42)
+    bus = lambda: rng.randint(1, args.buses)
+    departure = bus  # One schedule per bus, so schedule ids run 1..buses too
+
+    n = args.iterations
+    measure("BookingService.search_buses", lambda i: bookings.search_buses(f"express {bus()}"), max(1, n // 10))
+    measure("BookingService.available_seats", lambda i: bookings.available_seats(departure()), n)
+    measure("BookingService.bus_schedules", lambda i: bookings.bus_schedules(bus()), n)
+    measure("BookingService.user_tickets", lambda i: bookings.user_tickets(rng.randint(1, args.users)), n)
+    measure("BookingService.book_seats", lambda i: bookings.book_seats(departure(), [1], 1), n)
+    measure("ScheduleService.add_schedule",
+            lambda i: schedules.add_schedule(bus(), 1, str(date(2026, 1, 1) + timedelta(days=i)), "08:00", "12:00"), n)
+    measure("ScheduleService.schedules_for_bus", lambda i: schedules.schedules_for_bus(bus()), n)
+    measure("FleetService.get_bus", lambda i: fleet.get_bus(bus()), n)
+    measure("FleetService.list_buses", lambda i: fleet.list_buses(), max(1, n // 50))
+    measure("FleetService.list_tickets", lambda i: fleet.list_tickets(), max(1, n // 250))
+    measure("FleetService.tickets_page", lambda i: fleet.tickets_page(after=(rng.randint(1, args.tickets),)), n)
+    measure("FleetService.routes_page (filtered)", lambda i: fleet.routes_page(search=f"Town{bus()}"), max(1, n // 10))
+    measure("ScheduleService.buses_page", lambda i: schedules.buses_page(after=(bus(),)), n)
+    measure("ScheduleService.schedules_page", lambda i: schedules.schedules_page(bus()), n)
+
+
+if __name__ == "__main__":
+    main()
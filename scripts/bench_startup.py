@@ -0,0 +1,111 @@
+"""GUI startup cost: import time of app.py, background image loading and time to the first frame."""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import bench_utils
+
+import background
+
+# Run in a child interpreter so every import is cold. Prints when the login
+# form is on screen and again once the background image has been drawn.
+FIRST_FRAME_CHILD = """
+import sys, time
+import tkinter as tk
+import app
+import background
+background.CACHE_DIR = sys.argv[2]
+root = tk.Tk()
+gui = app.BusAppGUI(root, lazy=sys.argv[1] == "lazy")
+root.update()
+print("frame", flush=True)
+while gui.bg_image_tk is None:
+    root.update()
+    time.sleep(0.001)
+print("background", flush=True)
+gui.executor.shutdown()
+root.destroy()
+"""
+
+
+def import_times(module, top):
+    """Return (total microseconds, [(cumulative us, name)] of the slowest top-level imports) for module."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=bench_utils.ROOT, capture_output=True, text=True, check=True)
+    total, children = 0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if name.strip() == module:
+            total = int(cumulative)
+        elif name.startswith("   ") and not name.startswith("    "):
+            children.append((int(cumulative), name.strip()))
+    return total, sorted(children, reverse=True)[:top]
+
+
+def first_frame(mode, cache_dir):
+    """Return (seconds to login form, seconds to background) for a child GUI process, or None without a display."""
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", FIRST_FRAME_CHILD, mode, cache_dir], cwd=bench_utils.ROOT,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    marks = []
+    for line in child.stdout:
+        marks.append(time.perf_counter() - start)
+    child.wait()
+    if child.returncode or len(marks) != 2:
+        return None
+    return tuple(marks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    runs = [import_times("app", args.top) for _ in range(args.runs)]
+    totals = sorted(total for total, _ in runs)
+    slowest = runs[-1][1]
+    print(f"import app: median {totals[len(totals) // 2] / 1000:.1f}ms")
+    for cumulative, name in slowest:
+        print(f"    {cumulative / 1000:7.1f}ms  {name}")
+    services, _ = import_times("services", 0)
+    pil, _ = import_times("PIL.ImageTk", 0)
+    print(f"deferred: services {services / 1000:.1f}ms (until a menu opens), "
+          f"PIL {pil / 1000:.1f}ms (on the image worker)")
+
+    source = os.path.join(bench_utils.ROOT, "bus_service_image.jpg")
+    from PIL import Image  # Imported up front so the timings below are decoding only
+
+    def uncached():
+        with Image.open(source) as image:
+            return image.resize((800, 500), Image.Resampling.LANCZOS)
+
+    cache_dir = tempfile.mkdtemp(prefix="bus_bench_")
+    _, eager = bench_utils.timed(uncached)
+    _, cold = bench_utils.timed(background.load, source, (800, 500), cache_dir)
+    warm = min(bench_utils.timed(background.load, source, (800, 500), cache_dir)[1] for _ in range(args.runs))
+    print(f"background image: decode+resize {eager * 1000:.1f}ms, cold cache {cold * 1000:.1f}ms, "
+          f"warm cache {warm * 1000:.1f}ms")
+
+    for mode in ("eager", "lazy"):
+        for cache in ("cold", "warm"):
+            cache_dir = tempfile.mkdtemp(prefix="bus_bench_")
+            if cache == "warm":
+                background.load(source, (800, 500), cache_dir)
+            marks = first_frame(mode, cache_dir)
+            if marks is None:
+                print("time to first frame: skipped (no display; run under X or xvfb-run)")
+                return
+            print(f"{mode:>5}, {cache} cache: login form after {marks[0] * 1000:6.1f}ms, "
+                  f"background after {marks[1] * 1000:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
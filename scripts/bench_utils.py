@@ -0,0 +1,44 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_db(name="bench.db"):
+    """Create an empty database from schema.sql in a temporary directory."""
+    path = os.path.join(tempfile.mkdtemp(prefix="bus_bench_"), name)
+    with sqlite3.connect(path) as conn:
+        with open(os.path.join(ROOT, "schema.sql"), "r") as schema_file:
+            conn.executescript(schema_file.read())
+        conn.execute("PRAGMA journal_mode = WAL")
+    return path
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, *args, **kwargs):
+    """Call func and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed=None):
+    """Print p50/p99 latency and ops/sec for a list of per-call latencies."""
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    ops = len(latencies) / elapsed if elapsed else 0.0
+    print(f"{name:<36} n={len(latencies):<7} p50={percentile(latencies, 50) * 1000:8.3f}ms "
+          f"p99={percentile(latencies, 99) * 1000:8.3f}ms ops/sec={ops:10.1f}")
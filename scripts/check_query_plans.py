@@ -0,0 +1,79 @@
+"""Query-plan regression check: EXPLAIN QUERY PLAN every SQL string in the app.
+
+Builds a scratch database from schema.sql plus all migrations, then fails if a
+filtered query falls back to a full-table SCAN. Unfiltered listings (queries
+without a WHERE clause) may scan their driving table only.
+"""
+import ast
+import os
+import re
+import sqlite3
+import sys
+
+import bench_utils
+
+import migrations
+
+SOURCES = ["app.py", "services.py", "journeys.py", "seat_cache.py", "inventory.py", "booking.py", "bulk_io.py", "recurrence.py", "conflicts.py", "analytics.py", "ledger.py", "credentials.py", "refcache.py", "prebooking.py"]
+
+# Queries that are known to need a full scan, keyed by a fragment of their SQL
+KNOWN_SCANS = {}
+
+
+def extract_queries(path):
+    """Yield (line, sql) for every execute/executemany/reference string literal in a file."""
+    with open(path, "r") as source:
+        tree = ast.parse(source.read(), filename=path)
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ("execute", "executemany", "reference") and node.args
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            sql = re.sub(r"--[^\n]*", "", node.args[0].value)
+            yield node.lineno, " ".join(sql.split())
+
+
+def scans(conn, sql):
+    """Return the SCAN steps of a statement's query plan."""
+    params = [None] * sql.count("?")
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    # Subqueries in FROM are already bounded by their own plan, so scanning them is fine
+    derived = set(re.findall(r"\)\s*(?:AS\s+)?(\w+)", sql, re.IGNORECASE))
+    # FTS5 lookups show up as "SCAN <table> VIRTUAL TABLE INDEX ..." but are index driven
+    return [row[3] for row in plan
+            if row[3].startswith("SCAN") and "VIRTUAL TABLE" not in row[3]
+            and row[3].split()[1] not in derived]
+
+
+def check(conn, sql):
+    """Return a failure message for a query, or None if its plan is acceptable."""
+    verb = sql.split(None, 1)[0].upper()
+    if verb not in ("SELECT", "UPDATE", "DELETE"):
+        return None
+    steps = scans(conn, sql)
+    if any(fragment in sql for fragment in KNOWN_SCANS):
+        return None
+    if " WHERE " not in f" {sql.upper()} ":
+        # Plain listings may scan the table they list, but joins must still be indexed
+        steps = steps[1:]
+    return "; ".join(steps) or None
+
+
+def main():
+    conn = sqlite3.connect(bench_utils.make_db("plans.db"))
+    migrations.migrate(conn)
+
+    failures = 0
+    for name in SOURCES:
+        path = os.path.join(bench_utils.ROOT, name)
+        for line, sql in extract_queries(path):
+            problem = check(conn, sql)
+            if problem:
+                failures += 1
+                print(f"{name}:{line}: {problem}\n    {sql}")
+    if failures:
+        sys.exit(f"{failures} quer{'y' if failures == 1 else 'ies'} fall back to SCAN")
+    print("OK: every filtered query uses an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Concurrency check: terminals racing to charter the same departure.
+
+Every process waits on a barrier, then all of them go for the same
+departure at once. In the first half of the rounds every racer tries to
+prebook the whole bus. In the second half, even-numbered racers prebook
+and odd-numbered racers try to buy a seat. The parent then checks, from
+both the racers' reports and the database, that:
+
+  * exactly one racer chartered each contested departure;
+  * no departure ended up both chartered and with seats sold;
+  * losers were refused with prebooking.CharterUnavailable or an
+    "unavailable" seat, never a database error.
+"""
+import argparse
+import multiprocessing
+import sqlite3
+import time
+from collections import Counter, defaultdict
+
+import bench_utils
+
+import booking
+import migrations
+import prebooking
+import services
+
+CHARTER = "charter"
+SEAT = "seat"
+
+
+def seed(path, departures, racers):
+    """Create one bus with a departure per round, and one user per racer."""
+    with sqlite3.connect(path) as conn:
+        migrations.migrate(conn)
+        conn.executemany(
+            "INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', '')",
+            [(user_id, f"racer{user_id}", f"racer{user_id}@race") for user_id in range(1, racers + 1)],
+        )
+        conn.execute("INSERT INTO routes (route_name, stops) VALUES ('Race', 'A, B')")
+        conn.execute("INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (1, 'Charter', 'R-1', 1, 10, 40)")
+        conn.executemany(
+            "INSERT INTO schedules (schedule_id, bus_id, route_id, departure_date, departure_time, arrival_time) "
+            "VALUES (?, 1, 1, '2025-01-01', ?, '23:59')",
+            [(schedule_id, f"{schedule_id // 60:02d}:{schedule_id % 60:02d}") for schedule_id in range(1, departures + 1)],
+        )
+
+
+def role(racer, schedule_id, rounds):
+    """Return what a racer tries on a departure: everyone charters, then charters race seat sales."""
+    if schedule_id <= rounds // 2 or racer % 2 == 0:
+        return CHARTER
+    return SEAT
+
+
+def racer(path, user_id, rounds, barrier, queue):
+    """Race for every departure in turn; report (user_id, [(schedule_id, role, outcome)])."""
+    bookings = services.BookingService(path)
+    outcomes = []
+    try:
+        for schedule_id in range(1, rounds + 1):
+            barrier.wait()
+            action = role(user_id, schedule_id, rounds)
+            try:
+                if action == CHARTER:
+                    bookings.prebook(user_id, schedule_id)
+                    outcome = "won"
+                else:
+                    results, _ = bookings.book_seats(schedule_id, [user_id], user_id)
+                    outcome = "won" if booking.booked_seats(results) else "refused"
+            except prebooking.CharterUnavailable as e:
+                outcome = f"refused ({e.reason})"
+            except sqlite3.Error as e:
+                outcome = f"error: {e}"
+            outcomes.append((schedule_id, action, outcome))
+    finally:
+        queue.put((user_id, outcomes))
+
+
+def verify(path, reports, rounds):
+    """Return a list of problems with the race results."""
+    problems = []
+    with sqlite3.connect(path) as conn:
+        charters = defaultdict(list)
+        for schedule_id, user_id in conn.execute("SELECT schedule_id, user_id FROM prebooked_buses"):
+            charters[schedule_id].append(user_id)
+        sold = Counter(schedule_id for (schedule_id,) in conn.execute("SELECT schedule_id FROM schedule_tickets"))
+
+    winners = defaultdict(lambda: defaultdict(list))
+    for user_id, outcomes in reports:
+        for schedule_id, action, outcome in outcomes:
+            if outcome.startswith("error"):
+                problems.append(f"racer {user_id} on departure {schedule_id}: {outcome}")
+            elif outcome == "won":
+                winners[schedule_id][action].append(user_id)
+    for schedule_id in range(1, rounds + 1):
+        chartered = winners[schedule_id][CHARTER]
+        if len(chartered) > 1 or sorted(chartered) != sorted(charters[schedule_id]):
+            problems.append(f"departure {schedule_id}: chartered by {chartered}, database has {charters[schedule_id]}")
+        if charters[schedule_id] and sold[schedule_id]:
+            problems.append(f"departure {schedule_id}: chartered and {sold[schedule_id]} seats sold")
+        if schedule_id <= rounds // 2 and len(chartered) != 1:
+            problems.append(f"departure {schedule_id}: {len(chartered)} of the charter racers won")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--racers", type=int, default=8, help="processes racing for each departure")
+    parser.add_argument("--rounds", type=int, default=200, help="departures to race for")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.rounds, args.racers)
+
+    barrier = multiprocessing.Barrier(args.racers)
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=racer, args=(path, user_id, args.rounds, barrier, queue))
+             for user_id in range(1, args.racers + 1)]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    reports = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    tally = Counter()
+    for _, outcomes in reports:
+        for schedule_id, action, outcome in outcomes:
+            phase = "charter vs charter" if schedule_id <= args.rounds // 2 else "charter vs seats"
+            tally[phase, action, outcome] += 1
+    print(f"{args.racers} racers x {args.rounds} departures in {elapsed:.1f}s")
+    for (phase, action, outcome), count in sorted(tally.items()):
+        print(f"    {phase:<20} {action:<8} {outcome:<28} {count:6}")
+
+    problems = verify(path, reports, args.rounds)
+    for problem in problems[:20]:
+        print(f"    FAIL: {problem}")
+    if problems:
+        raise SystemExit(f"FAIL: {len(problems)} problems")
+    print("OK: every departure went to a single charterer or to seat buyers, never both")
+
+
+if __name__ == "__main__":
+    main()
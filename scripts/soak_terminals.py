@@ -0,0 +1,221 @@
+"""Multi-process soak test: several booking terminals writing to one database at once.
+
+Every process plays a counter terminal for --duration seconds, driving the
+service layer like app.py does: booking seat pairs, cancelling its own
+tickets, chartering whole departures and admin driver CRUD. Each terminal reports the
+writes that succeeded and the errors it saw. The parent then checks that
+every reported write is in the database (no lost writes), that seat
+inventory agrees with the sold tickets, that no chartered departure has
+seats sold, and how large the WAL grew.
+
+--rollback-journal runs the same load the way terminals used to be set up
+(rollback journal, no busy timeout, no retries) for comparison.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+import bench_utils
+
+import booking
+import db_pool
+import migrations
+import prebooking
+import services
+
+# (operation, weight)
+MIX = (("book", 55), ("cancel", 10), ("prebook", 10), ("add driver", 10), ("update driver", 10), ("delete driver", 5))
+
+
+def seed(path, buses, seats, terminals, journal_mode):
+    """Create buses with one departure each, and one user per terminal."""
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        migrations.migrate(conn)
+        conn.executemany(
+            "INSERT INTO users (user_id, name, email, phone, password) VALUES (?, ?, ?, '0', '')",
+            [(user_id, f"terminal{user_id}", f"terminal{user_id}@soak") for user_id in range(1, terminals + 1)],
+        )
+        conn.execute("INSERT INTO routes (route_name, stops) VALUES ('Soak', 'A, B')")
+        conn.executemany(
+            "INSERT INTO buses (bus_id, name, number, route_id, ticket_price, capacity) VALUES (?, ?, ?, 1, 10, ?)",
+            [(bus_id, f"Bus {bus_id}", f"S-{bus_id}", seats) for bus_id in range(1, buses + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO schedules (schedule_id, bus_id, route_id, departure_date, departure_time, arrival_time) "
+            "VALUES (?, ?, 1, '2025-01-01', '08:00', '12:00')",
+            [(bus_id, bus_id) for bus_id in range(1, buses + 1)],
+        )
+
+
+def terminal(path, user_id, args, queue):
+    """Run the operation mix until the deadline and report (user_id, writes, errors, latencies, checkpoints)."""
+    retry = None
+    if args.rollback_journal:
+        db_pool.PRAGMAS.update(journal_mode="DELETE", busy_timeout=0)
+        retry = booking.RetryPolicy(attempts=1)
+    bookings = services.BookingService(path, retry)
+    fleet = services.FleetService(path, retry)
+    rng = random.Random(user_id)
+    names, weights = zip(*MIX)
+    writes = {"booked": [], "sales": 0, "cancelled": [], "prebooked": [], "drivers": {}, "deleted": []}
+    errors = Counter()
+    latencies = defaultdict(list)
+    drivers = 0
+    deadline = time.monotonic() + args.duration
+    try:
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                if name == "book":
+                    schedule_id, seat = rng.randint(1, args.buses), rng.randint(1, args.seats - 1)
+                    results, _ = bookings.book_seats(schedule_id, [seat, seat + 1], user_id)
+                    sold = booking.booked_seats(results)
+                    writes["booked"].extend((schedule_id, seat) for seat in sold)
+                    writes["sales"] += bool(sold)
+                elif name == "cancel":
+                    tickets = bookings.user_tickets(user_id)
+                    if tickets:
+                        ticket_id = rng.choice(tickets)[5]
+                        if bookings.cancel_ticket(ticket_id, user_id):
+                            writes["cancelled"].append(ticket_id)
+                elif name == "prebook":
+                    try:
+                        writes["prebooked"].append(bookings.prebook(user_id, rng.randint(1, args.buses)))
+                    except prebooking.CharterUnavailable:
+                        pass  # Someone chartered it or bought a seat first; a normal outcome
+                elif name == "add driver":
+                    drivers += 1
+                    license_number = f"T{user_id}-{drivers}"
+                    writes["drivers"][fleet.add_driver(f"Driver {license_number}", license_number, "0", "Depot")] = "0"
+                elif writes["drivers"]:
+                    driver_id = rng.choice(list(writes["drivers"]))
+                    if name == "update driver":
+                        phone = str(rng.randint(1, 10 ** 6))
+                        fleet.update_driver(driver_id, f"Driver {driver_id}", f"T{user_id}-d{driver_id}", phone, "Depot")
+                        writes["drivers"][driver_id] = phone
+                    else:
+                        fleet.delete_driver(driver_id)
+                        del writes["drivers"][driver_id]
+                        writes["deleted"].append(driver_id)
+            except sqlite3.Error as e:
+                errors[f"{name}: {e}"] += 1
+                continue
+            latencies[name].append(time.perf_counter() - start)
+    finally:
+        # Always report back so the parent never blocks on a crashed terminal
+        queue.put((user_id, writes, errors, dict(latencies), db_pool.get_pool(path).stats()["checkpoints"]))
+
+
+def watch_wal(path, stop, sizes):
+    """Sample the WAL file size until stop is set."""
+    while not stop.is_set():
+        try:
+            sizes.append(os.path.getsize(f"{path}-wal"))
+        except OSError:
+            pass
+        stop.wait(0.05)
+
+
+def verify(path, reports):
+    """Return a list of problems: reported writes missing from the database, or inconsistent inventory."""
+    problems = []
+    with sqlite3.connect(path) as conn:
+        tickets = conn.execute("SELECT ticket_id, schedule_id, seat_number, user_id FROM schedule_tickets").fetchall()
+        prebooks = dict(conn.execute("SELECT prebook_id, schedule_id FROM prebooked_buses"))
+        drivers = dict(conn.execute("SELECT driver_id, phone FROM drivers"))
+        counted = conn.execute("SELECT COALESCE(SUM(sold_count), 0) FROM seat_inventory").fetchone()[0]
+        bits = sum(bin(int.from_bytes(bitmap, "little")).count("1")
+                   for (bitmap,) in conn.execute("SELECT sold FROM seat_inventory"))
+        entries = dict(conn.execute("SELECT kind, COUNT(*) FROM transactions GROUP BY kind"))
+
+    booked = sum(len(writes["booked"]) for _, writes in reports)
+    cancelled = sum(len(writes["cancelled"]) for _, writes in reports)
+    if len(tickets) != booked - cancelled:
+        problems.append(f"{booked} seats booked and {cancelled} cancelled, but {len(tickets)} tickets remain")
+    if not len(tickets) == counted == bits:
+        problems.append(f"{len(tickets)} tickets, but seat_inventory counts {counted} and has {bits} bits set")
+    mixed = set(prebooks.values()) & {ticket[1] for ticket in tickets}
+    if mixed:
+        problems.append(f"{len(mixed)} chartered departures also have seats sold")
+    for user_id, writes in reports:
+        missing = [ticket for ticket in writes["prebooked"] if ticket not in prebooks]
+        if missing:
+            problems.append(f"terminal {user_id}: {len(missing)} prebookings lost")
+        lost = [driver_id for driver_id, phone in writes["drivers"].items() if drivers.get(driver_id) != phone]
+        if lost:
+            problems.append(f"terminal {user_id}: {len(lost)} driver writes lost")
+        resurrected = [driver_id for driver_id in writes["deleted"] if driver_id in drivers]
+        if resurrected:
+            problems.append(f"terminal {user_id}: {len(resurrected)} deleted drivers still present")
+    sales = sum(writes["sales"] for _, writes in reports)
+    if entries.get("booking", 0) != sales or entries.get("refund", 0) != cancelled:
+        problems.append(f"{sales} sales and {cancelled} cancellations, but the ledger has "
+                        f"{entries.get('booking', 0)} bookings and {entries.get('refund', 0)} refunds")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--terminals", type=int, default=8, help="processes writing at once")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds each terminal runs")
+    parser.add_argument("--buses", type=int, default=50)
+    parser.add_argument("--seats", type=int, default=40)
+    parser.add_argument("--rollback-journal", action="store_true",
+                        help="use a rollback journal without busy_timeout or retries, as terminals used to")
+    args = parser.parse_args()
+
+    path = bench_utils.make_db()
+    seed(path, args.buses, args.seats, args.terminals, "DELETE" if args.rollback_journal else "WAL")
+
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=terminal, args=(path, user_id, args, queue))
+             for user_id in range(1, args.terminals + 1)]
+    stop, sizes = threading.Event(), []
+    watcher = threading.Thread(target=watch_wal, args=(path, stop, sizes), daemon=True)
+    watcher.start()
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    watcher.join()
+
+    errors, latencies, checkpoints = Counter(), defaultdict(list), 0
+    for _, _, terminal_errors, terminal_latencies, terminal_checkpoints in results:
+        errors.update(terminal_errors)
+        checkpoints += terminal_checkpoints
+        for name, samples in terminal_latencies.items():
+            latencies[name].extend(samples)
+    everything = [sample for samples in latencies.values() for sample in samples]
+
+    mode = "rollback journal, no retries" if args.rollback_journal else "WAL, busy_timeout and retries"
+    print(f"{args.terminals} terminals for {elapsed:.1f}s ({mode})")
+    for name, _ in MIX:
+        bench_utils.report(name, latencies[name], elapsed)
+    bench_utils.report("all successful operations", everything, elapsed)
+    print(f"    failed operations: {sum(errors.values())}")
+    for message, count in errors.most_common(5):
+        print(f"        {count:6}  {message}")
+    print(f"    largest WAL seen: {max(sizes, default=0) / 1024:.0f} KB, forced checkpoints: {checkpoints}")
+
+    reports = [(user_id, writes) for user_id, writes, *_ in results]
+    problems = verify(path, reports)
+    for problem in problems:
+        print(f"    LOST: {problem}")
+    if problems or (errors and not args.rollback_journal):
+        raise SystemExit("FAIL: writes were lost or operations failed")
+    print("OK: every reported write is in the database")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""In-process cache of seat availability, one bitmap per departure.
+
+Each cached SeatMap holds a bytearray with one bit per seat (set = unsold),
+built from the departure's seat_inventory bitmap, so "which seats are free"
+and "first N adjacent free seats" never touch the database. The service
+layer updates bits in place after its own bookings and drops a departure's
+map after changes it cannot apply incrementally. Entries also expire after a
+TTL so that writes made by other processes are picked up.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import inventory
+
+MAX_ENTRIES = 4096
+TTL = 30.0  # Seconds before a cached seat map is reloaded from the database
+
+
+class SeatMap:
+    """Compact seat-availability bitmap for one departure; seats are numbered from 1."""
+
+    __slots__ = ("capacity", "bits", "loaded_at")
+
+    def __init__(self, capacity, sold):
+        self.capacity = capacity
+        self.bits = bytearray(~byte & 0xFF for byte in sold)
+        if capacity & 7:
+            self.bits[-1] &= (1 << (capacity & 7)) - 1  # Clear the padding past the last seat
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, conn, schedule_id):
+        """Build the seat map for a departure from seat_inventory; chartered departures have no free seats."""
+        with conn:
+            loaded = inventory.load(conn, schedule_id)
+            chartered = conn.execute("SELECT 1 FROM prebooked_buses WHERE schedule_id = ?", (schedule_id,)).fetchone()
+        return cls(*loaded) if loaded and chartered is None else cls(0, b"")
+
+    def is_free(self, seat):
+        pos = seat - 1
+        return 0 <= pos < self.capacity and bool(self.bits[pos >> 3] & (1 << (pos & 7)))
+
+    def mark(self, seats, free):
+        """Set seats free or sold; returns False if any seat is out of range."""
+        known = True
+        for seat in seats:
+            pos = seat - 1
+            if not 0 <= pos < self.capacity:
+                known = False
+            elif free:
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+            else:
+                self.bits[pos >> 3] &= ~(1 << (pos & 7)) & 0xFF
+        return known
+
+    def available(self):
+        """Return the free seat numbers, lowest first."""
+        mask = int.from_bytes(self.bits, "little")
+        seats = []
+        while mask:
+            low = mask & -mask
+            seats.append(low.bit_length())
+            mask ^= low
+        return seats
+
+    def adjacent(self, count):
+        """Return the first run of count consecutive free seats, or []."""
+        if count < 1:
+            return []
+        # AND the bitmap with itself shifted so a bit survives only at the start of a run
+        free = int.from_bytes(self.bits, "little")
+        runs = free
+        for shift in range(1, count):
+            runs &= free >> shift
+        if not runs:
+            return []
+        start = (runs & -runs).bit_length()
+        return list(range(start, start + count))
+
+
+class SeatCache:
+    """LRU cache of SeatMaps keyed by schedule_id, with hit-rate counters."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.invalidations = 0
+        self._writes = 0  # Bumped by every mark/invalidate to detect races with a load
+
+    def get(self, conn, schedule_id):
+        """Return the SeatMap for a departure, loading it on a miss or after the TTL."""
+        with self._lock:
+            seat_map = self._maps.get(schedule_id)
+            if seat_map is not None and time.monotonic() - seat_map.loaded_at < self.ttl:
+                self._maps.move_to_end(schedule_id)
+                self.hits += 1
+                return seat_map
+            self.misses += 1
+            writes = self._writes
+        seat_map = SeatMap.load(conn, schedule_id)
+        with self._lock:
+            if writes != self._writes:
+                return seat_map  # A change landed while loading; don't cache a possibly stale map
+            self._maps[schedule_id] = seat_map
+            self._maps.move_to_end(schedule_id)
+            while len(self._maps) > self.max_entries:
+                self._maps.popitem(last=False)
+        return seat_map
+
+    def mark(self, schedule_id, seat_ids, free):
+        """Apply a status change to a cached departure in place; unknown seats drop the entry."""
+        with self._lock:
+            self._writes += 1
+            seat_map = self._maps.get(schedule_id)
+            if seat_map is None:
+                return
+            if seat_map.mark(seat_ids, free):
+                self.updates += 1
+            else:
+                del self._maps[schedule_id]
+                self.invalidations += 1
+
+    def invalidate(self, schedule_id=None):
+        """Drop one departure's seat map, or every map when schedule_id is None."""
+        with self._lock:
+            self._writes += 1
+            if schedule_id is None:
+                self.invalidations += len(self._maps)
+                self._maps.clear()
+            elif self._maps.pop(schedule_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        """Return cache size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._maps),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "updates": self.updates,
+                "invalidations": self.invalidations,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_name):
+    """Return the shared seat cache for a database file, creating it if needed."""
+    with _caches_lock:
+        cache = _caches.get(db_name)
+        if cache is None:
+            cache = _caches[db_name] = SeatCache()
+        return cache
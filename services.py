@@ -0,0 +1,801 @@
+"""Headless service layer behind BusAppGUI.
+
+Every database operation the GUI performs lives here so it can be driven
+without a display (scripts, benchmarks, other front-ends). Methods return
+plain tuples/lists and raise sqlite3 errors; presenting results and errors
+is left to the caller.
+"""
+import functools
+import re
+
+import analytics
+import booking
+import bulk_io
+import conflicts
+import credentials
+import db_pool
+import inventory
+import journeys
+import paging
+import prebooking
+import recurrence
+import refcache
+import seat_cache
+from database import DB_NAME
+
+SEARCH_PAGE_SIZE = 50
+
+# Admin system-details report: one row per bus and departure. Seat counts come
+# from each departure's seat_inventory row, so no tickets are scanned.
+SYSTEM_DETAILS_COLUMNS = ("bus_id", "bus_name", "route_name", "driver1", "driver2",
+                          "available_tickets", "departure", "arrival_time", "schedule_key")
+SYSTEM_DETAILS_SQL = """
+    SELECT
+        buses.bus_id AS bus_id,
+        buses.name AS bus_name,
+        routes.route_name AS route_name,
+        drivers1.name AS driver1,
+        drivers2.name AS driver2,
+        IFNULL(seat_inventory.capacity - seat_inventory.sold_count, 0) AS available_tickets,
+        schedules.departure_date || ' ' || schedules.departure_time AS departure,
+        schedules.arrival_time AS arrival_time,
+        IFNULL(schedules.schedule_id, 0) AS schedule_key
+    FROM buses
+    LEFT JOIN routes ON buses.route_id = routes.route_id
+    LEFT JOIN drivers AS drivers1 ON buses.driver_id1 = drivers1.driver_id
+    LEFT JOIN drivers AS drivers2 ON buses.driver_id2 = drivers2.driver_id
+    LEFT JOIN schedules ON buses.bus_id = schedules.bus_id
+    LEFT JOIN seat_inventory ON schedules.schedule_id = seat_inventory.schedule_id
+"""
+SYSTEM_DETAILS_PAGE = (SYSTEM_DETAILS_SQL, SYSTEM_DETAILS_COLUMNS, ("bus_id", "schedule_key"),
+                       ("bus_name", "route_name", "driver1", "driver2"))
+
+
+# Keyset-paginated admin listings: (base SELECT, columns, key columns, search columns)
+ROUTES_PAGE = (
+    "SELECT route_id, route_name, stops FROM routes",
+    ("route_id", "route_name", "stops"), ("route_id",), ("route_name", "stops"),
+)
+DRIVERS_PAGE = (
+    "SELECT driver_id, name, license_number, phone, address FROM drivers",
+    ("driver_id", "name", "license_number", "phone", "address"), ("driver_id",), ("name", "license_number"),
+)
+TICKETS_PAGE = (
+    """
+    SELECT tickets.ticket_id AS ticket_id, buses.name AS bus_name, tickets.seat_number AS seat_number,
+        tickets.price AS price, tickets.seat_class AS seat_class, tickets.seat_id AS seat_id
+    FROM tickets
+    JOIN buses ON tickets.bus_id = buses.bus_id
+    """,
+    ("ticket_id", "bus_name", "seat_number", "price", "seat_class", "seat_id"), ("ticket_id",),
+    ("bus_name", "seat_id", "seat_class"),
+)
+BUSES_PAGE = (
+    "SELECT bus_id, name FROM buses",
+    ("bus_id", "name"), ("bus_id",), ("name",),
+)
+SCHEDULES_PAGE = (
+    """
+    SELECT schedules.schedule_id AS schedule_id, schedules.departure_date AS departure_date,
+        schedules.departure_time AS departure_time, schedules.arrival_time AS arrival_time,
+        schedules.route_id AS route_id, routes.route_name AS route_name
+    FROM schedules
+    LEFT JOIN routes ON routes.route_id = schedules.route_id
+    WHERE schedules.bus_id = ?
+    """,
+    ("schedule_id", "departure_date", "departure_time", "arrival_time", "route_id", "route_name"),
+    ("schedule_id",), ("departure_date", "route_name"),
+)
+
+
+def fts_query(search_term):
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    words = re.findall(r"\w+", search_term.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def write_transaction(method):
+    """Re-run a Service write method with jittered backoff while another process holds the database lock.
+
+    The method's transaction is rolled back before each retry, so it must
+    only change in-memory state (caches, indexes) after its commit. A
+    successful write also gives the pool a chance to checkpoint the WAL.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = self.retry.run(lambda: method(self, *args, **kwargs))
+        db_pool.get_pool(self.db_name).maybe_checkpoint()
+        return result
+
+    return wrapper
+
+
+class Service:
+    """Base class giving a service access to the pooled connection."""
+
+    def __init__(self, db_name=DB_NAME, retry=None):
+        self.db_name = db_name
+        self.retry = retry or booking.RetryPolicy()
+
+    def connection(self):
+        """Return the calling thread's pooled connection."""
+        return db_pool.get_connection(self.db_name)
+
+    def seat_cache(self):
+        """Return the seat-availability cache shared by every service on this database."""
+        return seat_cache.get_cache(self.db_name)
+
+    def reference_cache(self):
+        """Return the routes/drivers/buses cache shared by every service on this database."""
+        return refcache.get_cache(self.db_name)
+
+    def reference(self, sql, params, tables, one=False):
+        """Return the rows (or first row) of a query over reference tables, through the shared cache."""
+        def load(conn):
+            with conn:
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                return cur.fetchone() if one else cur.fetchall()
+
+        return self.reference_cache().get(self.connection(), (sql, params, one), tables, load)
+
+    def reference_changed(self, *tables):
+        """Tell the reference cache that a committed write changed tables."""
+        self.reference_cache().changed(self.connection(), *tables)
+
+    def page(self, listing, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None, params=(),
+             tables=()):
+        """Return one keyset-paginated Page of a listing such as ROUTES_PAGE.
+
+        Pages of listings over reference tables only are cached; pass those tables.
+        """
+        sql, columns, key_columns, search_columns = listing
+
+        def load(conn):
+            with conn:
+                return paging.fetch_page(
+                    conn, sql, columns, key_columns, sort=sort, descending=descending, after=after,
+                    limit=limit, search=search, search_columns=search_columns, params=params,
+                )
+
+        if not tables:
+            return load(self.connection())
+        key = ("page", sql, sort, descending, None if after is None else tuple(after), limit, search, params)
+        return self.reference_cache().get(self.connection(), key, tables, load)
+
+
+class AuthService(Service):
+    """Sign-up, login and sessions."""
+
+    def sessions(self):
+        """Return the login cache shared by every service on this database."""
+        return credentials.get_cache(self.db_name)
+
+    def login(self, email, password):
+        """Return (user row, session token) for valid credentials, or (None, None).
+
+        Legacy SHA-256 hashes are upgraded on a successful login.
+        """
+        return credentials.authenticate(self.connection(), email, password, self.sessions())
+
+    def session_user(self, token):
+        """Return the user row of a live session token, or None."""
+        return self.sessions().user_for_token(token)
+
+    def logout(self, token):
+        """End a session."""
+        self.sessions().revoke(token)
+
+    @write_transaction
+    def register(self, name, email, phone, password):
+        """Create a user with a salted password hash; raises sqlite3.IntegrityError for a taken email."""
+        hashed_password = credentials.hash_password(password)
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO users (name, email, phone, password) VALUES (?, ?, ?, ?)",
+                        (name, email, phone, hashed_password))
+            return cur.lastrowid
+
+
+class BookingService(Service):
+    """Passenger-facing operations: search, seat booking, prebooking, dashboard."""
+
+    def __init__(self, db_name=DB_NAME, retry=None):
+        super().__init__(db_name, retry)
+        self._planner = None
+
+    def search_buses(self, search_term, page=0, page_size=SEARCH_PAGE_SIZE):
+        """Return one page of buses matching search_term, best matches first.
+
+        Every word of the term must prefix-match the bus name, number, route
+        name or one of the route's stops.
+        """
+        query = fts_query(search_term)
+        if not query:
+            return []
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT buses.bus_id, buses.name, buses.number, buses.ticket_price, buses.capacity,
+                    routes.route_name
+                FROM (
+                    -- Rank inside FTS5 first so only one page of rows is joined
+                    SELECT rowid, bm25(bus_search, 10.0, 5.0, 3.0, 1.0) AS score
+                    FROM bus_search
+                    WHERE bus_search MATCH ?
+                    ORDER BY score
+                    LIMIT ? OFFSET ?
+                ) AS hits
+                JOIN buses ON buses.bus_id = hits.rowid
+                JOIN routes ON buses.route_id = routes.route_id
+                ORDER BY hits.score
+            """, (query, page_size, page * page_size))
+            return cur.fetchall()
+
+    def available_seats(self, schedule_id):
+        """Return the unsold seat numbers on a departure, lowest first."""
+        return self.seat_cache().get(self.connection(), schedule_id).available()
+
+    def adjacent_seats(self, schedule_id, count):
+        """Return the first count side-by-side unsold seats on a departure, or [] if there is no such run."""
+        return self.seat_cache().get(self.connection(), schedule_id).adjacent(count)
+
+    def book_seats(self, schedule_id, seat_numbers, user_id):
+        """Atomically sell seats on a departure to a user; returns booking.book_seats' (results, prices)."""
+        results, prices = booking.book_seats(self.connection(), schedule_id, seat_numbers, user_id,
+                                     retry=self.retry, record=True)
+        db_pool.get_pool(self.db_name).maybe_checkpoint()
+        cache = self.seat_cache()
+        if any(status != booking.BOOKED for status in results.values()):
+            cache.invalidate(schedule_id)  # Our view of this departure was stale; reload it on next use
+        else:
+            cache.mark(schedule_id, booking.booked_seats(results), free=False)
+        return results, prices
+
+    def journey_planner(self):
+        """Return a JourneyPlanner over the current timetable, rebuilding it if any connection changed routes or schedules."""
+        conn = self.connection()
+        if self._planner is None or self._planner.index.versions != journeys.table_versions(conn):
+            self._planner = journeys.JourneyPlanner(journeys.StopIndex.load(conn))
+        return self._planner
+
+    def plan_journey(self, origin, destination, date=None):
+        """Return direct and one-transfer journeys between two stops."""
+        return self.journey_planner().plan(origin, destination, date)
+
+    def bus_schedules(self, bus_id):
+        """Return (schedule_id, departure_date, departure_time, arrival_time) for a bus."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT schedule_id, departure_date, departure_time, arrival_time
+                FROM schedules
+                WHERE bus_id = ?
+            """, (bus_id,))
+            return cur.fetchall()
+
+    def prebook_schedules(self, bus_name, route_name):
+        """Return (bus_id, schedule_id, departure_date, departure_time) for a bus's departures that can be prebooked."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT bus_id FROM buses
+                WHERE name = ? AND route_id = (SELECT route_id FROM routes WHERE route_name = ?)
+            """, (bus_name, route_name))
+            return [(bus_id, *departure[:3]) for (bus_id,) in cur.fetchall()
+                    for departure in prebooking.available(conn, bus_id)]
+
+    def charter_schedules(self, bus_id):
+        """Return (schedule_id, departure_date, departure_time, arrival_time) for a bus's departures that can be prebooked."""
+        with self.connection() as conn:
+            return prebooking.available(conn, bus_id)
+
+    def prebook(self, user_id, schedule_id):
+        """Charter a whole departure for a user and return the prebook_id.
+
+        Raises prebooking.CharterUnavailable if it is already chartered or has seats sold.
+        """
+        prebook_id = prebooking.charter(self.connection(), schedule_id, user_id, retry=self.retry)
+        db_pool.get_pool(self.db_name).maybe_checkpoint()
+        self.seat_cache().invalidate(schedule_id)  # Its seats are no longer on sale
+        return prebook_id
+
+    def user_tickets(self, user_id):
+        """Return (bus name, route name, departure, seat_number, price, ticket_id) for a user's tickets."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT buses.name, routes.route_name,
+                       schedules.departure_date || ' ' || schedules.departure_time,
+                       schedule_tickets.seat_number, schedule_tickets.price, schedule_tickets.ticket_id
+                FROM schedule_tickets
+                JOIN schedules ON schedule_tickets.schedule_id = schedules.schedule_id
+                JOIN buses ON schedules.bus_id = buses.bus_id
+                JOIN routes ON buses.route_id = routes.route_id
+                WHERE schedule_tickets.user_id = ?
+                ORDER BY schedules.departure_date, schedules.departure_time
+            """, (user_id,))
+            return cur.fetchall()
+
+    def user_prebookings(self, user_id):
+        """Return (bus name, route name, prebook_date, prebook_id) for a user's prebookings."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT buses.name, routes.route_name, prebooked_buses.prebook_date, prebooked_buses.prebook_id
+                FROM prebooked_buses
+                JOIN buses ON prebooked_buses.bus_id = buses.bus_id
+                JOIN routes ON buses.route_id = routes.route_id
+                WHERE prebooked_buses.user_id = ?
+            """, (user_id,))
+            return cur.fetchall()
+
+    def cancel_ticket(self, ticket_id, user_id):
+        """Cancel one of a user's tickets and put the seat back on sale."""
+        schedule_id = booking.cancel_ticket(self.connection(), ticket_id, user_id, retry=self.retry, record=True)
+        db_pool.get_pool(self.db_name).maybe_checkpoint()
+        if schedule_id is None:
+            return 0
+        self.seat_cache().invalidate(schedule_id)
+        return 1
+
+    def cancel_prebooking(self, prebook_id, user_id):
+        """Cancel one of a user's prebookings and put its departure's seats back on sale."""
+        found, schedule_id = prebooking.cancel(self.connection(), prebook_id, user_id, retry=self.retry)
+        db_pool.get_pool(self.db_name).maybe_checkpoint()
+        if schedule_id is not None:
+            self.seat_cache().invalidate(schedule_id)
+        return int(found)
+
+
+class ScheduleService(Service):
+    """Admin schedule CRUD."""
+
+    def list_buses(self):
+        """Return (bus_id, name) for every bus."""
+        return self.reference("SELECT bus_id, name FROM buses", (), ("buses",))
+
+    def list_routes(self):
+        """Return (route_id, route_name) for every route."""
+        return self.reference("SELECT route_id, route_name FROM routes", (), ("routes",))
+
+    def buses_page(self, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return a Page of (bus_id, name)."""
+        return self.page(BUSES_PAGE, sort, descending, after, limit, search, tables=("buses",))
+
+    def routes_page(self, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return a Page of (route_id, route_name, stops)."""
+        return self.page(ROUTES_PAGE, sort, descending, after, limit, search, tables=("routes",))
+
+    def schedules_page(self, bus_id, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return a Page of (schedule_id, departure_date, departure_time, arrival_time, route_id, route_name) for a bus."""
+        return self.page(SCHEDULES_PAGE, sort, descending, after, limit, search, (bus_id,))
+
+    def schedules_for_bus(self, bus_id):
+        """Return (schedule_id, departure_date, departure_time, arrival_time, route_id) for a bus."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT schedule_id, departure_date, departure_time, arrival_time, route_id FROM schedules WHERE bus_id = ?", (bus_id,))
+            return cur.fetchall()
+
+    @write_transaction
+    def add_schedule(self, bus_id, route_id, departure_date, departure_time, arrival_time):
+        """Insert a schedule and return its id.
+
+        Raises conflicts.ScheduleConflict if the bus or one of its drivers is
+        already running another departure in that window.
+        """
+        span = conflicts.interval(departure_date, departure_time, arrival_time)
+        conn = self.connection()
+        with conflicts.write(conn) as index:
+            found = index.check(bus_id, span)
+            if found:
+                raise conflicts.ScheduleConflict(found)
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time) VALUES (?, ?, ?, ?, ?)",
+                (bus_id, route_id, departure_date, departure_time, arrival_time),
+            )
+            index.add(bus_id, span._replace(schedule_id=cur.lastrowid))
+        return cur.lastrowid
+
+    @write_transaction
+    def update_schedule(self, schedule_id, departure_date, departure_time, arrival_time):
+        """Change the dates/times of a schedule; raises conflicts.ScheduleConflict on a double-booking."""
+        span = conflicts.interval(departure_date, departure_time, arrival_time, schedule_id)
+        conn = self.connection()
+        with conflicts.write(conn) as index:
+            cur = conn.cursor()
+            cur.execute("SELECT bus_id FROM schedules WHERE schedule_id = ?", (schedule_id,))
+            row = cur.fetchone()
+            if row is None:
+                return
+            found = index.check(row[0], span, ignore=schedule_id)
+            if found:
+                raise conflicts.ScheduleConflict(found)
+            cur.execute(
+                "UPDATE schedules SET departure_date = ?, departure_time = ?, arrival_time = ? WHERE schedule_id = ?",
+                (departure_date, departure_time, arrival_time, schedule_id),
+            )
+            index.remove(schedule_id)
+            index.add(row[0], span)
+
+    def audit_conflicts(self):
+        """Return every bus and driver double-booking in the timetable as conflicts.Conflict tuples."""
+        with self.connection() as conn:
+            return conflicts.audit(conn)
+
+    @write_transaction
+    def delete_schedule(self, schedule_id):
+        """Delete a schedule; raises booking.DepartureBooked if it has seats sold or is chartered."""
+        conn = self.connection()
+        with conflicts.write(conn) as index:
+            booked = booking.booked_departures(conn, "schedule_id = ?", (schedule_id,))
+            if booked:
+                raise booking.DepartureBooked(booked)
+            conn.execute("DELETE FROM schedules WHERE schedule_id = ?", (schedule_id,))
+            index.remove(schedule_id)
+        self.seat_cache().invalidate(schedule_id)
+
+    @write_transaction
+    def add_rule(self, bus_id, route_id, departure_time, arrival_time, weekdays, start_date, end_date,
+                 exceptions=(), materialize=True):
+        """Store a recurring schedule rule and optionally materialize it.
+
+        weekdays is a bitmask (see recurrence.parse_weekdays). Returns
+        (rule_id, created, conflicts), where conflicts are the departures that
+        were skipped because they already existed or would double-book the bus
+        or one of its drivers.
+        """
+        if start_date > end_date:
+            raise ValueError("The start date must not be after the end date")
+        conn = self.connection()
+        with conflicts.write(conn) as index:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO schedule_rules (bus_id, route_id, departure_time, arrival_time, weekdays,
+                                            start_date, end_date, exceptions)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (bus_id, route_id, departure_time, arrival_time, weekdays, start_date, end_date,
+                  ",".join(exceptions)))
+            rule = recurrence.Rule(cur.lastrowid, bus_id, route_id, departure_time, arrival_time, weekdays,
+                                   start_date, end_date, frozenset(exceptions))
+            created, clashes = recurrence.materialize(conn, rule, index=index) if materialize else (0, [])
+        return rule.rule_id, created, clashes
+
+    def list_rules(self, bus_id=None):
+        """Return the Rules, optionally for one bus."""
+        with self.connection() as conn:
+            return recurrence.load_rules(conn, bus_id)
+
+    def upcoming_departures(self, start, end, bus_id=None):
+        """Return a lazy iterator of rule departures in [start, end]; nothing is written to schedules."""
+        with self.connection() as conn:
+            return recurrence.departures(conn, start, end, bus_id)
+
+    @write_transaction
+    def materialize_rules(self, until):
+        """Materialize every rule up to until; returns (created, conflicts) as add_rule does."""
+        created, clashes = 0, []
+        conn = self.connection()
+        with conflicts.write(conn) as index:
+            for rule in recurrence.load_rules(conn, end=until):
+                count, found = recurrence.materialize(conn, rule, until, index)
+                created += count
+                clashes.extend(found)
+        return created, clashes
+
+    @write_transaction
+    def delete_rule(self, rule_id, from_date):
+        """Delete a rule and its departures from from_date on that have no tickets sold.
+
+        Returns the number of departures removed.
+        """
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                DELETE FROM schedules
+                WHERE rule_id = ? AND departure_date >= ?
+                  AND NOT EXISTS (SELECT 1 FROM schedule_tickets WHERE schedule_tickets.schedule_id = schedules.schedule_id)
+            """, (rule_id, from_date))
+            removed = cur.rowcount
+            cur.execute("UPDATE schedules SET rule_id = NULL WHERE rule_id = ?", (rule_id,))
+            cur.execute("DELETE FROM schedule_rules WHERE rule_id = ?", (rule_id,))
+        self.seat_cache().invalidate()
+        return removed
+
+
+class FleetService(Service):
+    """Admin management of buses, routes, drivers and bus seat layouts."""
+
+    @write_transaction
+    def add_bus(self, name, number, ticket_price, capacity, route_name, stops,
+                driver1, driver2, departure_date, departure_time, arrival_time, seat_tiers=()):
+        """Create a route, bus with all its seats, first schedule and driver assignments in one transaction.
+
+        seat_tiers is a sequence of inventory.SeatTier priced ahead of the base ticket price.
+        Raises conflicts.ScheduleConflict if either driver is already running
+        another departure in the first schedule's window.
+        """
+        span = conflicts.interval(departure_date, departure_time, arrival_time)
+        bus_drivers = conflicts.drivers(driver1, driver2)
+        conn = self.connection()
+        with conflicts.write(conn) as index:
+            found = index.check(None, span, bus_drivers)
+            if found:
+                raise conflicts.ScheduleConflict(found)
+            cur = conn.cursor()
+
+            # Insert route details
+            cur.execute("INSERT INTO routes (route_name, stops) VALUES (?, ?)", (route_name, stops))
+            route_id = cur.lastrowid
+            journeys.sync_route_stops(conn, route_id, stops)
+
+            # Insert bus details
+            cur.execute(
+                """
+                INSERT INTO buses (name, number, route_id, ticket_price, capacity, driver_id1, driver_id2)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (name, number, route_id, ticket_price, capacity, driver1, driver2)
+            )
+            bus_id = cur.lastrowid
+            inventory.generate_seats(conn, bus_id, capacity, ticket_price, seat_tiers)
+
+            # Insert schedule details (a trigger creates its seat inventory)
+            cur.execute(
+                """
+                INSERT INTO schedules (bus_id, route_id, departure_date, departure_time, arrival_time)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (bus_id, route_id, departure_date, departure_time, arrival_time)
+            )
+            schedule_id = cur.lastrowid
+
+            # Update driver assignments
+            cur.execute("INSERT INTO driver_assignments (bus_id, driver_id) VALUES (?, ?)", (bus_id, driver1))
+            if driver2:
+                cur.execute("INSERT INTO driver_assignments (bus_id, driver_id) VALUES (?, ?)", (bus_id, driver2))
+
+            index.set_drivers(bus_id, bus_drivers)
+            index.add(bus_id, span._replace(schedule_id=schedule_id))
+        self.reference_changed("routes", "buses")
+        return bus_id
+
+    def list_buses(self):
+        """Return (bus_id, name) for every bus."""
+        return self.reference("SELECT bus_id, name FROM buses", (), ("buses",))
+
+    def get_bus(self, bus_id):
+        """Return the full buses row for a bus, or None."""
+        return self.reference("SELECT * FROM buses WHERE bus_id = ?", (bus_id,), ("buses",), one=True)
+
+    @write_transaction
+    def delete_bus(self, bus_id):
+        """Delete a bus together with its schedules and driver assignments.
+
+        Raises booking.DepartureBooked if any of its departures has seats sold or is chartered.
+        """
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")  # Nobody can book between the check and the delete
+            booked = booking.booked_departures(conn, "bus_id = ?", (bus_id,))
+            if booked:
+                raise booking.DepartureBooked(booked)
+            cur.execute("DELETE FROM buses WHERE bus_id = ?", (bus_id,))
+            cur.execute("DELETE FROM schedules WHERE bus_id = ?", (bus_id,))
+            cur.execute("DELETE FROM driver_assignments WHERE bus_id = ?", (bus_id,))
+        self.reference_changed("buses")
+        self.seat_cache().invalidate()  # The bus's departures are gone
+
+    @write_transaction
+    def regenerate_inventory(self, bus_id, seat_tiers=()):
+        """Rebuild a bus's seat layout and departure inventory from its capacity.
+
+        Sold seats are kept. Returns (seats, departures), or None if the bus does not exist.
+        """
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT capacity, ticket_price FROM buses WHERE bus_id = ?", (bus_id,))
+            bus = cur.fetchone()
+            if bus is None:
+                return None
+            capacity, ticket_price = bus
+            seats = inventory.generate_seats(conn, bus_id, capacity, ticket_price, seat_tiers)
+            departures = inventory.resize_departures(conn, bus_id, capacity)
+        self.seat_cache().invalidate()
+        return seats, departures
+
+    def import_file(self, table, path):
+        """Bulk-load routes, drivers, buses or schedules from a CSV, JSON Lines or Parquet file.
+
+        Returns a bulk_io.ImportResult with the imported count and the rejected rows.
+        """
+        result = bulk_io.import_file(self.connection(), table, path)
+        if table in refcache.TABLES:
+            self.reference_changed(table)
+        if result.rejected:
+            bulk_io.write_rejections(result.rejected, f"{path}.rejected.csv")
+        return result
+
+    def export_table(self, table, path):
+        """Stream routes, drivers, buses or schedules to a CSV, JSON Lines or Parquet file; returns the row count."""
+        return bulk_io.export_table(self.connection(), table, path)
+
+    def bus_details(self):
+        """Return bus, route and stop details for every bus on a route."""
+        return self.reference("""
+            SELECT buses.bus_id, buses.name, buses.number, buses.ticket_price, buses.capacity,
+                routes.route_name, routes.stops
+            FROM buses
+            JOIN routes ON buses.route_id = routes.route_id
+        """, (), ("buses", "routes"))
+
+    def system_details_page(self, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return one keyset-paginated Page of the admin system-details report."""
+        return self.page(SYSTEM_DETAILS_PAGE, sort, descending, after, limit, search)
+
+    # Routes
+
+    def list_routes(self):
+        """Return (route_id, route_name, stops) for every route."""
+        return self.reference("SELECT route_id, route_name, stops FROM routes", (), ("routes",))
+
+    def routes_page(self, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return a Page of (route_id, route_name, stops)."""
+        return self.page(ROUTES_PAGE, sort, descending, after, limit, search, tables=("routes",))
+
+    @write_transaction
+    def add_route(self, route_name, stops):
+        """Insert a route and return its id."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO routes (route_name, stops) VALUES (?, ?)", (route_name, stops))
+            journeys.sync_route_stops(conn, cur.lastrowid, stops)
+        self.reference_changed("routes")
+        return cur.lastrowid
+
+    @write_transaction
+    def update_route(self, route_id, route_name, stops):
+        """Rename a route and replace its stops."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE routes SET route_name = ?, stops = ? WHERE route_id = ?",
+                (route_name, stops, route_id),
+            )
+            journeys.sync_route_stops(conn, route_id, stops)
+        self.reference_changed("routes")
+
+    @write_transaction
+    def delete_route(self, route_id):
+        """Delete a route."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM routes WHERE route_id = ?", (route_id,))
+        self.reference_changed("routes")
+
+    # Drivers
+
+    def list_drivers(self):
+        """Return (driver_id, name, license_number) for every driver."""
+        return self.reference("SELECT driver_id, name, license_number FROM drivers", (), ("drivers",))
+
+    def drivers_page(self, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return a Page of (driver_id, name, license_number, phone, address)."""
+        return self.page(DRIVERS_PAGE, sort, descending, after, limit, search, tables=("drivers",))
+
+    def find_driver(self, name):
+        """Return (driver_id, name, license_number, phone, address) for a driver by name."""
+        return self.reference("SELECT driver_id, name, license_number, phone, address FROM drivers WHERE name = ?",
+                              (name,), ("drivers",), one=True)
+
+    @write_transaction
+    def add_driver(self, name, license_number, phone, address):
+        """Insert a driver and return their id."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO drivers (name, license_number, phone, address)
+                VALUES (?, ?, ?, ?)
+            """, (name, license_number, phone, address))
+        self.reference_changed("drivers")
+        return cur.lastrowid
+
+    @write_transaction
+    def update_driver(self, driver_id, name, license_number, phone, address):
+        """Replace a driver's details."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE drivers
+                SET name = ?, license_number = ?, phone = ?, address = ?
+                WHERE driver_id = ?
+            """, (name, license_number, phone, address, driver_id))
+        self.reference_changed("drivers")
+
+    @write_transaction
+    def delete_driver(self, driver_id):
+        """Delete a driver."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM drivers WHERE driver_id = ?", (driver_id,))
+        self.reference_changed("drivers")
+
+    # Seat layouts. Each bus's seats are rows of tickets that give a seat its class and
+    # price; what is sold lives per departure in seat_inventory and schedule_tickets.
+
+    def list_tickets(self):
+        """Return (ticket_id, bus name, seat_number, price, seat_class) for every seat of every bus."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT tickets.ticket_id, buses.name, tickets.seat_number, tickets.price, tickets.seat_class
+                FROM tickets
+                JOIN buses ON tickets.bus_id = buses.bus_id
+            """)
+            return cur.fetchall()
+
+    def tickets_page(self, sort=None, descending=False, after=None, limit=paging.PAGE_SIZE, search=None):
+        """Return a Page of seat layout rows (ticket_id, bus name, seat_number, price, seat_class, seat_id)."""
+        return self.page(TICKETS_PAGE, sort, descending, after, limit, search)
+
+    @write_transaction
+    def add_ticket(self, bus_id, seat_number, price, seat_class=None):
+        """Add a seat to a bus's layout; its seat_id is "<bus_id>-<seat_number>"."""
+        seat_id = f"{bus_id}-{seat_number}"
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO tickets (bus_id, seat_number, seat_id, price, seat_class, status)
+                VALUES (?, ?, ?, ?, ?, 'unsold')
+            """, (bus_id, seat_number, seat_id, price, seat_class))
+            return cur.lastrowid
+
+    @write_transaction
+    def update_ticket(self, seat_id, price, seat_class):
+        """Change the price and class a seat sells at on future bookings."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE tickets
+                SET price = ?, seat_class = ?
+                WHERE seat_id = ?
+            """, (price, seat_class, seat_id))
+
+    @write_transaction
+    def delete_ticket(self, seat_id):
+        """Remove a seat from its bus's layout; it then sells at the bus's base ticket price."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM tickets WHERE seat_id = ?", (seat_id,))
+
+
+class AnalyticsService(Service):
+    """Admin revenue and occupancy reports over the precomputed summary tables."""
+
+    def refresh(self, workers=None, full=False):
+        """Recompute the summaries of days changed since the last refresh; returns analytics.RefreshResult."""
+        return analytics.refresh(self.db_name, self.connection(), workers, full)
+
+    def pending_days(self):
+        """Return how many days are waiting to be recomputed."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM analytics_dirty_days")
+            return cur.fetchone()[0]
+
+    def daily_totals(self, first, last):
+        """Return an analytics.DayTotal per day between first and last."""
+        with self.connection() as conn:
+            return analytics.daily_totals(conn, first, last)
+
+    def top_routes(self, first, last, limit=10):
+        """Return the limit highest-earning routes between first and last as analytics.RouteTotal."""
+        with self.connection() as conn:
+            return analytics.route_totals(conn, first, last, limit)
+
+    def bus_totals(self, first, last):
+        """Return an analytics.BusTotal per bus between first and last."""
+        with self.connection() as conn:
+            return analytics.bus_totals(conn, first, last)
@@ -0,0 +1,186 @@
+"""Reusable Tkinter widgets for large, database-backed lists."""
+import tkinter as tk
+from tkinter import ttk
+
+import paging
+
+# Load the next page once the user scrolls past this fraction of the loaded rows
+PREFETCH_AT = 0.9
+
+
+class PagedTreeview(tk.Frame):
+    """A Treeview that loads rows page by page from SQL as the user scrolls.
+
+    fetch_page(sort, descending, after, limit, search) must return a
+    paging.Page. Clicking a heading re-sorts in SQL; the search box filters in
+    SQL. Only rows the user has scrolled to are ever materialized.
+    """
+
+    def __init__(self, parent, columns, fetch_page, page_size=paging.PAGE_SIZE, key=None, searchable=True, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.columns = columns          # [(name, heading, width), ...]
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.key = key                  # row -> id stored for each item, or None
+        self.sort = None
+        self.descending = False
+        self.search = None
+        self.cursor = None
+        self.exhausted = False
+        self.loading = False
+        self.keys = {}
+
+        if searchable:
+            search_frame = tk.Frame(self)
+            search_frame.pack(fill=tk.X, pady=5)
+            tk.Label(search_frame, text="Filter:").pack(side=tk.LEFT, padx=5)
+            self.search_entry = tk.Entry(search_frame, width=30)
+            self.search_entry.pack(side=tk.LEFT, padx=5)
+            self.search_entry.bind("<Return>", lambda event: self.apply_search())
+            tk.Button(search_frame, text="Apply", command=self.apply_search).pack(side=tk.LEFT, padx=5)
+
+        table_frame = tk.Frame(self)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(table_frame, orient=tk.VERTICAL)
+        self.tree = ttk.Treeview(table_frame, columns=[name for name, _, _ in columns], show="headings",
+                                 yscrollcommand=self._on_scroll)
+        self.scrollbar.config(command=self.tree.yview)
+        for name, heading, width in columns:
+            self.tree.heading(name, text=heading, command=lambda name=name: self.sort_by(name))
+            self.tree.column(name, width=width)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.reload()
+
+    def reload(self):
+        """Discard loaded rows and fetch the first page again."""
+        self.tree.delete(*self.tree.get_children())
+        self.keys.clear()
+        self.cursor = None
+        self.exhausted = False
+        self.load_more()
+
+    def load_more(self):
+        """Fetch and append the next page, if any."""
+        if self.loading or self.exhausted:
+            return
+        self.loading = True
+        try:
+            page = self.fetch_page(self.sort, self.descending, self.cursor, self.page_size, self.search)
+            width = len(self.columns)
+            for row in page.rows:
+                values = ["N/A" if cell is None else cell for cell in row[:width]]
+                item = self.tree.insert("", tk.END, values=values)
+                if self.key:
+                    self.keys[item] = self.key(row)
+            self.cursor = page.cursor
+            self.exhausted = page.cursor is None
+        finally:
+            self.loading = False
+
+    def sort_by(self, column):
+        """Sort by a column in SQL, toggling direction on repeated clicks."""
+        self.descending = not self.descending if self.sort == column else False
+        self.sort = column
+        self.reload()
+
+    def apply_search(self):
+        """Filter rows in SQL by the text in the search box."""
+        self.search = self.search_entry.get().strip() or None
+        self.reload()
+
+    def selected_key(self):
+        """Return the key of the selected row without re-querying, or None."""
+        selection = self.tree.selection()
+        return self.keys.get(selection[0]) if selection else None
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.exhausted and float(last) >= PREFETCH_AT:
+            self.after_idle(self.load_more)
+
+
+class PagedListbox(tk.Frame):
+    """A Listbox that loads rows page by page from SQL as the user scrolls.
+
+    fetch_page is called like PagedTreeview's; describe(row) gives the text
+    shown for a row. The rows behind the visible lines are kept, so the
+    selection maps back to its row and ID without another query.
+    """
+
+    def __init__(self, parent, fetch_page, describe, page_size=paging.PAGE_SIZE, key=None, searchable=False,
+                 width=50, height=10, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.fetch_page = fetch_page
+        self.describe = describe
+        self.page_size = page_size
+        self.key = key or (lambda row: row[0])
+        self.search = None
+        self.cursor = None
+        self.exhausted = False
+        self.loading = False
+        self.rows = []
+
+        if searchable:
+            search_frame = tk.Frame(self)
+            search_frame.pack(fill=tk.X, pady=2)
+            tk.Label(search_frame, text="Filter:").pack(side=tk.LEFT, padx=5)
+            self.search_entry = tk.Entry(search_frame, width=30)
+            self.search_entry.pack(side=tk.LEFT, padx=5)
+            self.search_entry.bind("<Return>", lambda event: self.apply_search())
+            tk.Button(search_frame, text="Apply", command=self.apply_search).pack(side=tk.LEFT, padx=5)
+
+        list_frame = tk.Frame(self)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        self.listbox = tk.Listbox(list_frame, width=width, height=height, exportselection=False,
+                                  yscrollcommand=self._on_scroll)
+        self.scrollbar.config(command=self.listbox.yview)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.reload()
+
+    def reload(self):
+        """Discard loaded rows and fetch the first page again."""
+        self.listbox.delete(0, tk.END)
+        self.rows.clear()
+        self.cursor = None
+        self.exhausted = False
+        self.load_more()
+
+    def load_more(self):
+        """Fetch and append the next page, if any."""
+        if self.loading or self.exhausted:
+            return
+        self.loading = True
+        try:
+            page = self.fetch_page(None, False, self.cursor, self.page_size, self.search)
+            for row in page.rows:
+                self.listbox.insert(tk.END, self.describe(row))
+            self.rows.extend(page.rows)
+            self.cursor = page.cursor
+            self.exhausted = page.cursor is None
+        finally:
+            self.loading = False
+
+    def apply_search(self):
+        """Filter rows in SQL by the text in the search box."""
+        self.search = self.search_entry.get().strip() or None
+        self.reload()
+
+    def selected_row(self):
+        """Return the selected row as loaded, or None."""
+        selection = self.listbox.curselection()
+        return self.rows[selection[0]] if selection else None
+
+    def selected_key(self):
+        """Return the key of the selected row without re-querying, or None."""
+        row = self.selected_row()
+        return self.key(row) if row is not None else None
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.exhausted and float(last) >= PREFETCH_AT:
+            self.after_idle(self.load_more)